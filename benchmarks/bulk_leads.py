@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Bulk lead creation benchmark.
+
+Creates the same number of leads through the single-row path (`POST /leads/`,
+one request per lead, with concurrent workers) and through `POST /leads/bulk`,
+and reports the rows per second of each path to a JSON file. The created
+students are recognized by their DNI prefix and deleted before each run.
+
+Usage:
+    python -m benchmarks.bulk_leads --leads 20000 --output bench_bulk.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import asyncpg
+import httpx
+
+from challenge.core.db_handler import database_dsn
+
+
+BULK_DNI_PREFIX = "K"
+
+
+def make_leads(count: int, path: str) -> List[dict]:
+    """Returns `count` leads with DNIs unique to the path."""
+    return [{"dni": f"{BULK_DNI_PREFIX}{path}{index:09d}",
+             "name": f"Bulk Lead {index}",
+             "email": f"bulk{index}@example.com",
+             "phone": f"555-{index}",
+             "address": f"Bulk street {index}"}
+            for index in range(count)]
+
+
+def rows_per_second(rows: int, elapsed: float) -> float:
+    return round(rows / elapsed, 2) if elapsed else 0.0
+
+
+async def delete_bench_leads() -> None:
+    connection = await asyncpg.connect(database_dsn())
+    try:
+        await connection.execute("DELETE FROM students WHERE dni LIKE $1", f"{BULK_DNI_PREFIX}%")
+    finally:
+        await connection.close()
+
+
+async def run_single(client: httpx.AsyncClient, leads: List[dict], concurrency: int) -> Dict[str, float]:
+    """Creates the leads one request at a time, with `concurrency` workers."""
+    pending = iter(leads)
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for lead in pending:
+            response = await client.post("/leads/", json=lead)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"rows": len(leads), "errors": errors, "seconds": round(elapsed, 3),
+            "rows_per_second": rows_per_second(len(leads), elapsed)}
+
+
+async def run_bulk(client: httpx.AsyncClient, leads: List[dict], batch_size: int,
+                   on_conflict: str) -> Dict[str, float]:
+    """Creates the leads with sequential `POST /leads/bulk` requests of `batch_size` leads."""
+    errors = 0
+    started = time.perf_counter()
+    for start in range(0, len(leads), batch_size):
+        response = await client.post("/leads/bulk", json={"leads": leads[start:start + batch_size],
+                                                          "on_conflict": on_conflict})
+        if response.status_code != 200:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    return {"rows": len(leads), "errors": errors, "seconds": round(elapsed, 3),
+            "rows_per_second": rows_per_second(len(leads), elapsed)}
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    await delete_bench_leads()
+    results = dict()
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        print(f"Creating {args.leads} leads with POST /leads/ ({args.concurrency} workers)...")
+        results["POST /leads/"] = await run_single(client, make_leads(args.leads, "S"),
+                                                   args.concurrency)
+        print(f"  {results['POST /leads/']}")
+        bulk_leads = make_leads(args.leads, "B")
+        print(f"Creating {args.leads} leads with POST /leads/bulk ({args.batch_size} per request)...")
+        results["POST /leads/bulk"] = await run_bulk(client, bulk_leads, args.batch_size, "skip")
+        print(f"  {results['POST /leads/bulk']}")
+        print("Updating them with POST /leads/bulk...")
+        results["POST /leads/bulk (update)"] = await run_bulk(client, bulk_leads,
+                                                              args.batch_size, "update")
+        print(f"  {results['POST /leads/bulk (update)']}")
+    await delete_bench_leads()
+    single = results["POST /leads/"]["rows_per_second"]
+    if single:
+        print(f"Bulk speedup: {results['POST /leads/bulk']['rows_per_second'] / single:.1f}x")
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--leads", type=int, default=5000,
+                        help="Leads created by each path.")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Workers of the single-row path.")
+    parser.add_argument("--batch-size", type=int, default=5000,
+                        help="Leads per bulk request.")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--output", default="bench_bulk_output.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmark(args))
+    Path(args.output).write_text(json.dumps({"leads": args.leads, "results": results}, indent=2))
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
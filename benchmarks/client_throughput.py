@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""Client throughput benchmark.
+
+Fetches the same records one by one, with concurrent workers, in two ways:
+the naive way, with a new `httpx.AsyncClient` (and connection) per
+`GET /records/{id}`, and with `ChallengeClient.get_record`, which keeps a
+keep-alive pool and batches the concurrent lookups into `GET /records?ids=`.
+Reports the records per second of each way to a JSON file. Runs against an
+already seeded server, nothing is written.
+
+Usage:
+    python -m benchmarks.client_throughput --records 2000 --output bench_client.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.bulk_leads import rows_per_second
+from challenge.client import ChallengeClient
+from challenge.constants import MAX_RECORDS_PAGE
+
+
+async def record_ids(base_url: str, count: int) -> List[int]:
+    """IDs of the first `count` records of the server."""
+    ids = list()
+    async with ChallengeClient(base_url) as client:
+        async for record in client.iter_records(page_size=min(count, MAX_RECORDS_PAGE)):
+            ids.append(record.id)
+            if len(ids) == count:
+                break
+    return ids
+
+
+async def fetch_all(ids: List[int],
+                    fetch: Callable[[int], Awaitable[bool]],
+                    concurrency: int) -> Dict[str, float]:
+    """Fetches every ID with `concurrency` workers, `fetch` returns whether it succeeded."""
+    pending = iter(ids)
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for record_id in pending:
+            if not await fetch(record_id):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"rows": len(ids), "errors": errors, "seconds": round(elapsed, 3),
+            "rows_per_second": rows_per_second(len(ids), elapsed)}
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    ids = await record_ids(args.base_url, args.records)
+    results = dict()
+
+    async def naive(record_id: int) -> bool:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+            response = await client.get(f"/records/{record_id}")
+            return response.status_code == 200
+
+    print(f"Fetching {len(ids)} records with a client per request ({args.concurrency} workers)...")
+    results["naive"] = await fetch_all(ids, naive, args.concurrency)
+    print(f"  {results['naive']}")
+
+    async with ChallengeClient(args.base_url, timeout=args.timeout,
+                               batch_window=args.batch_window) as client:
+        async def pooled(record_id: int) -> bool:
+            await client.get_record(record_id)
+            return True
+
+        print(f"Fetching {len(ids)} records with ChallengeClient ({args.concurrency} workers)...")
+        results["ChallengeClient"] = await fetch_all(ids, pooled, args.concurrency)
+        print(f"  {results['ChallengeClient']}")
+    naive_rate = results["naive"]["rows_per_second"]
+    if naive_rate:
+        print(f"Client speedup: {results['ChallengeClient']['rows_per_second'] / naive_rate:.1f}x")
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--records", type=int, default=2000,
+                        help="Records fetched by each way.")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="Concurrent workers of each way.")
+    parser.add_argument("--batch-window", type=float, default=0.002,
+                        help="Seconds the client waits for more lookups before a batch.")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", default="bench_client_output.json")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmark(args))
+    Path(args.output).write_text(json.dumps({"records": args.records, "results": results}, indent=2))
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Import time benchmark.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and
+reports the cumulative import time of the module and its heaviest imports.
+
+Usage:
+    python benchmarks/import_time.py --module main --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def import_times(module: str, env: Optional[Dict[str, str]] = None) -> Dict[str, int]:
+    """
+    Import `module` in a fresh interpreter and parse the `-X importtime` report.
+
+    Args:
+        module (str): Module to import.
+        env (Dict[str, str], optional): Extra environment variables.
+
+    Returns:
+        Dict[str, int]: Cumulative import time, in microseconds, per imported module.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env={**os.environ, **(env or {})},
+        capture_output=True, text=True, check=True)
+    times = dict()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module: str, runs: int,
+            env: Optional[Dict[str, str]] = None) -> Tuple[float, Dict[str, int]]:
+    """Returns the median cumulative time of `module` in milliseconds and the last report."""
+    samples: List[int] = list()
+    for _ in range(runs):
+        times = import_times(module, env)
+        samples.append(times[module])
+    return statistics.median(samples) / 1000, times
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Measure the import time of a module.")
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    median_ms, times = measure(args.module, args.runs)
+    print(f"{args.module}: median {median_ms:.1f} ms over {args.runs} runs")
+    heaviest = sorted(times.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    for name, cumulative in heaviest:
+        print(f"{cumulative / 1000:10.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
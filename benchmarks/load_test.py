@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""Load test benchmark for every endpoint.
+
+Seeds the local database at a configurable scale, drives each endpoint with
+concurrent async httpx workers and reports throughput and p50/p95/p99 latency
+per endpoint to a JSON file. Results can be compared against a baseline, the
+output of a previous run on the same host and with the same options: the
+process exits with code 1 when an endpoint regresses beyond the threshold.
+
+No baseline is committed, since the latencies depend on the host. Produce one
+with a reference run, then compare the later runs against it:
+
+Usage:
+    python -m benchmarks.load_test --scale 10k --seed --output bench_baseline.json
+    python -m benchmarks.load_test --scale 10k --baseline bench_baseline.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import asyncpg
+import httpx
+
+from challenge.core.db_handler import database_dsn
+
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+BENCH_DNI_PREFIX = "B"
+# Every career of the reference catalog has 5 related subjects, so each
+# seeded student gets 5 subject enrollments.
+ENROLLMENTS_PER_STUDENT = 5
+
+# (method, url, json body)
+BenchRequest = Tuple[str, str, Optional[dict]]
+# Returns the timed request plus an optional untimed request sent before it
+RequestFactory = Callable[[], Tuple[BenchRequest, Optional[BenchRequest]]]
+
+
+@dataclass
+class EndpointResult:
+    """Latencies and errors collected for one endpoint."""
+    name: str
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> Dict[str, float]:
+        """Returns the throughput and latency percentiles, in milliseconds."""
+        return {
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "throughput_rps": round(len(self.latencies) / self.elapsed, 2) if self.elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 3),
+        }
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def compare_with_baseline(results: Dict[str, Dict[str, float]],
+                          baseline: Dict[str, Dict[str, float]],
+                          threshold: float) -> List[str]:
+    """
+    Compare benchmark results against a baseline.
+
+    Args:
+        results (Dict): Summary per endpoint of the current run.
+        baseline (Dict): Summary per endpoint of the stored baseline.
+        threshold (float): Allowed relative degradation, e.g. 0.1 for 10%.
+
+    Returns:
+        List[str]: A description of every regression found.
+    """
+    regressions = list()
+    for endpoint, current in results.items():
+        reference = baseline.get(endpoint)
+        if not reference:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if reference[metric] and current[metric] > reference[metric] * (1 + threshold):
+                regressions.append(
+                    f"{endpoint}: {metric} {current[metric]} > baseline {reference[metric]}")
+        if reference["throughput_rps"] and (
+                current["throughput_rps"] < reference["throughput_rps"] * (1 - threshold)):
+            regressions.append(
+                f"{endpoint}: throughput_rps {current['throughput_rps']} "
+                f"< baseline {reference['throughput_rps']}")
+    return regressions
+
+
+#==============================================================================
+# Database seeding
+async def seed_database(enrollments: int) -> None:
+    """
+    Replace the benchmark rows with a dataset of the requested size.
+
+    Benchmark students are recognized by their DNI prefix, so the seed data
+    of `initdb.sql` is left untouched. Rows are generated server side with
+    `generate_series`.
+    """
+    students = max(1, enrollments // ENROLLMENTS_PER_STUDENT)
+    connection = await asyncpg.connect(database_dsn())
+    try:
+        async with connection.transaction():
+            await connection.execute(
+                "DELETE FROM students WHERE dni LIKE $1", f"{BENCH_DNI_PREFIX}%")
+            await connection.execute(
+                """
+                INSERT INTO students (dni, name, email, phone, address)
+                SELECT $1 || lpad(g::text, 9, '0'), 'Bench Student ' || g,
+                       'bench' || g || '@example.com', '555-' || g, 'Bench street ' || g
+                FROM generate_series(1, $2) AS g
+                """, BENCH_DNI_PREFIX, students)
+            await connection.execute(
+                """
+                INSERT INTO student_career (student_id, career_id, year_enroll)
+                SELECT s.student_id, c.id, 2015 + s.student_id % 10
+                FROM students s
+                JOIN (SELECT id, row_number() OVER (ORDER BY id) - 1 AS position,
+                             count(*) OVER () AS total
+                      FROM careers) c ON c.position = s.student_id % c.total
+                WHERE s.dni LIKE $1
+                """, f"{BENCH_DNI_PREFIX}%")
+            await connection.execute(
+                """
+                INSERT INTO subject_enrollments (student_id, career_subject_id, enroll_times)
+                SELECT sc.student_id, cs.id, 1 + (sc.student_id + cs.id) % 3
+                FROM student_career sc
+                JOIN students s ON s.student_id = sc.student_id
+                JOIN career_subject cs ON cs.career_id = sc.career_id
+                WHERE s.dni LIKE $1
+                """, f"{BENCH_DNI_PREFIX}%")
+        await connection.execute("ANALYZE")
+    finally:
+        await connection.close()
+
+
+async def fetch_bench_targets() -> Dict[str, list]:
+    """Returns the record IDs and enrolled (dni, career, subject) used by the scenarios."""
+    connection = await asyncpg.connect(database_dsn())
+    try:
+        record_ids = await connection.fetch(
+            "SELECT id FROM subject_enrollments ORDER BY random() LIMIT 1000")
+        enrolled = await connection.fetch(
+            """
+            SELECT s.dni, c.name AS career, sub.name AS subject
+            FROM student_career sc
+            JOIN students s ON s.student_id = sc.student_id
+            JOIN careers c ON c.id = sc.career_id
+            JOIN career_subject cs ON cs.career_id = c.id
+            JOIN subjects sub ON sub.id = cs.subject_id
+            ORDER BY random() LIMIT 1000
+            """)
+        careers = await connection.fetch("SELECT name FROM careers")
+    finally:
+        await connection.close()
+    return {
+        "record_ids": [row["id"] for row in record_ids],
+        "enrolled": [dict(row) for row in enrolled],
+        "careers": [row["name"] for row in careers],
+    }
+
+
+#==============================================================================
+# Load generation
+def build_scenarios(targets: Dict[str, list], total_records: int,
+                    run_id: str) -> Dict[str, RequestFactory]:
+    """Returns a request factory per endpoint."""
+    counter = itertools.count()
+    record_ids = targets["record_ids"] or [1]
+    enrolled = targets["enrolled"]
+    careers = targets["careers"]
+
+    def new_lead(prefix: str) -> dict:
+        dni = f"{prefix}{run_id}{next(counter)}"[:20]
+        return {"dni": dni, "name": f"Load {dni}", "email": f"{dni}@example.com",
+                "phone": "555-0000", "address": "Load street"}
+
+    def get_records():
+        start = random.randrange(max(1, total_records - 10))
+        return ("GET", f"/records/?start={start}&limit=10", None), None
+
+    def post_record():
+        enrollment = random.choice(enrolled)
+        return ("POST", "/records/", {**new_lead("R"),
+                                      "subject": enrollment["subject"],
+                                      "career": enrollment["career"],
+                                      "enroll_times": 1,
+                                      "year_enroll": 2024}), None
+
+    def enroll_career():
+        # A career enrollment needs a lead that is not enrolled yet
+        lead = new_lead("E")
+        return ("POST", "/enroll/career", {"student_dni": lead["dni"],
+                                           "career_name": random.choice(careers),
+                                           "year_enroll": 2024}), ("POST", "/leads/", lead)
+
+    def enroll_subject():
+        enrollment = random.choice(enrolled)
+        return ("POST", "/enroll/subject", {"student_dni": enrollment["dni"],
+                                            "career_name": enrollment["career"],
+                                            "subject_name": enrollment["subject"],
+                                            "enroll_times": random.randint(1, 5)}), None
+
+    return {
+        "GET /leads/": lambda: (("GET", "/leads/", None), None),
+        "GET /records/": get_records,
+        "GET /records/{record_id}": lambda: (
+            ("GET", f"/records/{random.choice(record_ids)}", None), None),
+        "POST /enroll/career": enroll_career,
+        "POST /enroll/subject": enroll_subject,
+        "POST /records/": post_record,
+    }
+
+
+async def run_endpoint(client: httpx.AsyncClient, name: str, factory: RequestFactory,
+                       concurrency: int, duration: float) -> EndpointResult:
+    """Drives one endpoint with `concurrency` workers during `duration` seconds."""
+    result = EndpointResult(name=name)
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            (method, url, body), setup = factory()
+            try:
+                if setup:
+                    await client.request(setup[0], setup[1], json=setup[2])
+                started = time.perf_counter()
+                response = await client.request(method, url, json=body)
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                result.latencies.append(time.perf_counter() - started)
+            else:
+                result.errors += 1
+
+    run_started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - run_started
+    return result
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    """Seeds (if requested) and runs every scenario, returns the summaries."""
+    enrollments = SCALES[args.scale]
+    if args.seed:
+        print(f"Seeding {enrollments} enrollments...")
+        await seed_database(enrollments)
+    targets = await fetch_bench_targets()
+    scenarios = build_scenarios(targets, enrollments, uuid.uuid4().hex[:6])
+    if args.endpoints:
+        scenarios = {name: f for name, f in scenarios.items() if name in args.endpoints}
+
+    limits = httpx.Limits(max_connections=args.concurrency,
+                          max_keepalive_connections=args.concurrency)
+    results = dict()
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits,
+                                 timeout=args.timeout) as client:
+        for name, factory in scenarios.items():
+            print(f"Running {name} for {args.duration}s...")
+            endpoint_result = await run_endpoint(client, name, factory,
+                                                 args.concurrency, args.duration)
+            results[name] = endpoint_result.summary()
+            print(f"  {results[name]}")
+    return results
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scale", choices=SCALES, default="10k",
+                        help="Number of seeded subject enrollments.")
+    parser.add_argument("--seed", action="store_true",
+                        help="Seed the database before running the scenarios.")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="Seconds each endpoint is driven.")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--endpoints", nargs="*",
+                        help="Run only these endpoints, e.g. 'GET /records/'.")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="Baseline JSON file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Allowed relative degradation against the baseline.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmark(args))
+    report = {"scale": args.scale, "concurrency": args.concurrency,
+              "duration": args.duration, "endpoints": results}
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        options = {"scale": args.scale, "concurrency": args.concurrency, "duration": args.duration}
+        different = {name: baseline.get(name) for name, value in options.items()
+                     if baseline.get(name) != value}
+        if different:
+            print(f"WARNING the baseline was run with other options: {different}")
+        regressions = compare_with_baseline(results, baseline["endpoints"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
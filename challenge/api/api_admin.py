@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""API Endpoints for the administration of the service"""
+
+import hmac
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Request
+from fastapi.responses import FileResponse, JSONResponse
+from starlette import status
+
+from challenge import settings
+from challenge.models.api_models import ProfileModel
+
+
+router = APIRouter()
+
+def authorized(request: Request) -> bool:
+    """Whether the request has the profiling token in the profiling header."""
+    token = request.headers.get(settings.PROFILING_HEADER, "")
+    return bool(settings.PROFILING_TOKEN) and hmac.compare_digest(token.encode(),
+                                                                 settings.PROFILING_TOKEN.encode())
+
+def forbidden() -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_403_FORBIDDEN,
+                        content={"detail": f"The {settings.PROFILING_HEADER} header must have the profiling token"})
+
+@router.get("/profiles", response_model=List[ProfileModel],
+            responses={status.HTTP_403_FORBIDDEN: {}})
+def list_profiles(request: Request):
+    """
+    List the stored request profiles, the newest first.
+
+    Only with `PROFILING_ENABLED`, and the profiling token in the header.
+    The route and latency of each request are part of its profile.
+    """
+    if not authorized(request):
+        return forbidden()
+    return [ProfileModel(id=profile.id,
+                         method=profile.method,
+                         route=profile.route,
+                         latency_ms=profile.latency_ms,
+                         created=datetime.fromtimestamp(profile.created),
+                         size=profile.size)
+            for profile in request.app.state.profile_store.list()]
+
+@router.get("/profiles/{profile_id}",
+            responses={status.HTTP_403_FORBIDDEN: {}, status.HTTP_404_NOT_FOUND: {}})
+def get_profile(request: Request, profile_id: str):
+    """
+    Download a stored profile, in the `pstats` format.
+
+    Open it with `python -m pstats <file>`, or `snakeviz <file>`.
+    """
+    if not authorized(request):
+        return forbidden()
+    path = request.app.state.profile_store.find(profile_id)
+    if path is None:
+        return JSONResponse(status_code=status.HTTP_404_NOT_FOUND,
+                            content={"detail": f"No profile with ID: {profile_id}"})
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""API Endpoints for health and readiness checks"""
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from starlette import status
+
+from challenge.models.api_models import HealthModel, ReadyModel
+from challenge.core.db_handler import DbHandler
+
+
+router = APIRouter()
+
+@router.get("/health", response_model=HealthModel)
+def get_health(request: Request):
+    """
+    Report the service health and the connection pool saturation.
+
+    It doesn't query the database, so it's cheap enough for frequent probes.
+    Saturation is the ratio of checked-out connections over the maximum
+    number of connections the pool can open (size + max overflow). The
+    concurrency limiter state and the event loop lag are included when
+    they're enabled.
+    """
+    pool = DbHandler().pool_status()
+    capacity = pool["size"] + pool["max_overflow"]
+    pool["saturation"] = round(pool["checked_out"] / capacity, 3) if capacity else 0.0
+    concurrency = None
+    limiter = getattr(request.app.state, "concurrency_limiter", None)
+    if limiter is not None:
+        concurrency = {"limit": int(limiter.limit),
+                       "in_flight": limiter.in_flight,
+                       "queued": limiter.queued}
+    monitor = getattr(request.app.state, "loop_monitor", None)
+    return HealthModel(status="ok",
+                       ready=request.app.state.ready,
+                       pool=pool,
+                       concurrency=concurrency,
+                       loop=monitor.status() if monitor is not None else None)
+
+@router.get("/ready", response_model=ReadyModel,
+            responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ReadyModel}})
+def get_ready(request: Request):
+    """
+    Report whether the service can receive traffic.
+
+    Returns 200 once the database warm-up has completed, 503 before.
+    """
+    if not request.app.state.ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content={"ready": False})
+    return ReadyModel(ready=True)
@@ -1,15 +1,23 @@
 # -*- coding: utf-8 -*-
 """API Leads module"""
 
-from fastapi import APIRouter, Request, Path
-from typing import List
+from fastapi import APIRouter, Request, Path, Query
+from fastapi.responses import JSONResponse
+from typing import List, Optional, Union
 
 from challenge.models.api_models import (CreateLeadModel,
                                          ResponseLeadId,
-                                         ResponseLead)
+                                         ResponseLead,
+                                         BatchLeadsModel,
+                                         BulkLeadsModel,
+                                         ResponseBulkLeads)
 from challenge.exceptions import (StudentDoesNotExist,
                                   StudentAlreadyExists)
 from challenge.core.db_handler import DbHandler
+from challenge.core.concurrency import priority, LOW_PRIORITY
+from challenge.core.rate_limit import rate_limit_class, IMPORT_ROUTES
+from challenge.core.deadline import request_timeout
+from challenge.utils.query_params import parse_ids, parse_fields, project
 
 
 router = APIRouter()
@@ -46,21 +54,99 @@ async def create_lead(lead: CreateLeadModel, request: Request):
     logger.info(f"Lead {lead_in_db} created successfully")
     return {"student_id": lead_in_db}
 
-@router.get("/", response_model=List[ResponseLead])
-async def get_leads(request: Request):
+@router.post("/bulk", response_model=ResponseBulkLeads)
+@priority(LOW_PRIORITY)
+@rate_limit_class(IMPORT_ROUTES)
+@request_timeout(60000)
+async def create_leads_in_bulk(bulk: BulkLeadsModel, request: Request):
     """
-    Retrieve all lead records from the database.
+    Create many leads at once, in chunks of `BULK_CHUNK_SIZE` rows.
 
     Args:
+        bulk (BulkLeadsModel): Up to `MAX_BULK_LEADS` leads, and what to do
+        when a DNI exists (`on_conflict`):
+        - skip: keep the existing student. This is the default.
+        - update: overwrite the existing student with the lead.
+        - report: keep the existing student and return its DNI in `conflicts`.
         request (Request): The FastAPI request object, used for logging.
 
     Returns:
-        List[ResponseLead]: A list of lead records. Each record is represented as an instance of ResponseLead.
+        ResponseBulkLeads: The ID of the student of every DNI, the number of
+        students created and updated, and the DNIs in conflict.
     """
     logger = request.app.logger
+    logger.info(f"Creating {len(bulk.leads)} leads in bulk...")
+    db_handler = DbHandler()
+    result = await db_handler._bulk_create_students(
+        leads=[lead.model_dump() for lead in bulk.leads],
+        on_conflict=bulk.on_conflict)
+    logger.info(f"Bulk leads: {result['created']} created, {result['updated']} updated, "
+                f"{len(result['conflicts'])} conflicts")
+    return result
+
+@router.get("/", response_model=Union[List[ResponseLead], BatchLeadsModel])
+async def get_leads(request: Request,
+                    ids: Optional[List[str]] = Query(None),
+                    fields: Optional[List[str]] = Query(None)):
+    """
+    Retrieve all lead records from the database, or only the requested ones.
+
+    Args:
+        request (Request): The FastAPI request object, used for logging.
+        ids (Optional[List[str]]): IDs of the leads to retrieve, repeated
+        (`?ids=1&ids=2`) or comma separated (`?ids=1,2`). Up to `MAX_BATCH_IDS`.
+        fields (Optional[List[str]]): Fields of `ResponseLead` to return,
+        repeated (`?fields=dni&fields=name`) or comma separated (`?fields=dni,name`).
+        Only those columns are selected from the database.
+
+    Returns:
+        List[ResponseLead]: Without `ids`, a list of lead records. Each record
+        is represented as an instance of ResponseLead.
+        BatchLeadsModel: With `ids`, the leads found, in the requested order,
+        and the IDs that don't exist.
+        With `fields`, the leads only have the requested fields.
+    """
+    logger = request.app.logger
+    db_handler = DbHandler()
+    selected = None if fields is None else parse_fields(fields, ResponseLead.model_fields)
+    if ids is not None:
+        lead_ids = parse_ids(ids)
+        logger.info(f"Getting {len(lead_ids)} leads by ID...")
+        leads = await db_handler._get_students_by_ids(lead_ids, fields=selected)
+        found = {lead.student_id if selected is None else lead["student_id"]: lead
+                 for lead in leads}
+        leads = [found[lead_id] for lead_id in lead_ids if lead_id in found]
+        missing = [lead_id for lead_id in lead_ids if lead_id not in found]
+        if selected is None:
+            return {"leads": leads, "missing": missing}
+        return JSONResponse({"leads": project(leads, selected), "missing": missing})
     logger.info("Getting leads...")
+    leads = await db_handler._get_all_students(fields=selected)
+    if selected is None:
+        return leads
+    return JSONResponse(project(leads, selected))
+
+@router.get("/search", response_model=List[ResponseLead])
+async def search_leads(request: Request,
+                       q: str = Query(min_length=1, max_length=100),
+                       limit: int = Query(10, gt=0, le=100)):
+    """
+    Search leads by DNI, or by partial or approximate name or email.
+
+    Args:
+        request (Request): The FastAPI request object, used for logging.
+        q (str): Exact DNI, or part of the name or email, of the lead.
+        limit (int): The maximum number of leads to return.
+        Must be > 0 and <= 100. Default is 10.
+
+    Returns:
+        List[ResponseLead]: Matching leads. Exact DNI matches come first,
+        then name or email prefix matches, then the most similar ones.
+    """
+    logger = request.app.logger
+    logger.info(f"Searching leads matching '{q}'...")
     db_handler = DbHandler()
-    leads = await db_handler._get_all_students()
+    leads = await db_handler._search_students(query=q, limit=limit)
     return leads
 
 @router.get("/{register_id}", response_model=ResponseLead)
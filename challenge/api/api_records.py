@@ -1,13 +1,26 @@
 # -*- coding: utf-8 -*-
 """API record module"""
 
-from fastapi import APIRouter, Request, Path, Query
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Request, Path, Query, Header
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import AsyncIterator, List, Optional, Set, Union
+
+from challenge import settings
+from challenge.constants import CHANGE_FEED_PAGE, MAX_RECORDS_PAGE
 
 from challenge.models.api_models import (AddLeadRecord,
                                          ResponseSubjectEnroll,
-                                         RetriveLeadRecord)
+                                         RetriveLeadRecord,
+                                         BatchRecordsModel,
+                                         SyncRecordsModel)
 from challenge.core.db_handler import DbHandler
+from challenge.core.concurrency import priority, LOW_PRIORITY
+from challenge.core.rate_limit import rate_limit_class, IMPORT_ROUTES
+from challenge.core.deadline import deadline_scope, request_timeout
+from challenge.core.change_feed import Subscription, format_cursor, sse_comment, sse_event
+from challenge.utils.query_params import naive_utc, parse_cursor, parse_ids, parse_fields, project
 from challenge.exceptions import (StudentDoesNotExist,
                                   UnenrolledStudent)
 
@@ -15,6 +28,8 @@ from challenge.exceptions import (StudentDoesNotExist,
 router = APIRouter()
 
 @router.post("/", response_model=ResponseSubjectEnroll)
+@priority(LOW_PRIORITY)
+@rate_limit_class(IMPORT_ROUTES)
 async def load_complete_record(lead: AddLeadRecord, request: Request):
     """
     Load a complete record for a student lead.
@@ -76,6 +91,105 @@ async def load_complete_record(lead: AddLeadRecord, request: Request):
     logger.info(f"Lead with DNI:{lead.dni} enrolled to {lead.subject} sucessfully")
     return {"id": enroll_id}
 
+async def query_in_stream(method, *args, **kwargs):
+    """Await a DbHandler query with a deadline of its own, since streams have none."""
+    with deadline_scope(settings.REQUEST_TIMEOUT_MS / 1000):
+        return await method(*args, **kwargs)
+
+async def record_events(db_handler: DbHandler,
+                        subscription: Subscription,
+                        last_ids: List[int]) -> AsyncIterator[str]:
+    """
+    Server-Sent Events with the new records of a change feed subscription.
+
+    The records after the cursor `last_ids`, the last ID of every shard, are
+    read from the database first, in pages of `CHANGE_FEED_PAGE`, and again
+    whenever the subscription falls behind. Then every published record is
+    sent as it arrives, in a single query per batch. A comment is sent when
+    there is nothing new, as heartbeat.
+
+    The ID of each event is the cursor after it, with the greatest record ID
+    sent so far of every shard, so a client that reconnects with
+    `Last-Event-ID` resumes after it on every shard.
+    """
+    last_ids = list(last_ids)
+    catching_up = True
+    caught_up: Set[int] = set()
+    try:
+        while True:
+            if catching_up:
+                records = await query_in_stream(db_handler._get_records_after,
+                                                last_ids,
+                                                CHANGE_FEED_PAGE)
+                catching_up = len(records) == CHANGE_FEED_PAGE
+                caught_up.update(record.id for record in records)
+            else:
+                record_ids, catching_up = await subscription.next(
+                    settings.CHANGE_FEED_HEARTBEAT_SECONDS)
+                if catching_up:
+                    continue
+                if not record_ids:
+                    yield sse_comment("keep-alive")
+                    continue
+                # Published while the stream was catching up
+                record_ids = sorted(set(record_ids) - caught_up)
+                caught_up.clear()
+                records = list()
+                if record_ids:
+                    records = sorted(await query_in_stream(db_handler._get_records_by_ids,
+                                                           record_ids),
+                                     key=lambda record: record.id)
+            for record in records:
+                shard = db_handler._record_shard(record.id)
+                last_ids[shard] = max(last_ids[shard], record.id)
+                yield sse_event("record", record.model_dump_json(), format_cursor(last_ids))
+    finally:
+        db_handler._change_feed.unsubscribe(subscription)
+
+@router.get("/stream")
+async def stream_records(request: Request,
+                         last_id: Optional[str] = Query(None),
+                         last_event_id: Optional[str] = Header(None)):
+    """
+    Stream the new records as Server-Sent Events (`text/event-stream`).
+
+    Every record created by `POST /records` or `POST /enroll/subject` is sent
+    once committed, as a `record` event with the fields of `RetriveLeadRecord`.
+    To resume after a disconnection, the records after the last one received
+    are sent first.
+
+    Args:
+        request (Request): The FastAPI request object, used for logging.
+        last_id (Optional[str]): Send the records after this event ID first:
+        the last record ID of every shard, comma separated, or a single ID for
+        every shard.
+        last_event_id (Optional[str]): The `Last-Event-ID` header, sent by the
+        browsers when they reconnect. It takes precedence over `last_id`.
+        Without any, only the records created from now on are sent.
+
+    Returns:
+        StreamingResponse: The events, until the client disconnects.
+    """
+    logger = request.app.logger
+    db_handler = DbHandler()
+    # Subscribe before reading the last ID, so no record is lost in between
+    subscription = db_handler._change_feed.subscribe()
+    try:
+        if last_event_id is not None:
+            last_ids = parse_cursor(last_event_id, db_handler._shards, ("header", "last-event-id"))
+        elif last_id is not None:
+            last_ids = parse_cursor(last_id, db_handler._shards, ("query", "last_id"))
+        else:
+            last_ids = await db_handler._get_last_record_ids()
+    except BaseException:
+        db_handler._change_feed.unsubscribe(subscription)
+        raise
+    logger.info(f"Streaming records after IDs {format_cursor(last_ids)}...")
+    return StreamingResponse(record_events(db_handler, subscription, last_ids),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache",
+                                      "X-Accel-Buffering": "no"})
+
 @router.get("/{record_id}", response_model=RetriveLeadRecord)
 async def get_record_by_id(request: Request, record_id: int = Path(gt = 0)):
     """
@@ -102,36 +216,111 @@ async def get_record_by_id(request: Request, record_id: int = Path(gt = 0)):
     record_built = await db_handler._build_record_by_id(record_id=record_id)
     return record_built
 
-@router.get("/", response_model=List[RetriveLeadRecord])
+@router.get("/", response_model=Union[List[RetriveLeadRecord], BatchRecordsModel, SyncRecordsModel])
+@request_timeout(10000)
 async def get_all_records(request: Request,
                           start: int = Query(0, ge=0),
-                          limit: int = Query(10, gt=0)):
+                          limit: int = Query(10, gt=0, le=MAX_RECORDS_PAGE),
+                          career: Optional[str] = Query(None, min_length=1),
+                          subject: Optional[str] = Query(None, min_length=1),
+                          year_enroll: Optional[int] = Query(None, gt=0),
+                          enroll_times: Optional[int] = Query(None, gt=0),
+                          date_from: Optional[datetime] = Query(None),
+                          date_to: Optional[datetime] = Query(None),
+                          ids: Optional[List[str]] = Query(None),
+                          fields: Optional[List[str]] = Query(None),
+                          updated_since: Optional[datetime] = Query(None),
+                          after_id: int = Query(0, ge=0)):
     """
-    Retrieve all complete records with pagination.
+    Retrieve all complete records with pagination and optional filters,
+    or only the requested ones.
+
+    Filters are combined with AND and applied by the database before the
+    pagination, so `start` and `limit` count matching records only.
+    With `ids`, the records are looked up in a single query, and the
+    pagination and filters are ignored. With `fields`, only those fields
+    are selected from the database and returned.
+
+    With `updated_since`, only the records created or changed after the
+    watermark (`updated_since`, `after_id`) are returned, oldest change
+    first, up to `limit`, with the watermark of the next call. Mirrors
+    sync in as many calls as changes, instead of reading every record.
 
     Args:
         request (Request): The FastAPI request object, used for logging.
         start (int): The index to start fetching records from.
         Must be >= 0. Default is 0.
         limit (int): The maximum number of records to return.
-        Must be > 0. Default is 10.
+        Must be > 0 and <= `MAX_RECORDS_PAGE`. Default is 10.
+        career (Optional[str]): Only records of this career.
+        subject (Optional[str]): Only records of this subject.
+        year_enroll (Optional[int]): Only students enrolled in the career this year.
+        enroll_times (Optional[int]): Only enrollments with this enroll times.
+        date_from (Optional[datetime]): Only records created at or after this date.
+        date_to (Optional[datetime]): Only records created at or before this date.
+        Times with an offset are converted to UTC, naive ones are taken as UTC.
+        ids (Optional[List[str]]): IDs of the records to retrieve, repeated
+        (`?ids=1&ids=2`) or comma separated (`?ids=1,2`). Up to `MAX_BATCH_IDS`.
+        fields (Optional[List[str]]): Fields of `RetriveLeadRecord` to return,
+        repeated (`?fields=id&fields=name`) or comma separated (`?fields=id,name`).
+        updated_since (Optional[datetime]): Only records changed at or after
+        this time, in UTC as the dates. `start` is ignored.
+        after_id (int): Of the records changed exactly at `updated_since`,
+        only the ones with a greater ID. Default is 0.
 
     Returns:
         List[RetriveLeadRecord]: A list of lead records starting from 'start' index
         up to 'limit'.
+        BatchRecordsModel: With `ids`, the records found, in the requested order,
+        and the IDs that don't exist.
+        SyncRecordsModel: With `updated_since`, the changed records, the
+        watermark to continue from, and whether there may be more changes.
+        With `fields`, the records only have the requested fields.
     """
     logger = request.app.logger
-    logger.info(f"Getting complete records from {start} to {start + limit}...")
     db_handler = DbHandler()
-    all_record_ids = await db_handler._get_all_record_ids()
-
-    if start >= len(all_record_ids):
-        return []
-    paginated_ids = all_record_ids[start:start + limit]
-    
-    records_built = list()
-    for record_id in paginated_ids:
-        records_built.append(
-            await db_handler._build_record_by_id(record_id=record_id)
-        )
-    return records_built
+    selected = None if fields is None else parse_fields(fields, RetriveLeadRecord.model_fields)
+    date_from, date_to, updated_since = map(naive_utc, (date_from, date_to, updated_since))
+    if ids is not None:
+        record_ids = parse_ids(ids)
+        logger.info(f"Getting {len(record_ids)} complete records by ID...")
+        records = await db_handler._get_records_by_ids(record_ids, fields=selected)
+        found = {record.id if selected is None else record["id"]: record for record in records}
+        records = [found[record_id] for record_id in record_ids if record_id in found]
+        missing = [record_id for record_id in record_ids if record_id not in found]
+        if selected is None:
+            return {"records": records, "missing": missing}
+        return JSONResponse({"records": project(records, selected), "missing": missing})
+    if updated_since is not None:
+        logger.info(f"Getting {limit} records changed since {updated_since} (ID {after_id})...")
+        records = await db_handler._get_changed_records(updated_since=updated_since,
+                                                        after_id=after_id,
+                                                        limit=limit,
+                                                        career=career,
+                                                        subject=subject,
+                                                        year_enroll=year_enroll,
+                                                        enroll_times=enroll_times,
+                                                        date_from=date_from,
+                                                        date_to=date_to,
+                                                        fields=selected)
+        if records:
+            last = records[-1] if selected is not None else records[-1].model_dump()
+            updated_since, after_id = last["changed_at"], last["id"]
+        changes = {"next": {"updated_since": updated_since, "after_id": after_id},
+                   "has_more": len(records) == limit}
+        if selected is None:
+            return {"records": records, **changes}
+        return JSONResponse(jsonable_encoder({"records": project(records, selected), **changes}))
+    logger.info(f"Getting complete records from {start} to {start + limit}...")
+    records = await db_handler._get_records(start=start,
+                                            limit=limit,
+                                            career=career,
+                                            subject=subject,
+                                            year_enroll=year_enroll,
+                                            enroll_times=enroll_times,
+                                            date_from=date_from,
+                                            date_to=date_to,
+                                            fields=selected)
+    if selected is None:
+        return records
+    return JSONResponse(project(records, selected))
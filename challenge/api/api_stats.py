@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""API Endpoints for enrollment stats"""
+
+from fastapi import APIRouter, Request
+from typing import List
+
+from challenge.constants import (STAT_CAREER,
+                                 STAT_YEAR,
+                                 STAT_SUBJECT,
+                                 STAT_ENROLL_TIMES)
+from challenge.models.api_models import StatEntryModel, StatsModel
+from challenge.core.db_handler import DbHandler
+
+
+router = APIRouter()
+
+async def get_stat_entries(metric: str) -> List[StatEntryModel]:
+    """Read the counters of a metric from the enrollment_stats table."""
+    db_handler = DbHandler()
+    return [StatEntryModel(key=key, enrollments=total)
+            for key, total in await db_handler._get_stats(metric)]
+
+@router.get("/", response_model=StatsModel)
+async def get_stats(request: Request):
+    """
+    Retrieve every enrollment count: per career, subject, year and enroll times.
+
+    The counts are read from the enrollment_stats table, which is updated
+    with every enrollment, so no enrollment record is scanned.
+    """
+    logger = request.app.logger
+    logger.info("Getting enrollment stats...")
+    return StatsModel(careers=await get_stat_entries(STAT_CAREER),
+                      subjects=await get_stat_entries(STAT_SUBJECT),
+                      years=await get_stat_entries(STAT_YEAR),
+                      enroll_times=await get_stat_entries(STAT_ENROLL_TIMES))
+
+@router.get("/careers", response_model=List[StatEntryModel])
+async def get_career_stats(request: Request):
+    """Retrieve the number of students enrolled in each career, by career name."""
+    request.app.logger.info("Getting career stats...")
+    return await get_stat_entries(STAT_CAREER)
+
+@router.get("/subjects", response_model=List[StatEntryModel])
+async def get_subject_stats(request: Request):
+    """Retrieve the number of enrollments of each subject, by subject name."""
+    request.app.logger.info("Getting subject stats...")
+    return await get_stat_entries(STAT_SUBJECT)
+
+@router.get("/years", response_model=List[StatEntryModel])
+async def get_year_stats(request: Request):
+    """Retrieve the number of career enrollments of each year."""
+    request.app.logger.info("Getting year stats...")
+    return await get_stat_entries(STAT_YEAR)
+
+@router.get("/enroll-times", response_model=List[StatEntryModel])
+async def get_enroll_times_stats(request: Request):
+    """Retrieve the distribution of subject enrollments by enroll times."""
+    request.app.logger.info("Getting enroll times stats...")
+    return await get_stat_entries(STAT_ENROLL_TIMES)
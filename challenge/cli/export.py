@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Columnar snapshot export of the lead records, for offline analytics.
+
+Streams the records in chunks ordered by their subject enrollment ID, and
+appends them to a snapshot directory (see `challenge/core/snapshot.py`).
+Running it again only exports the records after the last exported ID of
+every shard, so the records created meanwhile on a shard that lags behind
+are exported too.
+Point `DATABASE_URL` to a replica to keep the reads off the primary.
+
+Usage:
+    challenge-export snapshots/records
+    challenge-export snapshots/records --chunk-size 50000 --full
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from typing import List, Optional
+
+from challenge.core.db_handler import DbHandler
+from challenge.core.snapshot import COLUMNS, SnapshotWriter
+
+
+EXPORT_FIELDS = [name for name in COLUMNS if name != "id"]
+
+
+async def export(writer: SnapshotWriter, chunk_size: int) -> int:
+    """
+    Append the records after the last exported ID of every shard, a chunk per statement.
+
+    Returns:
+        int: Number of records exported.
+    """
+    db_handler = DbHandler()
+    exported = 0
+    try:
+        while True:
+            records = await db_handler._get_records_after(writer.last_ids, chunk_size,
+                                                          fields=EXPORT_FIELDS)
+            if not records:
+                return exported
+            writer.append(records)
+            exported += len(records)
+            print(f"Exported {exported} records, up to IDs {writer.last_ids}")
+    finally:
+        await db_handler.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export the lead records to a columnar snapshot.")
+    parser.add_argument("path", help="Directory of the snapshot, created if needed.")
+    parser.add_argument("--chunk-size", type=int, default=10_000,
+                        help="Records read by each statement and appended at once.")
+    parser.add_argument("--full", action="store_true",
+                        help="Drop the exported records and export every record again.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point of the `challenge-export` command."""
+    args = parse_args(argv)
+    writer = SnapshotWriter(args.path, truncate=args.full, shards=DbHandler()._shards)
+    started = time.perf_counter()
+    exported = asyncio.run(export(writer, args.chunk_size))
+    print(f"{exported} new records in {time.perf_counter() - started:.1f}s, "
+          f"{writer.rows} in {args.path}")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Partition maintenance of subject_enrollments.
+
+Requires the table to be converted first with
+`postgresql/migrations/004_partition_subject_enrollments.sql`.
+When sharded, every command runs on each shard.
+
+Usage:
+    challenge-partitions list
+    challenge-partitions ensure --ahead 2
+    challenge-partitions archive --keep-years 5
+"""
+
+import argparse
+import asyncio
+from typing import List, Optional
+
+from challenge import settings
+from challenge.core import partitions
+from challenge.core.db_handler import DbHandler
+
+
+async def run(args: argparse.Namespace) -> None:
+    db_handler = DbHandler()
+    engines = db_handler._engines
+    try:
+        for shard, engine in enumerate(engines):
+            if len(engines) > 1:
+                print(f"Shard {shard}:")
+            await run_on_engine(args, engine)
+    finally:
+        await db_handler.close()
+
+
+async def run_on_engine(args: argparse.Namespace, engine) -> None:
+    if args.command == "list":
+        async with engine.connect() as connection:
+            if not await partitions.is_partitioned(connection):
+                print(f"{partitions.PARENT_TABLE} is not partitioned")
+                return
+            for year, name in await partitions.list_partitions(connection):
+                lower, upper = partitions.partition_bounds(year)
+                print(f"{name}: {lower} to {upper}")
+    elif args.command == "ensure":
+        created = await partitions.ensure_partitions(engine, args.ahead,
+                                                     first_year=args.first_year)
+        print(f"Created {len(created)} partitions: {', '.join(created) or '-'}")
+    elif args.command == "archive":
+        archived = await partitions.archive_partitions(engine, args.keep_years)
+        print(f"Archived {len(archived)} partitions in the "
+              f"{partitions.ARCHIVE_SCHEMA} schema: {', '.join(archived) or '-'}")
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Maintain the yearly partitions of subject_enrollments.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="List the yearly partitions.")
+    ensure = commands.add_parser("ensure", help="Create the partitions of the upcoming years.")
+    ensure.add_argument("--ahead", type=int, default=settings.PARTITIONS_AHEAD,
+                        help="Years after the current one to create.")
+    ensure.add_argument("--first-year", type=int, default=None,
+                        help="Also create the partitions from this year, for older rows.")
+    archive = commands.add_parser("archive", help="Detach the old partitions into the archive schema.")
+    archive.add_argument("--keep-years", type=int, default=settings.PARTITION_RETENTION_YEARS,
+                         help="Full years kept before the current one.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point of the `challenge-partitions` command."""
+    asyncio.run(run(parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
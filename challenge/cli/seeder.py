@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""Synthetic data seeder.
+
+Generates careers, subjects, career_subject links, students, student_career
+links and subject_enrollments with deterministic seeds, configurable
+cardinalities and zipf skew, and loads them with asyncpg COPY in parallel
+batches.
+
+Usage:
+    challenge-seed --students 2000000 --truncate
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import asyncpg
+
+from challenge.core.db_handler import database_dsn
+
+
+FIRST_NAMES = ["Alice", "Bob", "Carol", "David", "Emma", "Facundo", "Gabriela",
+               "Hugo", "Isabel", "Juan", "Karina", "Lucas", "Maria", "Nicolas",
+               "Olivia", "Pablo", "Quimey", "Rocio", "Santiago", "Teresa",
+               "Ulises", "Valentina", "Walter", "Ximena", "Yanina", "Zoe"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Garcia", "Martinez",
+              "Lopez", "Gonzalez", "Rodriguez", "Fernandez", "Perez", "Gomez",
+              "Diaz", "Sanchez", "Romero", "Sosa", "Torres", "Alvarez", "Ruiz",
+              "Benitez", "Acosta", "Medina", "Herrera", "Aguirre", "Molina"]
+STREETS = ["San Martin", "Belgrano", "Rivadavia", "Sarmiento", "Mitre",
+           "Moreno", "Urquiza", "Alberdi", "Independencia", "Libertad"]
+EMAIL_DOMAINS = ["example.com", "mail.com", "campus.edu", "inbox.net"]
+CAREER_FIELDS = ["electrical", "civil", "chemical", "mechanical", "industrial",
+                 "software", "biomedical", "environmental", "materials", "nuclear",
+                 "aerospace", "naval", "agricultural", "mining", "petroleum"]
+CAREER_KINDS = ["engineering", "technology", "sciences", "management"]
+SUBJECT_TOPICS = ["mathematics", "physics", "chemistry", "biology", "computer_science",
+                  "statistics", "economics", "thermodynamics", "electronics",
+                  "mechanics", "algebra", "calculus", "programming", "databases",
+                  "signals", "control_systems", "materials_science", "fluid_mechanics",
+                  "structures", "geology", "ethics", "project_management"]
+SUBJECT_LEVELS = ["i", "ii", "iii", "advanced"]
+
+STUDENT_COLUMNS = ["student_id", "dni", "name", "email", "phone", "address", "date"]
+STUDENT_CAREER_COLUMNS = ["student_id", "career_id", "year_enroll", "date"]
+ENROLLMENT_COLUMNS = ["student_id", "career_subject_id", "enroll_times", "date"]
+# Student DNIs are derived from their ID, well above the pre-set ones
+DNI_BASE = 20_000_000
+
+
+@dataclass(frozen=True)
+class SeedSpec:
+    """Cardinalities and distribution of the generated dataset."""
+    students: int = 10_000
+    careers: int = 10
+    subjects: int = 60
+    subjects_per_career: int = 12
+    max_careers_per_student: int = 2
+    enrollments_per_career: int = 4
+    skew: float = 1.1
+    first_year: int = 2010
+    last_year: int = 2024
+    seed: int = 42
+    batch_size: int = 10_000
+
+
+@dataclass
+class Catalog:
+    """Reference rows, with their explicit IDs."""
+    careers: List[Tuple[int, str]] = field(default_factory=list)
+    subjects: List[Tuple[int, str, int]] = field(default_factory=list)
+    career_subjects: List[Tuple[int, int, int]] = field(default_factory=list)
+
+    def subjects_by_career(self) -> Dict[int, List[int]]:
+        """Returns the career_subject IDs of each career, in popularity order."""
+        result: Dict[int, List[int]] = {career_id: [] for career_id, _ in self.careers}
+        for career_subject_id, career_id, _ in self.career_subjects:
+            result[career_id].append(career_subject_id)
+        return result
+
+
+def zipf_cum_weights(size: int, skew: float) -> List[float]:
+    """Cumulative zipf weights: the k-th element has weight 1 / k^skew."""
+    return list(itertools.accumulate(1 / (rank ** skew) for rank in range(1, size + 1)))
+
+
+def _names(first: Sequence[str], second: Sequence[str], amount: int,
+           taken: Sequence[str] = ()) -> List[str]:
+    """Builds `amount` unique "first_second" names, numbered once combinations run out."""
+    names = list()
+    taken = set(taken)
+    for round_number in itertools.count(1):
+        for part_a, part_b in itertools.product(first, second):
+            name = f"{part_a}_{part_b}" if round_number == 1 else f"{part_a}_{part_b}_{round_number}"
+            if name not in taken:
+                names.append(name)
+                if len(names) == amount:
+                    return names
+    return names
+
+
+def generate_catalog(spec: SeedSpec,
+                     career_offset: int = 0,
+                     subject_offset: int = 0,
+                     career_subject_offset: int = 0,
+                     taken_names: Sequence[str] = ()) -> Catalog:
+    """
+    Generate the careers, subjects and career_subject links.
+
+    Subjects are assigned to careers with zipf skew, so the first subjects
+    (the "basic" ones) are shared by most careers.
+
+    Args:
+        spec (SeedSpec): Dataset specification.
+        career_offset (int): Last career ID already used in the database.
+        subject_offset (int): Last subject ID already used in the database.
+        career_subject_offset (int): Last career_subject ID already used.
+        taken_names (Sequence[str]): Career and subject names that already exist.
+
+    Returns:
+        Catalog: The generated reference rows.
+    """
+    rng = random.Random(f"{spec.seed}-catalog")
+    catalog = Catalog()
+    career_names = _names(CAREER_FIELDS, CAREER_KINDS, spec.careers, taken_names)
+    subject_names = _names(SUBJECT_TOPICS, SUBJECT_LEVELS, spec.subjects, taken_names)
+    catalog.careers = [(career_offset + index, name)
+                       for index, name in enumerate(career_names, start=1)]
+    catalog.subjects = [(subject_offset + index, name, rng.randint(2, 6))
+                        for index, name in enumerate(subject_names, start=1)]
+
+    per_career = min(spec.subjects_per_career, len(catalog.subjects))
+    career_subject_id = career_subject_offset
+    for career_id, _ in catalog.careers:
+        # Weighted sampling without replacement (Efraimidis-Spirakis keys)
+        keys = [(rng.random() ** (rank ** spec.skew), subject_id)
+                for rank, (subject_id, _, _) in enumerate(catalog.subjects, start=1)]
+        chosen = [subject_id for _, subject_id in sorted(keys, reverse=True)[:per_career]]
+        for subject_id in chosen:
+            career_subject_id += 1
+            catalog.career_subjects.append((career_subject_id, career_id, subject_id))
+    return catalog
+
+
+def _weighted_sample(rng: random.Random, population: Sequence[int],
+                     cum_weights: Sequence[float], amount: int) -> List[int]:
+    """Weighted sampling of `amount` distinct elements (Efraimidis-Spirakis keys)."""
+    weights = [weight - previous for weight, previous in zip(cum_weights, [0.0, *cum_weights])]
+    keys = [(rng.random() ** (1 / weight), element) for weight, element in zip(weights, population)]
+    return [element for _, element in sorted(keys, reverse=True)[:amount]]
+
+
+def _date_after(rng: random.Random, start: datetime.datetime, days: int,
+                latest: datetime.datetime) -> datetime.datetime:
+    """Random date within `days` days after `start`, and before `latest`."""
+    seconds = min(days * 86400, int((latest - start).total_seconds()))
+    return start + datetime.timedelta(seconds=rng.randrange(seconds)) if seconds > 0 else latest
+
+
+def generate_student_batch(spec: SeedSpec,
+                           subjects_by_career: Dict[int, List[int]],
+                           student_offset: int,
+                           batch_index: int) -> Tuple[list, list, list]:
+    """
+    Generate the students of one batch with their career and subject enrollments.
+
+    Each batch has its own seed, so batches can be generated in any order, or
+    in parallel processes, and still produce the same dataset.
+
+    Args:
+        spec (SeedSpec): Dataset specification.
+        subjects_by_career (Dict[int, List[int]]): career_subject IDs per career.
+        student_offset (int): Last student ID already used in the database.
+        batch_index (int): Index of the batch to generate.
+
+    Returns:
+        Tuple[list, list, list]: students, student_career and subject_enrollments
+        rows, in the column order of the COPY statements.
+    """
+    rng = random.Random(f"{spec.seed}-students-{batch_index}")
+    career_ids = list(subjects_by_career)
+    career_weights = zipf_cum_weights(len(career_ids), spec.skew)
+    subject_weights = {career_id: zipf_cum_weights(len(ids), spec.skew)
+                       for career_id, ids in subjects_by_career.items()}
+    enroll_times_weights = zipf_cum_weights(4, spec.skew + 1)
+    # Nothing is dated after the last year, nor in the future
+    latest = min(datetime.datetime(spec.last_year + 1, 1, 1), datetime.datetime.now())
+
+    first = batch_index * spec.batch_size
+    last = min(first + spec.batch_size, spec.students)
+    students, student_careers, enrollments = list(), list(), list()
+    for index in range(first, last):
+        student_id = student_offset + index + 1
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        year = rng.randint(spec.first_year, spec.last_year)
+        created = _date_after(rng, datetime.datetime(year, 1, 1), 59, latest)
+        students.append((
+            student_id,
+            str(DNI_BASE + student_id),
+            f"{first_name} {last_name}",
+            f"{first_name}.{last_name}{student_id}@{rng.choice(EMAIL_DOMAINS)}".lower(),
+            f"555-{rng.randrange(10_000_000):07d}",
+            f"{rng.choice(STREETS)} {rng.randint(1, 9999)}",
+            created,
+        ))
+
+        amount_of_careers = rng.randint(1, spec.max_careers_per_student)
+        careers = {rng.choices(career_ids, cum_weights=career_weights)[0]
+                   for _ in range(amount_of_careers)}
+        for career_id in sorted(careers):
+            year_enroll = min(spec.last_year, year + rng.randrange(2))
+            enrolled = min(latest, created.replace(year=year_enroll))
+            student_careers.append((student_id, career_id, year_enroll, enrolled))
+            career_subjects = subjects_by_career[career_id]
+            if not career_subjects:
+                continue
+            amount_of_enrollments = min(len(career_subjects),
+                                        rng.randint(1, 2 * spec.enrollments_per_career - 1))
+            # A student enrolls once in each subject, so the enrollment keys
+            # (student, career_subject, enroll_times) are unique
+            for career_subject_id in _weighted_sample(rng, career_subjects,
+                                                      subject_weights[career_id],
+                                                      amount_of_enrollments):
+                enroll_times = rng.choices(range(1, 5), cum_weights=enroll_times_weights)[0]
+                enrollments.append((
+                    student_id,
+                    career_subject_id,
+                    enroll_times,
+                    _date_after(rng, enrolled, 5 * 365, latest),
+                ))
+    return students, student_careers, enrollments
+
+
+#==============================================================================
+# Loading
+async def _load_batch(pool: asyncpg.Pool, rows: Tuple[list, list, list]) -> int:
+    """COPY the rows of one batch in a single transaction, returns the row count."""
+    students, student_careers, enrollments = rows
+    async with pool.acquire() as connection:
+        async with connection.transaction():
+            await connection.copy_records_to_table(
+                "students", records=students, columns=STUDENT_COLUMNS)
+            await connection.copy_records_to_table(
+                "student_career", records=student_careers, columns=STUDENT_CAREER_COLUMNS)
+            await connection.copy_records_to_table(
+                "subject_enrollments", records=enrollments, columns=ENROLLMENT_COLUMNS)
+    return len(students) + len(student_careers) + len(enrollments)
+
+
+async def seed(spec: SeedSpec, dsn: str, workers: int, truncate: bool) -> int:
+    """
+    Generate and load the dataset.
+
+    Batches are generated in a process pool and loaded through a pool of
+    `workers` connections, each batch with three COPY statements.
+
+    Returns:
+        int: Number of rows loaded.
+    """
+    pool = await asyncpg.create_pool(dsn, min_size=workers, max_size=workers)
+    try:
+        async with pool.acquire() as connection:
+            if truncate:
+                await connection.execute(
+                    "TRUNCATE enrollment_stats, subject_enrollments, student_career, "
+                    "career_subject, students, subjects, careers RESTART IDENTITY CASCADE")
+            offsets = await connection.fetchrow(
+                """
+                SELECT (SELECT coalesce(max(student_id), 0) FROM students) AS students,
+                       (SELECT coalesce(max(id), 0) FROM careers) AS careers,
+                       (SELECT coalesce(max(id), 0) FROM subjects) AS subjects,
+                       (SELECT coalesce(max(id), 0) FROM career_subject) AS career_subject
+                """)
+            taken_names = [row["name"] for row in await connection.fetch(
+                "SELECT name FROM careers UNION SELECT name FROM subjects")]
+            catalog = generate_catalog(spec, offsets["careers"], offsets["subjects"],
+                                       offsets["career_subject"], taken_names)
+            async with connection.transaction():
+                await connection.copy_records_to_table(
+                    "careers", records=catalog.careers, columns=["id", "name"])
+                await connection.copy_records_to_table(
+                    "subjects", records=catalog.subjects,
+                    columns=["id", "name", "class_duration"])
+                await connection.copy_records_to_table(
+                    "career_subject", records=catalog.career_subjects,
+                    columns=["id", "career_id", "subject_id"])
+
+        subjects_by_career = catalog.subjects_by_career()
+        batches = range((spec.students + spec.batch_size - 1) // spec.batch_size)
+        loaded = len(catalog.careers) + len(catalog.subjects) + len(catalog.career_subjects)
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(workers * 2)
+
+        with ProcessPoolExecutor() as executor:
+            async def generate_and_load(batch_index: int) -> int:
+                async with semaphore:
+                    rows = await loop.run_in_executor(
+                        executor, generate_student_batch, spec, subjects_by_career,
+                        offsets["students"], batch_index)
+                    return await _load_batch(pool, rows)
+
+            for rows in await asyncio.gather(*(generate_and_load(b) for b in batches)):
+                loaded += rows
+
+        async with pool.acquire() as connection:
+            # Explicit IDs were used, move the sequences past them
+            for table, column in (("students", "student_id"), ("careers", "id"),
+                                  ("subjects", "id"), ("career_subject", "id")):
+                await connection.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                    f"(SELECT coalesce(max({column}), 1) FROM {table}))")
+            await connection.execute("ANALYZE")
+    finally:
+        await pool.close()
+    return loaded
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    defaults = SeedSpec()
+    parser = argparse.ArgumentParser(description="Load a synthetic dataset into the database.")
+    parser.add_argument("--students", type=int, default=defaults.students)
+    parser.add_argument("--careers", type=int, default=defaults.careers)
+    parser.add_argument("--subjects", type=int, default=defaults.subjects)
+    parser.add_argument("--subjects-per-career", type=int, default=defaults.subjects_per_career)
+    parser.add_argument("--max-careers-per-student", type=int,
+                        default=defaults.max_careers_per_student)
+    parser.add_argument("--enrollments-per-career", type=int,
+                        default=defaults.enrollments_per_career,
+                        help="Mean subject enrollments of a student in each career.")
+    parser.add_argument("--skew", type=float, default=defaults.skew,
+                        help="Zipf exponent of career, subject and enroll_times popularity.")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size,
+                        help="Students generated and copied per batch.")
+    parser.add_argument("--workers", type=int, default=4,
+                        help="Parallel COPY connections.")
+    parser.add_argument("--truncate", action="store_true",
+                        help="Empty every table before loading.")
+    parser.add_argument("--dsn", default=None,
+                        help="Database DSN. The database of the API by default.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point of the `challenge-seed` command."""
+    args = parse_args(argv)
+    spec = SeedSpec(students=args.students,
+                    careers=args.careers,
+                    subjects=args.subjects,
+                    subjects_per_career=args.subjects_per_career,
+                    max_careers_per_student=args.max_careers_per_student,
+                    enrollments_per_career=args.enrollments_per_career,
+                    skew=args.skew,
+                    seed=args.seed,
+                    batch_size=args.batch_size)
+    started = time.perf_counter()
+    loaded = asyncio.run(seed(spec, args.dsn or database_dsn(), args.workers, args.truncate))
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {loaded} rows in {elapsed:.1f}s ({loaded / elapsed:.0f} rows/s)")
+    print("Run `challenge-stats recompute` to count them in the enrollment stats.")
+
+
+if __name__ == "__main__":
+    main()
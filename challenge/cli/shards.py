@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Shard administration, for `SHARD_DATABASE_URLS` with more than one database.
+
+- init: interleave the ID sequences of the sharded tables, so the shard of a
+  row is known from its ID. Run it once on new shards, before any write.
+  Students that exist on the wrong shard are reported, they are not moved.
+- sync: copy the careers, subjects and career_subject rows of the first shard
+  to the others. Run it after every change to those tables.
+- check: compare the reference tables of every shard with the first one.
+
+Usage:
+    challenge-shards init
+    challenge-shards sync
+    challenge-shards check
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import List, Optional
+
+from challenge.core import sharding
+from challenge.core.db_handler import DbHandler
+
+
+async def init(db_handler: DbHandler) -> int:
+    """Configure the sequences of every shard. Returns 1 if a student is misplaced."""
+    engines = db_handler._engines
+    router = sharding.ShardRouter(len(engines))
+    misplaced = 0
+    for shard, engine in enumerate(engines):
+        await sharding.configure_sequences(engine, shard, len(engines))
+        shard_misplaced = await sharding.misplaced_students(engine, shard, router)
+        misplaced += shard_misplaced
+        print(f"Shard {shard}: sequences interleaved, {shard_misplaced} misplaced students")
+    if misplaced:
+        print(f"{misplaced} students are on the wrong shard and can't be found by DNI or ID.")
+        return 1
+    return 0
+
+
+async def sync(db_handler: DbHandler) -> int:
+    """Copy the reference tables of the first shard to the others."""
+    source, *targets = db_handler._engines
+    for shard, target in enumerate(targets, start=1):
+        copied = await sharding.copy_reference_tables(source, target)
+        print(f"Shard {shard}: {copied} reference rows copied")
+    return 0
+
+
+async def check(db_handler: DbHandler) -> int:
+    """Compare the reference tables of every shard. Returns 1 if any differs."""
+    source, *targets = db_handler._engines
+    expected = await sharding.reference_counts(source)
+    exit_code = 0
+    for shard, target in enumerate(targets, start=1):
+        counts = await sharding.reference_counts(target)
+        if counts != expected:
+            print(f"Shard {shard}: {counts}, expected {expected}. "
+                  f"Run `challenge-shards sync` to fix it.")
+            exit_code = 1
+    if not exit_code:
+        print(f"Reference tables are consistent on {len(targets) + 1} shards")
+    return exit_code
+
+
+COMMANDS = {"init": init, "sync": sync, "check": check}
+
+
+async def run(command: str) -> int:
+    db_handler = DbHandler()
+    if db_handler._router is None:
+        print("SHARD_DATABASE_URLS has less than two databases, there is nothing to do")
+        return 0
+    try:
+        return await COMMANDS[command](db_handler)
+    finally:
+        await db_handler.close()
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Administer the shards of the database.")
+    parser.add_argument("command", choices=sorted(COMMANDS),
+                        help="init: interleave the ID sequences. "
+                             "sync: copy the reference tables to every shard. "
+                             "check: compare the reference tables.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point of the `challenge-shards` command."""
+    args = parse_args(argv)
+    sys.exit(asyncio.run(run(args.command)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Enrollment stats maintenance.
+
+The enrollment_stats counters are updated with every enrollment made through
+the API. Rows loaded by other means, like `challenge-seed` or manual SQL,
+are only counted after a recompute.
+
+Usage:
+    challenge-stats recompute
+    challenge-stats check
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import List, Optional
+
+from challenge.core.db_handler import DbHandler
+
+
+async def recompute() -> int:
+    """Rebuild the counters from the base tables. Returns the exit code."""
+    db_handler = DbHandler()
+    try:
+        written = await db_handler._recompute_stats()
+    finally:
+        await db_handler.close()
+    print(f"Recomputed {written} enrollment counters")
+    return 0
+
+
+async def check() -> int:
+    """Compare the counters with GROUP BY queries. Returns 1 if any differs."""
+    db_handler = DbHandler()
+    try:
+        mismatches = await db_handler._check_stats()
+    finally:
+        await db_handler.close()
+    for metric, key, expected, stored in mismatches:
+        print(f"{metric}={key}: expected {expected}, stored {stored}")
+    if mismatches:
+        print(f"{len(mismatches)} enrollment counters don't match. "
+              f"Run `challenge-stats recompute` to fix them.")
+        return 1
+    print("Enrollment counters are consistent")
+    return 0
+
+
+COMMANDS = {"recompute": recompute, "check": check}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Maintain the enrollment stats counters.")
+    parser.add_argument("command", choices=sorted(COMMANDS),
+                        help="recompute: rebuild the counters. "
+                             "check: compare them with the base tables.")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point of the `challenge-stats` command."""
+    args = parse_args(argv)
+    sys.exit(asyncio.run(COMMANDS[args.command]()))
+
+
+if __name__ == "__main__":
+    main()
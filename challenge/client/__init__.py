@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""Async client of the API, for the services that call it."""
+
+from challenge.core.batching import BatchLoader
+from challenge.client.client import ChallengeClient
+from challenge.client.retry import RetryPolicy
+from challenge.exceptions import ApiRequestError
+
+__all__ = ["ApiRequestError", "BatchLoader", "ChallengeClient", "RetryPolicy"]
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""Async client of the API.
+
+A single `ChallengeClient` per service keeps a pool of keep-alive connections
+for every call. Concurrent `get_lead` and `get_record` calls are sent as batch
+lookups (`?ids=`), listings are paginated by async iterators, and idempotent
+calls are retried on transient errors. See `retry.py`.
+
+Usage:
+    async with ChallengeClient("http://0.0.0.0:8000") as client:
+        record = await client.get_record(42)
+        async for record in client.iter_records(career="civil_engineering"):
+            ...
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import httpx
+from starlette import status
+
+from challenge.core.batching import BatchLoader
+from challenge.client.retry import RetryPolicy, retry_after_seconds
+from challenge.constants import BULK_REPORT, BULK_SKIP, MAX_BATCH_IDS
+from challenge.exceptions import ApiRequestError
+from challenge.models.api_models import (AddLeadRecord,
+                                         BatchLeadsModel,
+                                         BatchRecordsModel,
+                                         ChangedLeadRecord,
+                                         CreateLeadModel,
+                                         EnrollStudentToCareer,
+                                         EnrollStudentToSubject,
+                                         ResponseBulkLeads,
+                                         ResponseLead,
+                                         RetriveLeadRecord)
+
+
+class ChallengeClient:
+    """Typed async methods for the leads, enroll and records routers."""
+
+    def __init__(self,
+                 base_url: str,
+                 timeout: float = 10.0,
+                 max_connections: int = 20,
+                 max_keepalive_connections: int = 10,
+                 retry: Optional[RetryPolicy] = None,
+                 batch_window: float = 0.0,
+                 request_timeout_ms: Optional[int] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        """
+        Client of the API at `base_url`.
+
+        Args:
+            base_url (str): URL of the API, for example `http://0.0.0.0:8000`.
+            timeout (float): Seconds to connect, and to wait for each answer.
+            max_connections (int): Connections of the pool.
+            max_keepalive_connections (int): Idle connections kept open.
+            retry (Optional[RetryPolicy]): Retries of the idempotent calls.
+            batch_window (float): Seconds to wait for more single lookups
+            before sending a batch. With 0, the lookups of the same event
+            loop iteration are batched.
+            request_timeout_ms (Optional[int]): Deadline asked to the server
+            for each request, with the `X-Request-Timeout` header.
+            transport (Optional[httpx.AsyncBaseTransport]): Custom transport,
+            for tests.
+        """
+        headers = dict()
+        if request_timeout_ms is not None:
+            headers["X-Request-Timeout"] = str(request_timeout_ms)
+        self._http = httpx.AsyncClient(base_url=base_url,
+                                       timeout=timeout,
+                                       headers=headers,
+                                       limits=httpx.Limits(
+                                           max_connections=max_connections,
+                                           max_keepalive_connections=max_keepalive_connections),
+                                       transport=transport)
+        self.retry = retry or RetryPolicy()
+        self._leads = BatchLoader(self._load_leads, MAX_BATCH_IDS, batch_window)
+        self._records = BatchLoader(self._load_records, MAX_BATCH_IDS, batch_window)
+
+    async def __aenter__(self) -> "ChallengeClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        """Close the connections of the pool."""
+        await self._http.aclose()
+
+    async def _request(self, method: str, url: str, idempotent: bool, **kwargs) -> Any:
+        """
+        Send a request, with retries, and decode its JSON answer.
+
+        Raises:
+            ApiRequestError: If the API answers with an error, after the retries.
+            httpx.TransportError: If the API can't be reached, after the retries.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = await self._http.request(method, url, **kwargs)
+            except httpx.TransportError as error:
+                if attempt >= self.retry.retries or not self.retry.should_retry_error(error, idempotent):
+                    raise
+                await asyncio.sleep(self.retry.wait(attempt))
+            else:
+                if response.is_success:
+                    return response.json()
+                if attempt >= self.retry.retries or not self.retry.should_retry_response(response, idempotent):
+                    raise ApiRequestError(error_detail(response), response.status_code)
+                await asyncio.sleep(self.retry.wait(attempt, retry_after_seconds(response)))
+            attempt += 1
+
+    async def _get(self, url: str, **params) -> Any:
+        params = {name: value for name, value in params.items() if value is not None}
+        return await self._request("GET", url, idempotent=True, params=params)
+
+    async def _post(self, url: str, body: Dict[str, Any], idempotent: bool = False) -> Any:
+        return await self._request("POST", url, idempotent=idempotent, json=body)
+
+    # Leads
+    async def create_lead(self, lead: CreateLeadModel) -> int:
+        """Create a lead, returns its student ID."""
+        return (await self._post("/leads/", lead.model_dump()))["student_id"]
+
+    async def create_leads_in_bulk(self,
+                                   leads: List[CreateLeadModel],
+                                   on_conflict: str = BULK_SKIP) -> ResponseBulkLeads:
+        """Create up to `MAX_BULK_LEADS` leads in a single request. See `POST /leads/bulk`."""
+        body = {"leads": [lead.model_dump() for lead in leads], "on_conflict": on_conflict}
+        # The DNIs are unique, so writing the same leads again leaves the same rows.
+        # Reported conflicts would include the leads of the lost attempt.
+        return ResponseBulkLeads(**await self._post("/leads/bulk", body,
+                                                    idempotent=on_conflict != BULK_REPORT))
+
+    async def get_lead(self, student_id: int) -> ResponseLead:
+        """
+        Lead with the given ID, looked up with the concurrent calls in a batch.
+
+        Raises:
+            ApiRequestError: If the lead doesn't exist.
+        """
+        lead = await self._leads.load(student_id)
+        if lead is None:
+            raise ApiRequestError(f"No Student with ID: {student_id}", status.HTTP_303_SEE_OTHER)
+        return lead
+
+    async def get_leads(self, student_ids: List[int]) -> BatchLeadsModel:
+        """Leads with the given IDs, in a single request per `MAX_BATCH_IDS` IDs."""
+        leads, missing = list(), list()
+        for start in range(0, len(student_ids), MAX_BATCH_IDS):
+            batch = BatchLeadsModel(**await self._get(
+                "/leads/", ids=join_ids(student_ids[start:start + MAX_BATCH_IDS])))
+            leads.extend(batch.leads)
+            missing.extend(batch.missing)
+        return BatchLeadsModel(leads=leads, missing=missing)
+
+    async def get_all_leads(self) -> List[ResponseLead]:
+        """Every lead."""
+        return [ResponseLead(**lead) for lead in await self._get("/leads/")]
+
+    async def search_leads(self, query: str, limit: int = 10) -> List[ResponseLead]:
+        """Leads by DNI, or by partial or approximate name or email."""
+        return [ResponseLead(**lead) for lead in await self._get("/leads/search", q=query, limit=limit)]
+
+    async def _load_leads(self, student_ids: List[int]) -> Dict[int, ResponseLead]:
+        batch = await self.get_leads(student_ids)
+        return {lead.student_id: lead for lead in batch.leads}
+
+    # Enroll
+    async def enroll_student_in_a_career(self, enrollment: EnrollStudentToCareer) -> int:
+        """Enroll a student in a career, returns the ID of the enrollment."""
+        return (await self._post("/enroll/career", enrollment.model_dump()))["id"]
+
+    async def enroll_student_in_a_subject(self, enrollment: EnrollStudentToSubject) -> int:
+        """Enroll a student in a subject, returns the ID of the enrollment record."""
+        return (await self._post("/enroll/subject", enrollment.model_dump()))["id"]
+
+    # Records
+    async def load_complete_record(self, record: AddLeadRecord) -> int:
+        """Create the lead, enrollments and record that are missing, returns the record ID."""
+        return (await self._post("/records/", record.model_dump()))["id"]
+
+    async def get_record(self, record_id: int) -> RetriveLeadRecord:
+        """
+        Record with the given ID, looked up with the concurrent calls in a batch.
+
+        Raises:
+            ApiRequestError: If the record doesn't exist.
+        """
+        record = await self._records.load(record_id)
+        if record is None:
+            raise ApiRequestError(f"Record with ID:{record_id} does not exist",
+                                  status.HTTP_303_SEE_OTHER)
+        return record
+
+    async def get_records_by_ids(self, record_ids: List[int]) -> BatchRecordsModel:
+        """Records with the given IDs, in a single request per `MAX_BATCH_IDS` IDs."""
+        records, missing = list(), list()
+        for start in range(0, len(record_ids), MAX_BATCH_IDS):
+            batch = BatchRecordsModel(**await self._get(
+                "/records/", ids=join_ids(record_ids[start:start + MAX_BATCH_IDS])))
+            records.extend(batch.records)
+            missing.extend(batch.missing)
+        return BatchRecordsModel(records=records, missing=missing)
+
+    async def _load_records(self, record_ids: List[int]) -> Dict[int, RetriveLeadRecord]:
+        batch = await self.get_records_by_ids(record_ids)
+        return {record.id: record for record in batch.records}
+
+    async def get_records(self, start: int = 0, limit: int = 10, **filters) -> List[RetriveLeadRecord]:
+        """A page of records. The filters are the ones of `GET /records`."""
+        page = await self._get("/records/", start=start, limit=limit, **filters)
+        return [RetriveLeadRecord(**record) for record in page]
+
+    async def iter_records(self, page_size: int = 100, **filters) -> AsyncIterator[RetriveLeadRecord]:
+        """Every record matching the filters, requested in pages of `page_size`."""
+        start = 0
+        while True:
+            page = await self.get_records(start=start, limit=page_size, **filters)
+            for record in page:
+                yield record
+            if len(page) < page_size:
+                return
+            start += page_size
+
+    async def iter_changes(self,
+                           updated_since: datetime,
+                           after_id: int = 0,
+                           page_size: int = 100,
+                           **filters) -> AsyncIterator[ChangedLeadRecord]:
+        """
+        Every record changed after the watermark, oldest change first.
+
+        The watermark to sync from next time is the `changed_at` and `id`
+        of the last record.
+        """
+        while True:
+            page = await self._get("/records/", updated_since=updated_since.isoformat(),
+                                   after_id=after_id, limit=page_size, **filters)
+            for record in page["records"]:
+                yield ChangedLeadRecord(**record)
+            if not page["has_more"]:
+                return
+            updated_since = datetime.fromisoformat(page["next"]["updated_since"])
+            after_id = page["next"]["after_id"]
+
+
+def join_ids(ids: List[int]) -> str:
+    """IDs of a batch lookup, comma separated."""
+    return ",".join(str(item) for item in ids)
+
+
+def error_detail(response: httpx.Response) -> str:
+    """Message of an error answer: its `detail`, or the whole body."""
+    try:
+        body: Union[Dict[str, Any], str] = response.json()
+    except ValueError:
+        return response.text
+    if isinstance(body, dict) and "detail" in body:
+        return str(body["detail"])
+    return str(body)
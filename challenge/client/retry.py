@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Retries of the client requests.
+
+Only requests that are safe to repeat are retried: idempotent ones on
+transient answers (connection issue, load shedding, deadline exceeded) and
+transport errors, and any request that was rate limited or whose connection
+failed before it was sent. Waits grow exponentially with full jitter, so the clients that failed
+together don't retry together, and never less than the `Retry-After` of the
+server.
+"""
+
+import random
+from dataclasses import dataclass
+from typing import Optional
+
+import httpx
+from starlette import status
+
+
+# Answers worth retrying: database connection issue, load shed and deadline exceeded
+RETRY_STATUS_CODES = frozenset({status.HTTP_428_PRECONDITION_REQUIRED,
+                                status.HTTP_503_SERVICE_UNAVAILABLE,
+                                status.HTTP_504_GATEWAY_TIMEOUT})
+
+
+@dataclass
+class RetryPolicy:
+    """Attempts and waits between the retries of a request."""
+    retries: int = 3
+    backoff: float = 0.1
+    max_backoff: float = 2.0
+
+    def wait(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before the retry `attempt` (from 0)."""
+        wait = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after is not None:
+            wait = max(wait, retry_after)
+        return wait
+
+    @staticmethod
+    def should_retry_response(response: httpx.Response, idempotent: bool) -> bool:
+        """Whether the answer is transient and the request safe to repeat."""
+        # Rate limited requests are refused before they run
+        if response.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            return True
+        return idempotent and response.status_code in RETRY_STATUS_CODES
+
+    @staticmethod
+    def should_retry_error(error: httpx.TransportError, idempotent: bool) -> bool:
+        """Whether the request is safe to repeat after a transport error."""
+        # The request never reached the server
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True
+        return idempotent
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """The `Retry-After` header of an answer, in seconds, when given as a number."""
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
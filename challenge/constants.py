@@ -24,3 +24,79 @@ LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 # Errors configuration
 DATA_INVALID = "Data type on request body: invalid"
 CONNECTIO_ISSUE = "Connection issues with the database. Postgres database is DOWN"
+SERVICE_OVERLOADED = "The service is overloaded. Retry later."
+RATE_LIMITED = "Too many requests. Retry later."
+DEADLINE_EXCEEDED = "The request took longer than its deadline."
+
+# -----------------------------------------------------------------------------
+# Query budgets (maximum statements per request, keyed by "METHOD /route")
+QUERY_BUDGETS = {
+    "GET /leads/": 1,
+    "GET /leads/{register_id}": 1,
+    "POST /leads/": 2,
+    "GET /records/": 3,
+    "GET /records/{record_id}": 3,
+    "POST /records/": 11,
+    "POST /enroll/career": 5,
+    "POST /enroll/subject": 7,
+    "GET /stats/": 4,
+    "GET /stats/careers": 1,
+    "GET /stats/subjects": 1,
+    "GET /stats/years": 1,
+    "GET /stats/enroll-times": 1,
+}
+# Executions of the same statement, with different parameters, to flag an N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+# -----------------------------------------------------------------------------
+# Interval between two runs of the partition maintenance, in seconds
+PARTITION_MAINTENANCE_SECONDS = 24 * 60 * 60
+
+# -----------------------------------------------------------------------------
+# Import time budget of the main module, in milliseconds
+IMPORT_TIME_BUDGET_MS = 1500
+
+# -----------------------------------------------------------------------------
+# Paths not limited by the concurrency limiter, they don't use the database
+CONCURRENCY_EXEMPT_PATHS = ["/", "/health", "/ready", "/docs", "/redoc",
+                            "/openapi.json", "/docs/oauth2-redirect",
+                            # Open for as long as the client listens, its queries are short
+                            "/records/stream"]
+
+# -----------------------------------------------------------------------------
+# Rate limits: backends of the token buckets, and paths not limited
+RATE_LIMIT_MEMORY = "memory"
+RATE_LIMIT_SQLITE = "sqlite"
+RATE_LIMIT_EXEMPT_PATHS = ["/health", "/ready", "/docs", "/redoc",
+                           "/openapi.json", "/docs/oauth2-redirect"]
+
+# -----------------------------------------------------------------------------
+# Maximum IDs of a batch lookup (`?ids=` on /leads and /records)
+MAX_BATCH_IDS = 100
+
+# -----------------------------------------------------------------------------
+# Maximum records of a page of GET /records
+MAX_RECORDS_PAGE = 1000
+
+# -----------------------------------------------------------------------------
+# Bulk lead creation: maximum leads per request, and rows per INSERT statement
+MAX_BULK_LEADS = 10000
+BULK_CHUNK_SIZE = 1000
+BULK_SKIP = "skip"
+BULK_UPDATE = "update"
+BULK_REPORT = "report"
+
+# -----------------------------------------------------------------------------
+# Metrics of the enrollment_stats table
+STAT_CAREER = "career"
+STAT_YEAR = "year"
+STAT_SUBJECT = "subject"
+STAT_ENROLL_TIMES = "enroll_times"
+
+# -----------------------------------------------------------------------------
+# Change feed of new records (GET /records/stream): backends, Postgres
+# channel, and records per query when a stream catches up
+CHANGE_FEED_MEMORY = "memory"
+CHANGE_FEED_POSTGRES = "postgres"
+CHANGE_FEED_CHANNEL = "new_records"
+CHANGE_FEED_PAGE = 100
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Batching of concurrent lookups.
+
+Callers ask for one key each, and the keys asked for in the same event loop
+iteration (or within `window` seconds) are loaded with a single batch call,
+such as `GET /records?ids=` in the client, or a `WHERE id IN (...)` query in
+the request loaders of `loaders.py`. A key asked for twice in the same batch
+is only loaded once.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+class BatchLoader:
+    """Load keys one by one, in batches."""
+
+    def __init__(self,
+                 load_batch: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+                 max_batch: int,
+                 window: float = 0.0) -> None:
+        """
+        Loader that coalesces the keys into calls to `load_batch`.
+
+        Args:
+            load_batch: Loads several keys, returns the value of the keys found.
+            max_batch (int): Maximum keys per call. A full batch is sent at once.
+            window (float): Seconds to wait for more keys before sending a batch.
+        """
+        self._load_batch = load_batch
+        self.max_batch = max_batch
+        self.window = window
+        self._pending: Dict[Hashable, asyncio.Future] = dict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._sending = set()
+
+    async def load(self, key: Hashable) -> Any:
+        """
+        Value of a key, loaded with the other keys of its batch.
+
+        Returns:
+            Any: The value, or None if the batch didn't return the key.
+
+        Raises:
+            Exception: The error of the batch call, raised to every caller.
+        """
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._dispatch)
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        """Send the pending keys as a batch."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, dict()
+        if batch:
+            task = asyncio.ensure_future(self._send(batch))
+            # Keep a reference until it's done
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        try:
+            found = await self._load_batch(list(batch))
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(key))
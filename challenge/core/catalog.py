@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Reference catalog module."""
+
+from typing import Dict, Iterable, Optional, Tuple
+
+from challenge.models.sql_models import Career, Subject, CareerSubject
+
+
+class ReferenceCatalog:
+    """In-memory copy of the reference tables: careers, subjects and career_subject.
+
+    These tables are written by the database administrators, not by the API, so
+    the DbHandler preloads them at startup and serves the lookups from memory.
+    A miss is not an error: callers fall back to the database.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty catalog."""
+        self.loaded = False
+        self.careers_by_id: Dict[int, Career] = dict()
+        self.subjects_by_id: Dict[int, Subject] = dict()
+        self.career_subjects_by_id: Dict[int, CareerSubject] = dict()
+        self.career_ids_by_name: Dict[str, int] = dict()
+        self.subject_ids_by_name: Dict[str, int] = dict()
+        self.career_subject_ids: Dict[Tuple[int, int], int] = dict()
+
+    def load(self,
+             careers: Iterable[Career],
+             subjects: Iterable[Subject],
+             career_subjects: Iterable[CareerSubject]) -> None:
+        """Replaces the catalog content with the given rows."""
+        self.careers_by_id = {career.id: career for career in careers}
+        self.subjects_by_id = {subject.id: subject for subject in subjects}
+        self.career_subjects_by_id = {link.id: link for link in career_subjects}
+        self.career_ids_by_name = {
+            career.name: career.id for career in self.careers_by_id.values()}
+        self.subject_ids_by_name = {
+            subject.name: subject.id for subject in self.subjects_by_id.values()}
+        self.career_subject_ids = {
+            (link.career_id, link.subject_id): link.id
+            for link in self.career_subjects_by_id.values()}
+        self.loaded = True
+
+    def career_subject_id(self, career_id: int, subject_id: int) -> Optional[int]:
+        """Returns the ID of the career-subject link, if cached."""
+        return self.career_subject_ids.get((career_id, subject_id))
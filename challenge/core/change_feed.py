@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""Change feed module.
+
+Publishes the IDs of the new subject enrollment records to the subscribers of
+`GET /records/stream`. The feed of each process is in memory. With the
+`postgres` backend, the DbHandler sends a `NOTIFY` with every new record in
+the transaction that creates it, and `listen` republishes the notifications
+of every process (and of every shard) to the local feed.
+
+Each subscriber has a bounded buffer. A subscriber that falls behind is not
+waited for: its buffer is dropped and it's flagged, so its stream catches up
+from the database after the last record it sent.
+
+The position of a stream is a cursor with the last ID sent of every shard,
+since IDs are only ordered within a shard. It's the ID of its events, like
+`42` with a single database or `40,42,39` with three shards.
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, List, Optional, Set, Tuple
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+class Subscription:
+    """IDs of the records published since the subscription, up to `max_buffer`."""
+
+    def __init__(self, max_buffer: int) -> None:
+        """Empty subscription with room for `max_buffer` IDs."""
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self.overflowed = False
+
+    def put(self, record_id: int) -> None:
+        """Buffer an ID, or flag the subscription if the buffer is full."""
+        if self.overflowed:
+            return
+        try:
+            self._queue.put_nowait(record_id)
+        except asyncio.QueueFull:
+            self.resync()
+
+    def resync(self) -> None:
+        """Drop the buffered IDs, the subscriber must catch up from the database."""
+        self.overflowed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        # Wake up the subscriber
+        self._queue.put_nowait(0)
+
+    async def next(self, timeout: float) -> Tuple[List[int], bool]:
+        """
+        Wait up to `timeout` seconds for new IDs.
+
+        Returns:
+            Tuple[List[int], bool]: Every buffered ID, and whether the subscriber
+            fell behind and must catch up. Both empty and False on timeout.
+        """
+        try:
+            first = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return list(), False
+        record_ids = [first]
+        while not self._queue.empty():
+            record_ids.append(self._queue.get_nowait())
+        if self.overflowed:
+            self.overflowed = False
+            return list(), True
+        return record_ids, False
+
+
+class ChangeFeed:
+    """In-process publish/subscribe of the IDs of new records."""
+
+    def __init__(self, max_buffer: int) -> None:
+        """Feed whose subscribers buffer up to `max_buffer` IDs each."""
+        self.max_buffer = max_buffer
+        self._subscriptions: Set[Subscription] = set()
+
+    def subscribe(self) -> Subscription:
+        """New subscription, that gets the IDs published from now on."""
+        subscription = Subscription(self.max_buffer)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Stop buffering IDs for the subscription."""
+        self._subscriptions.discard(subscription)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscriptions)
+
+    def publish(self, record_id: int) -> None:
+        """Send a new record ID to every subscriber. It never waits."""
+        for subscription in self._subscriptions:
+            subscription.put(record_id)
+
+    def resync(self) -> None:
+        """Make every subscriber catch up from the database, after IDs may have been lost."""
+        for subscription in self._subscriptions:
+            subscription.resync()
+
+
+async def listen(engine: "AsyncEngine", feed: ChangeFeed, channel: str) -> None:
+    """
+    Republish the notifications of a Postgres channel to the feed, until cancelled.
+
+    The subscribers resync once listening, since records created while the
+    listener was down were not notified to it.
+    """
+    def notified(connection, pid, channel, payload) -> None:
+        feed.publish(int(payload))
+
+    async with engine.connect() as connection:
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        await driver_connection.add_listener(channel, notified)
+        feed.resync()
+        try:
+            # Notifications arrive on the connection while it's idle
+            await asyncio.Event().wait()
+        finally:
+            await driver_connection.remove_listener(channel, notified)
+
+
+def format_cursor(last_ids: List[int]) -> str:
+    """Event ID of a stream position, the last record ID of every shard."""
+    return ",".join(str(last_id) for last_id in last_ids)
+
+
+def sse_event(event: str, data: str, event_id: Optional[str] = None) -> str:
+    """Format a Server-Sent Event."""
+    lines = list()
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+def sse_comment(comment: str) -> str:
+    """Format a Server-Sent Events comment, ignored by the clients. Keeps the connection alive."""
+    return f": {comment}\n\n"
+
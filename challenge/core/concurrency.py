@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Adaptive concurrency limiter module."""
+
+import asyncio
+import heapq
+import itertools
+from typing import Callable, List, Tuple
+
+
+# Request priorities, lower values are served first
+HIGH_PRIORITY = 0
+NORMAL_PRIORITY = 1
+LOW_PRIORITY = 2
+
+
+def priority(level: int) -> Callable:
+    """
+    Decorator that sets the concurrency limiter priority of an endpoint.
+
+    Endpoints without it get HIGH_PRIORITY for reads (GET) and
+    NORMAL_PRIORITY otherwise. Bulk imports should use LOW_PRIORITY, so
+    queued reads are let in before them.
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.priority = level
+        return endpoint
+    return decorator
+
+
+class AdaptiveLimiter:
+    """Caps the requests in flight, adapting the cap to the observed latency.
+
+    The limit follows an AIMD policy: it grows by about one slot per window
+    of requests served under the target latency, and shrinks by a factor
+    when a request is slower. Requests over the limit wait in a priority
+    queue with a deadline; when the queue is full or the deadline expires,
+    `acquire` returns False and the request must be shed.
+    """
+
+    def __init__(self,
+                 initial_limit: int,
+                 min_limit: int,
+                 max_limit: int,
+                 target_latency: float,
+                 max_queue: int,
+                 backoff: float = 0.9) -> None:
+        """
+        Args:
+            initial_limit (int): Requests allowed in flight at startup.
+            min_limit (int): The limit never goes below this value.
+            max_limit (int): The limit never goes above this value.
+            target_latency (float): Latency, in seconds, above which the limit shrinks.
+            max_queue (int): Maximum requests waiting for a slot.
+            backoff (float): Factor applied to the limit on a slow request.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.max_queue = max_queue
+        self.backoff = backoff
+        self.limit = float(initial_limit)
+        self.in_flight = 0
+        # Requests waiting for a slot. The heap also keeps the entries of the
+        # ones that left the queue, until they are popped or compacted away.
+        self.queued = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: int, timeout: float) -> bool:
+        """
+        Wait for a slot.
+
+        Args:
+            priority (int): Priority of the request, lower is served first.
+            timeout (float): Seconds the request can wait in the queue.
+
+        Returns:
+            bool: True if a slot was granted, False if the request must be shed.
+        """
+        if self.in_flight < int(self.limit) and not self.queued:
+            self.in_flight += 1
+            return True
+        if self.queued >= self.max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self.queued += 1
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self._leave_queue()
+            return False
+        except asyncio.CancelledError:
+            # The slot may have been handed over right before the cancellation
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot()
+            else:
+                self._leave_queue()
+            raise
+        return True
+
+    def _leave_queue(self) -> None:
+        """Forget a waiter that gave up, compacting the heap once most of its entries are stale."""
+        self.queued -= 1
+        if len(self._waiters) > 2 * self.queued + 16:
+            self._waiters = [entry for entry in self._waiters if not entry[2].done()]
+            heapq.heapify(self._waiters)
+
+    def release(self, latency: float) -> None:
+        """
+        Free a slot and adapt the limit to the latency of the request.
+
+        Args:
+            latency (float): Seconds the request took.
+        """
+        if latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        else:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        self._release_slot()
+
+    def _release_slot(self) -> None:
+        """Free a slot and let in the waiters that fit under the limit."""
+        self.in_flight -= 1
+        while self._waiters and self.in_flight < int(self.limit):
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                self.in_flight += 1
+                self.queued -= 1
+                waiter.set_result(True)
@@ -1,13 +1,19 @@
 # -*- coding: utf-8 -*-
 """DB Handler module."""
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+import heapq
+import itertools
+from operator import attrgetter, itemgetter
+from contextlib import AsyncExitStack
+from datetime import datetime
+from sqlalchemy import and_, case, delete, event, func, insert, make_url, or_, text, tuple_
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
 from sqlalchemy.future import select
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
 from challenge import settings
-from challenge.core.log_manager import LogManager
 from challenge.exceptions import (StudentDoesNotExist,
                                   CareerDoesNotExist,
                                   UnenrolledStudent,
@@ -19,12 +25,114 @@ from challenge.models.sql_models import (Student,
                                          Subject,
                                          StudentCareer,
                                          CareerSubject,
-                                         SubjectEnrollment)
-from challenge.models.api_models import RetriveLeadRecord
+                                         SubjectEnrollment,
+                                         EnrollmentStat,
+                                         EnrollmentStatDelta)
+from challenge.models.api_models import ChangedLeadRecord, RetriveLeadRecord
 from challenge.core.singleton import Singleton
+from challenge.core.catalog import ReferenceCatalog
+from challenge.core.change_feed import ChangeFeed
+from challenge.core.deadline import remaining_ms
+from challenge.core.loaders import current_loaders
+from challenge.core.query_counter import SKIP_QUERY_COUNT
+from challenge.core import schema
+from challenge.core.search_index import LeadSearchIndex
+from challenge.core.sync import RECORD_CHANGED_AT, changed_record_ids, settled_before
+from challenge.core.sharding import (BY_DNI,
+                                     ShardRouter,
+                                     current_shard,
+                                     interleaved_id,
+                                     routed,
+                                     scatter)
+from challenge.core import enrollment_stats
+from challenge.core.upsert import UPSERT_DIALECTS, dialect_insert
+from challenge.constants import (BULK_CHUNK_SIZE,
+                                 BULK_SKIP,
+                                 BULK_UPDATE,
+                                 BULK_REPORT,
+                                 CHANGE_FEED_CHANNEL,
+                                 CHANGE_FEED_POSTGRES,
+                                 STAT_CAREER,
+                                 STAT_YEAR,
+                                 STAT_SUBJECT,
+                                 STAT_ENROLL_TIMES)
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+class DeadlineSession(Session):
+    """Session that bounds every transaction by the deadline of the request."""
+
+
+@event.listens_for(DeadlineSession, "after_begin")
+def apply_statement_timeout(session, transaction, connection) -> None:
+    """
+    Turn the time left to the request deadline into a Postgres statement timeout.
+
+    `SET LOCAL` only lasts until the end of the transaction, so each session of
+    a request gets the time that is left when it starts.
+
+    Raises:
+        RequestDeadlineExceeded: If the deadline has already passed.
+    """
+    timeout_ms = remaining_ms()
+    if timeout_ms is None or connection.dialect.name != "postgresql":
+        return
+    connection.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout_ms}",
+                               execution_options={SKIP_QUERY_COUNT: True})
+
+
+# Columns of the lead records, labeled as the fields of `RetriveLeadRecord`
+RECORD_COLUMNS = {
+    "id": SubjectEnrollment.id,
+    "dni": Student.dni,
+    "name": Student.name,
+    "email": Student.email,
+    "phone": Student.phone,
+    "address": Student.address,
+    "subject": Subject.name.label("subject"),
+    "class_duration": Subject.class_duration,
+    "enroll_times": SubjectEnrollment.enroll_times,
+    "career": Career.name.label("career"),
+    "year_enroll": StudentCareer.year_enroll,
+}
+
+
+def pool_figures(pool: Pool) -> Dict[str, int]:
+    """
+    Usage of a connection pool.
+
+    Only queue pools have a size. Pools that open a connection per checkout
+    (NullPool) or share a single one (StaticPool) report no capacity.
+    """
+    if not isinstance(pool, QueuePool):
+        return {"size": 0, "max_overflow": 0, "checked_in": 0, "checked_out": 0, "overflow": 0}
+    return {
+        "size": pool.size(),
+        "max_overflow": max(0, pool._max_overflow),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(0, pool.overflow()),
+    }
+
+
+def database_dsn() -> str:
+    """
+    asyncpg DSN of the database of the DbHandler, for the tools that load it directly.
+
+    Raises:
+        ValueError: If the database is sharded, or isn't Postgres.
+    """
+    database_urls = DbHandler()._database_urls
+    if len(database_urls) > 1:
+        raise ValueError("The database is sharded across SHARD_DATABASE_URLS, "
+                         "pass the DSN of a single shard")
+    url = make_url(database_urls[0])
+    if url.get_backend_name() != "postgresql":
+        raise ValueError(f"'{url.drivername}' is not a Postgres database")
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
 
-logger = LogManager().logger()
 
 class DbHandler(metaclass=Singleton):
     """Class to manage transfers with the db"""
@@ -32,27 +140,247 @@ class DbHandler(metaclass=Singleton):
     def __init__(self):
         """
         Initialize the DbHandler instance with database connection settings.
-        Sets up the asynchronous engine and sessionmaker for interacting with the database.
+        The asynchronous engines and sessionmakers are created on first use.
+
+        `DATABASE_URL` can be any SQLAlchemy async URL, otherwise the Postgres
+        URL is built from the `POSTGRES_*` settings. With more than one URL in
+        `SHARD_DATABASE_URLS`, the student-owned rows are sharded by DNI across
+        those databases (see `challenge.core.sharding`).
+
+        Raises:
+            ValueError: If a database is neither Postgres nor SQLite, which
+            the upserts of the writes need.
         """
         super().__init__()
-        self._database_url = (
+        self._database_url = settings.DATABASE_URL or (
             'postgresql+asyncpg://'
             f'{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}'
             f'@{settings.POSTGRES_HOST}:5432/{settings.POSTGRES_DB}'
         )
-        self._engine = create_async_engine(self._database_url, echo=settings.POSTGRES_ECHO)
-        self._SessionLocal = sessionmaker(
-            bind=self._engine,
-            class_=AsyncSession,
-            expire_on_commit=False
-        )
+        self._database_urls: List[str] = settings.SHARD_DATABASE_URLS or [self._database_url]
+        for database_url in self._database_urls:
+            url = make_url(database_url)
+            if url.get_backend_name() not in UPSERT_DIALECTS:
+                raise ValueError(f"'{url.drivername}' databases are not supported, "
+                                 f"use one of: {', '.join(UPSERT_DIALECTS)}")
+        self._router: Optional[ShardRouter] = (ShardRouter(len(self._database_urls))
+                                               if len(self._database_urls) > 1 else None)
+        self._async_engines: Dict[int, "AsyncEngine"] = dict()
+        self._session_factories: Dict[int, sessionmaker] = dict()
+        self._catalog = ReferenceCatalog()
+        self._search_index: Optional[LeadSearchIndex] = None
+        self._change_feed = ChangeFeed(settings.CHANGE_FEED_BUFFER)
+
+    def _engine_for(self, shard: int) -> "AsyncEngine":
+        """Asynchronous engine of a shard, created (and its driver imported) on first access."""
+        if shard not in self._async_engines:
+            from sqlalchemy.ext.asyncio import create_async_engine
+            url = make_url(self._database_urls[shard])
+            options = dict(echo=settings.POSTGRES_ECHO)
+            if schema.is_in_memory(url):
+                # The database lives in its only connection, kept open by the
+                # pool. Sessions wait for it, so their transactions don't mix.
+                options.update(poolclass=AsyncAdaptedQueuePool,
+                               pool_size=1,
+                               max_overflow=0,
+                               connect_args={"check_same_thread": False})
+            elif url.get_backend_name() != "sqlite":
+                # SQLite files aren't pooled
+                options.update(pool_size=settings.POOL_SIZE,
+                               max_overflow=settings.POOL_MAX_OVERFLOW)
+            self._async_engines[shard] = create_async_engine(url, **options)
+        return self._async_engines[shard]
+
+    @property
+    def in_memory(self) -> bool:
+        """Whether the databases are in memory, and need their schema created at startup."""
+        return all(schema.is_in_memory(make_url(url)) for url in self._database_urls)
+
+    async def create_schema(self, seed: bool = True) -> None:
+        """Create the tables, and the pre-set data when they are empty, on every database."""
+        for engine in self._engines:
+            await schema.create_schema(engine, seed=seed)
+
+    @property
+    def _engine(self) -> "AsyncEngine":
+        """Asynchronous engine of the current shard."""
+        return self._engine_for(current_shard.get())
+
+    @property
+    def _engines(self) -> List["AsyncEngine"]:
+        """Asynchronous engines of every shard, in shard order."""
+        return [self._engine_for(shard) for shard in range(len(self._database_urls))]
+
+    @property
+    def _shards(self) -> int:
+        """Number of shards, 1 when the database isn't sharded."""
+        return len(self._database_urls)
+
+    @property
+    def _SessionLocal(self) -> sessionmaker:
+        """Session factory bound to the engine of the current shard, created on first access."""
+        shard = current_shard.get()
+        if shard not in self._session_factories:
+            from sqlalchemy.ext.asyncio import AsyncSession
+            self._session_factories[shard] = sessionmaker(
+                bind=self._engine_for(shard),
+                class_=AsyncSession,
+                sync_session_class=DeadlineSession,
+                expire_on_commit=False
+            )
+        return self._session_factories[shard]
+
+    def _with_new_ids(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rows of new students, with their explicit IDs when the shard needs them."""
+        return [dict(row, **self._new_id(Student.student_id, offset))
+                for offset, row in enumerate(rows)]
+
+    def _new_id(self, column: Any, offset: int = 0) -> Dict[str, Any]:
+        """
+        Explicit ID of a new row of a sharded table, as a keyword argument.
+
+        Empty when the database isn't sharded, or when the shard is Postgres,
+        whose interleaved sequences give the ID. See `interleaved_id`.
+        """
+        if self._router is None or self._engine.dialect.name == "postgresql":
+            return dict()
+        return {column.key: interleaved_id(column, current_shard.get(), self._shards, offset)}
 
     async def close(self):
-        """Close the database engine and all sessions."""
-        await self._engine.dispose()
+        """Close the database engines and all sessions."""
+        for engine in self._async_engines.values():
+            await engine.dispose()
+
+    async def _on_every_shard(self, method: Callable[..., Awaitable[Any]], *args, **kwargs) -> List[Any]:
+        """
+        Run a method on every shard in parallel.
+
+        Returns:
+            List[Any]: The result of each shard, in shard order. A single
+            result when the database isn't sharded.
+        """
+        if self._router is None:
+            return [await method(*args, **kwargs)]
+        results = await scatter({shard: (method, args, kwargs)
+                                 for shard in range(self._router.shards)})
+        return [results[shard] for shard in range(self._router.shards)]
+
+    async def _on_id_shards(self,
+                            method: Callable[..., Awaitable[List[Any]]],
+                            row_ids: List[int],
+                            *args) -> List[Any]:
+        """
+        Run a batch lookup on the shard of each ID, in parallel, and join the results.
+
+        Args:
+            method (Callable): Lookup of a list of IDs on the current shard.
+            row_ids (List[int]): IDs of rows of a sharded table.
+            *args: Other arguments of the lookup.
+        """
+        if self._router is None:
+            return await method(row_ids, *args)
+        results = await scatter({shard: (method, (ids, *args), dict())
+                                 for shard, ids in self._router.group_ids(row_ids).items()})
+        return [item for shard in sorted(results) for item in results[shard]]
+
+#==============================================================================
+# Methods for startup and health
+    @staticmethod
+    def _hot_queries() -> list:
+        """
+        Statements issued on every request by the hot paths.
+
+        They are built exactly as the query methods build them, so the SQL text
+        matches and the prepared statements cached per connection are reused.
+        """
+        return [
+            select(Student).where(Student.student_id == 0),
+            select(Student.student_id).filter_by(dni=""),
+            select(StudentCareer).where(StudentCareer.student_id == 0,
+                                        StudentCareer.career_id == 0),
+            select(SubjectEnrollment).where(SubjectEnrollment.id == 0),
+            select(SubjectEnrollment.id).filter_by(student_id=0,
+                                                   career_subject_id=0,
+                                                   enroll_times=0),
+            DbHandler._records_query().order_by(SubjectEnrollment.id).offset(0).limit(1),
+        ]
+
+    async def warm_up(self, connections: int) -> None:
+        """
+        Open pool connections up front and preload the reference catalog.
+
+        Every connection runs the hot queries once, so the connection setup,
+        the asyncpg type introspection and the statement preparation are paid
+        before the first request arrives.
+
+        Args:
+            connections (int): Number of connections to open. Capped at the pool
+            size, and at one for pools without a size.
+        """
+        connections = min(connections, max(1, pool_figures(self._engine.pool)["size"]))
+        await self._on_every_shard(self._open_connections, connections)
+        await self._load_catalog()
+
+    async def _open_connections(self, connections: int) -> None:
+        """Open connections of the current shard and run the hot queries on each."""
+        async with AsyncExitStack() as stack:
+            # Hold every connection until all are open, so the pool can't hand
+            # the same connection twice
+            opened = await asyncio.gather(*(
+                stack.enter_async_context(self._engine.connect())
+                for _ in range(connections)
+            ))
+            for connection in opened:
+                for statement in self._hot_queries():
+                    await connection.execute(statement)
+
+    async def _load_catalog(self) -> None:
+        """Load the careers, subjects and career-subject links in memory."""
+        async with self._SessionLocal() as session:
+            careers = (await session.execute(select(Career))).scalars().all()
+            subjects = (await session.execute(select(Subject))).scalars().all()
+            career_subjects = (await session.execute(select(CareerSubject))).scalars().all()
+        self._catalog.load(careers, subjects, career_subjects)
+
+    async def _load_references(self, model: type, ids: List[int]) -> Dict[int, Any]:
+        """
+        Rows of a reference table with the given IDs, by ID, in a single query.
+
+        Batch function of the request loaders. The reference tables are the
+        same on every shard.
+        """
+        async with self._SessionLocal() as session:
+            result = await session.execute(select(model).where(model.id.in_(ids)))
+            return {row.id: row for row in result.scalars().all()}
+
+    async def _load_careers(self, ids: List[int]) -> Dict[int, Career]:
+        """Careers with the given IDs, by ID. Batch function of the request loaders."""
+        return await self._load_references(Career, ids)
+
+    async def _load_subjects(self, ids: List[int]) -> Dict[int, Subject]:
+        """Subjects with the given IDs, by ID. Batch function of the request loaders."""
+        return await self._load_references(Subject, ids)
+
+    async def _load_career_subjects(self, ids: List[int]) -> Dict[int, CareerSubject]:
+        """Career-subject links with the given IDs, by ID. Batch function of the request loaders."""
+        return await self._load_references(CareerSubject, ids)
+
+    def pool_status(self) -> Dict[str, int]:
+        """
+        Return the connection pool usage. It doesn't touch the database.
+
+        When sharded, the figures are the sum of the pools of every shard.
+
+        Returns:
+            Dict[str, int]: Pool size, max overflow, checked-in, checked-out
+            and overflow connections.
+        """
+        pools = [pool_figures(engine.pool) for engine in self._engines]
+        return {name: sum(pool[name] for pool in pools) for name in pools[0]}
 
 #==============================================================================
 # Methods for Students querys
+    @routed("dni", by=BY_DNI)
     async def _create_student(self,
                              dni: str,
                              name: str,
@@ -79,27 +407,159 @@ class DbHandler(metaclass=Singleton):
                                       name=name,
                                       email=email,
                                       phone=phone,
-                                      address=address)
+                                      address=address,
+                                      **self._new_id(Student.student_id))
                 session.add(new_student)
                 await session.flush()
                 student_id = new_student.student_id
             await session.commit()
+        if self._search_index is not None:
+            self._search_index.add(new_student)
         return student_id
 
-    async def _get_all_students(self) -> List[Student]:
+    async def _bulk_create_students(self,
+                                    leads: List[Dict[str, Optional[str]]],
+                                    on_conflict: str = BULK_SKIP,
+                                    chunk_size: int = BULK_CHUNK_SIZE) -> Dict[str, object]:
+        """
+        Create students in bulk, with `INSERT ... ON CONFLICT (dni)` statements.
+
+        Leads are written in chunks of `chunk_size` rows, each chunk in its own
+        transaction, so a failure keeps the previous chunks. Repeating the call
+        is safe: the existing DNIs are handled by `on_conflict`:
+
+        - skip: the existing student is kept.
+        - update: the existing student gets the name, email, phone and address of the lead.
+        - report: the existing student is kept, and its DNI is reported as a conflict.
+
+        When a DNI is repeated in `leads`, the last lead wins. When sharded,
+        the leads of each shard are written in parallel.
+
+        Args:
+            leads (List[Dict[str, Optional[str]]]): dni, name, email, phone and address of each student.
+            on_conflict (str): One of `BULK_SKIP`, `BULK_UPDATE` or `BULK_REPORT`.
+            chunk_size (int): Rows per INSERT statement.
+
+        Returns:
+            Dict[str, object]: `student_ids`, the ID of the student of every DNI,
+            the number of students `created` and `updated`, and the DNIs in `conflicts`.
+        """
+        rows = list({lead["dni"]: lead for lead in leads}.values())
+        if self._router is None:
+            results = [await self._upsert_students(rows, on_conflict, chunk_size)]
+        else:
+            results = list((await scatter({
+                shard: (self._upsert_students, (shard_rows, on_conflict, chunk_size), dict())
+                for shard, shard_rows in self._router.group_by_dni(rows).items()
+            })).values())
+        summary = {"student_ids": dict(), "created": 0, "updated": 0, "conflicts": list()}
+        for result in results:
+            summary["student_ids"].update(result["student_ids"])
+            summary["created"] += result["created"]
+            summary["updated"] += result["updated"]
+            summary["conflicts"].extend(result["conflicts"])
+        if summary["created"] or summary["updated"]:
+            # Rebuilt on the next search, with the new rows
+            self._search_index = None
+        return summary
+
+    async def _upsert_students(self,
+                               rows: List[Dict[str, Optional[str]]],
+                               on_conflict: str,
+                               chunk_size: int) -> Dict[str, object]:
+        """Write unique leads on the current shard, in chunks. See `_bulk_create_students`.
+
+        The new DNIs are inserted first, so the rows it returns are exactly the
+        created students, also when another request inserts some of the DNIs
+        meanwhile. The rest are then updated, or only looked up.
+        """
+        upsert = dialect_insert(self._engine.dialect.name)
+        student_ids = dict()
+        created = updated = 0
+        conflicts = list()
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            async with self._SessionLocal() as session:
+                async with session.begin():
+                    inserted = dict((await session.execute(
+                        upsert(Student).values(self._with_new_ids(chunk))
+                        .on_conflict_do_nothing(index_elements=[Student.dni])
+                        .returning(Student.dni, Student.student_id)
+                    )).all())
+                    remaining = [row for row in chunk if row["dni"] not in inserted]
+                    existing = dict()
+                    if remaining and on_conflict == BULK_UPDATE:
+                        statement = upsert(Student).values(self._with_new_ids(remaining))
+                        statement = statement.on_conflict_do_update(
+                            index_elements=[Student.dni],
+                            set_={**{column: statement.excluded[column]
+                                 for column in ("name", "email", "phone", "address")},
+                              # Changes the records of the student, for the incremental sync
+                              "date": func.now()})
+                        existing = dict((await session.execute(
+                            statement.returning(Student.dni, Student.student_id)
+                        )).all())
+                    elif remaining:
+                        existing = dict((await session.execute(
+                            select(Student.dni, Student.student_id)
+                            .where(Student.dni.in_([row["dni"] for row in remaining]))
+                        )).all())
+                await session.commit()
+            student_ids.update(existing)
+            student_ids.update(inserted)
+            created += len(inserted)
+            if on_conflict == BULK_UPDATE:
+                updated += len(existing)
+            elif on_conflict == BULK_REPORT:
+                conflicts.extend(row["dni"] for row in remaining)
+        return {"student_ids": student_ids,
+                "created": created,
+                "updated": updated,
+                "conflicts": conflicts}
+
+    @staticmethod
+    def _students_query(fields: Optional[List[str]] = None):
+        """
+        Select the students, or only some of their columns.
+
+        Args:
+            fields (Optional[List[str]]): Columns to select. The ID is always selected.
+        """
+        if fields is None:
+            return select(Student)
+        names = dict.fromkeys(["student_id", *fields])
+        return select(*[getattr(Student, name) for name in names])
+
+    async def _get_all_students(self,
+                                fields: Optional[List[str]] = None
+                                ) -> List[Union[Student, Dict[str, Any]]]:
         """
         Retrieve all student records from the database.
 
+        Args:
+            fields (Optional[List[str]]): Only select these columns, and the ID.
+
         Returns:
-            List[Student]: A list of all students.
+            List[Union[Student, Dict[str, Any]]]: A list of all students, as
+            dictionaries of the selected columns when `fields` is given.
         """
+        shards = await self._on_every_shard(self._select_all_students, fields)
+        return [student for students in shards for student in students]
+
+    async def _select_all_students(self,
+                                   fields: Optional[List[str]] = None
+                                   ) -> List[Union[Student, Dict[str, Any]]]:
+        """Retrieve all student records of the current shard."""
         async with self._SessionLocal() as session:
-            result = await session.execute(select(Student))
+            result = await session.execute(self._students_query(fields))
+            if fields is not None:
+                return [dict(row._mapping) for row in result]
             query_list = list()
             for student_tuple in result:
                 query_list.append(student_tuple[0])
         return query_list
 
+    @routed("student_id")
     async def _get_student_by_id(self, student_id) -> Student:
         """
         Retrieve a student record by its unique ID.
@@ -113,15 +573,55 @@ class DbHandler(metaclass=Singleton):
         Returns:
             Student: The student record associated with the provided ID.
         """
+        loaders = current_loaders()
+        if loaders is not None:
+            student = await loaders.students.load(student_id)
+        else:
+            async with self._SessionLocal() as session:
+                result = await session.execute(
+                    select(Student).where(Student.student_id == student_id)
+                )
+                student = result.scalars().first()
+        if not student:
+            raise StudentDoesNotExist(f"No Student with ID: {student_id}")
+        return student
+
+    async def _load_students(self, student_ids: List[int]) -> Dict[int, Student]:
+        """Students with the given IDs, by ID. Batch function of the request loaders."""
+        return {student.student_id: student for student in await self._get_students_by_ids(student_ids)}
+
+    async def _get_students_by_ids(self,
+                                   student_ids: List[int],
+                                   fields: Optional[List[str]] = None
+                                   ) -> List[Union[Student, Dict[str, Any]]]:
+        """
+        Retrieve the students with the given IDs, in a single query.
+
+        Args:
+            student_ids (List[int]): The IDs of the students.
+            fields (Optional[List[str]]): Only select these columns, and the ID.
+
+        Returns:
+            List[Union[Student, Dict[str, Any]]]: The students found, in no
+            particular order, as dictionaries when `fields` is given. IDs
+            without a student are left out.
+        """
+        return await self._on_id_shards(self._select_students_by_ids, student_ids, fields)
+
+    async def _select_students_by_ids(self,
+                                      student_ids: List[int],
+                                      fields: Optional[List[str]] = None
+                                      ) -> List[Union[Student, Dict[str, Any]]]:
+        """Retrieve the students of the current shard with the given IDs."""
         async with self._SessionLocal() as session:
             result = await session.execute(
-                select(Student).where(Student.student_id == student_id)
+                self._students_query(fields).where(Student.student_id.in_(student_ids))
             )
-            student = result.scalars().first()
-            if not student:
-                raise StudentDoesNotExist(f"No Student with ID: {student_id}")
-        return student
+            if fields is not None:
+                return [dict(row._mapping) for row in result]
+            return list(result.scalars().all())
 
+    @routed("dni", by=BY_DNI)
     async def _get_student_id_by_dni(self, dni: str) -> Optional[int]:
         """
         Retrieve the unique identifier of a student based on their DNI (National Identity Document).
@@ -144,6 +644,57 @@ class DbHandler(metaclass=Singleton):
                 raise StudentDoesNotExist(f"No Student with DNI: {dni}")
             return student_id
 
+    async def _search_students(self, query: str, limit: int) -> List[Student]:
+        """
+        Search students by exact DNI, or by partial or approximate name or email.
+
+        On Postgres, it uses the pg_trgm GIN indexes on name and email and the
+        btree index on DNI. Other databases use an in-memory index, built on
+        the first search. Results are ranked: exact DNI, then name or email
+        prefix, then trigram similarity. When sharded, every shard returns its
+        best `limit` students, and they are ranked again together.
+
+        Args:
+            query (str): The DNI, or part of the name or email, to search.
+            limit (int): Maximum number of students to return.
+
+        Returns:
+            List[Student]: Matching students, best ranked first.
+        """
+        query = query.strip()
+        if self._engine.dialect.name != "postgresql":
+            if self._search_index is None:
+                self._search_index = LeadSearchIndex(await self._get_all_students())
+            return self._search_index.search(query, limit)
+
+        shards = await self._on_every_shard(self._rank_students, query, limit)
+        ranked = sorted((row for rows in shards for row in rows),
+                        key=lambda row: (-row[0], -(row[1] or 0), row[2].student_id))
+        return [student for _, _, student in ranked[:limit]]
+
+    async def _rank_students(self, query: str, limit: int) -> List[Tuple[int, float, Student]]:
+        """Search the students of the current shard, with the rank and score of each (Postgres only)."""
+        escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        name_prefix = Student.name.ilike(f"{escaped}%", escape="\\")
+        email_prefix = Student.email.ilike(f"{escaped}%", escape="\\")
+        rank = case((Student.dni == query, 3),
+                    (or_(name_prefix, email_prefix), 2),
+                    else_=1)
+        score = func.greatest(func.similarity(Student.name, query),
+                              func.similarity(Student.email, query))
+        async with self._SessionLocal() as session:
+            result = await session.execute(
+                select(rank.label("rank"), score.label("score"), Student)
+                .where(or_(Student.dni == query,
+                           name_prefix,
+                           email_prefix,
+                           Student.name.op("%")(query),
+                           Student.email.op("%")(query)))
+                .order_by(rank.desc(), score.desc(), Student.student_id)
+                .limit(limit)
+            )
+            return [(row.rank, row.score, row.Student) for row in result]
+
 #==============================================================================
 # Methods for Careers querys
     async def _get_career_by_id(self,
@@ -158,6 +709,12 @@ class DbHandler(metaclass=Singleton):
         Returns:
             Optional[Career]: The career record if found; otherwise, returns None.
         """
+        career = self._catalog.careers_by_id.get(id)
+        if career is not None:
+            return career
+        loaders = current_loaders()
+        if loaders is not None:
+            return await loaders.careers.load(id)
         async with self._SessionLocal() as session:
             result = await session.execute(
                 select(Career).where(
@@ -180,6 +737,9 @@ class DbHandler(metaclass=Singleton):
         Raises:
             CareerDoesNotExist: If no career with the specified name is found in the database.
         """
+        career_id = self._catalog.career_ids_by_name.get(name)
+        if career_id is not None:
+            return career_id
         async with self._SessionLocal() as session:
             result = await session.execute(
                 select(Career.id).filter_by(name=name)
@@ -203,6 +763,12 @@ class DbHandler(metaclass=Singleton):
         Returns:
             Optional[Subject]: The subject record if found; otherwise, returns None.
         """
+        subject = self._catalog.subjects_by_id.get(id)
+        if subject is not None:
+            return subject
+        loaders = current_loaders()
+        if loaders is not None:
+            return await loaders.subjects.load(id)
         async with self._SessionLocal() as session:
             result = await session.execute(
                 select(Subject).where(
@@ -225,6 +791,9 @@ class DbHandler(metaclass=Singleton):
         Raises:
             SubjectDoesNotExist: If no subject with the specified name is found in the database.
         """
+        subject_id = self._catalog.subject_ids_by_name.get(subject_name)
+        if subject_id is not None:
+            return subject_id
         async with self._SessionLocal() as session:
             result = await session.execute(
                 select(Subject.id).filter_by(name=subject_name)
@@ -236,6 +805,7 @@ class DbHandler(metaclass=Singleton):
 
 #==============================================================================
 # Methods for Student-Career querys
+    @routed("student_id")
     async def _enroll_student_in_a_career(self,
                                          student_id: int,
                                          career_id: int,
@@ -255,13 +825,17 @@ class DbHandler(metaclass=Singleton):
             async with session.begin():
                 new_enrollment = StudentCareer(student_id=student_id,
                                                career_id=career_id,
-                                               year_enroll=year_enroll)
+                                               year_enroll=year_enroll,
+                                               **self._new_id(StudentCareer.id))
                 session.add(new_enrollment)
                 await session.flush()
                 enrollment_id = new_enrollment.id
+                await self._increment_stats(session, [(STAT_CAREER, career_id),
+                                                      (STAT_YEAR, year_enroll)])
             await session.commit()
             return enrollment_id
 
+    @routed("student_id")
     async def _get_student_career_by_ids(self,
                                         student_id: int,
                                         career_id: int,
@@ -305,6 +879,12 @@ class DbHandler(metaclass=Singleton):
         Returns:
             Optional[CareerSubject]: The career-subject record if found; otherwise, returns None.
         """
+        career_subject = self._catalog.career_subjects_by_id.get(id)
+        if career_subject is not None:
+            return career_subject
+        loaders = current_loaders()
+        if loaders is not None:
+            return await loaders.career_subjects.load(id)
         async with self._SessionLocal() as session:
             result = await session.execute(
                 select(CareerSubject).where(
@@ -331,6 +911,9 @@ class DbHandler(metaclass=Singleton):
         Raises:
             CareerSubjectDoesNotExist: If the specified subject is not related to the specified career.
         """
+        career_subject_id = self._catalog.career_subject_id(career_id, subject_id)
+        if career_subject_id is not None:
+            return career_subject_id
         async with self._SessionLocal() as session:
             result = await session.execute(
                 select(CareerSubject.id).filter_by(
@@ -345,6 +928,7 @@ class DbHandler(metaclass=Singleton):
 
 #==============================================================================
 # Methods for Student-Career-Subject querys
+    @routed("student_id")
     async def _enroll_student_in_a_subject(self,
                                           student_id: int,
                                           career_subject_id: int,
@@ -353,6 +937,9 @@ class DbHandler(metaclass=Singleton):
         """
         Enroll a student in a specific subject for a given number of enrollments.
 
+        The new record is published to the change feed once committed: with the
+        postgres backend, by a `NOTIFY` sent in the same transaction.
+
         Args:
             student_id (int): The unique identifier of the student to enroll.
             career_subject_id (int): The unique identifier of the career subject the student is enrolling in.
@@ -366,14 +953,38 @@ class DbHandler(metaclass=Singleton):
                 new_enrollment = SubjectEnrollment(
                     student_id=student_id,
                     career_subject_id=career_subject_id,
-                    enroll_times = enroll_times
+                    enroll_times = enroll_times,
+                    **self._new_id(SubjectEnrollment.id)
                 )
                 session.add(new_enrollment)
                 await session.flush()
                 enrollment_id = new_enrollment.id
+                career_subject = self._catalog.career_subjects_by_id.get(career_subject_id)
+                if career_subject is not None:
+                    subject_id = career_subject.subject_id
+                else:
+                    subject_id = (await session.execute(
+                        select(CareerSubject.subject_id).where(
+                            CareerSubject.id == career_subject_id))).scalar_one()
+                await self._increment_stats(session, [(STAT_SUBJECT, subject_id),
+                                                      (STAT_ENROLL_TIMES, enroll_times)])
+                notify = self._notifies_changes()
+                if notify:
+                    # Delivered to the listeners on commit. Bookkeeping, not a query of the route
+                    await session.execute(
+                        select(func.pg_notify(CHANGE_FEED_CHANNEL, str(enrollment_id))),
+                        execution_options={SKIP_QUERY_COUNT: True})
             await session.commit()
-            return enrollment_id
+        if not notify:
+            self._change_feed.publish(enrollment_id)
+        return enrollment_id
+
+    def _notifies_changes(self) -> bool:
+        """Whether new records are published with Postgres NOTIFY, rather than in process."""
+        return (settings.CHANGE_FEED_BACKEND == CHANGE_FEED_POSTGRES
+                and self._engine.dialect.name == "postgresql")
 
+    @routed("id")
     async def _get_subject_enrollment_by_id(self,
                                          id: int,
                                          ) -> Optional[SubjectEnrollment]:
@@ -399,6 +1010,7 @@ class DbHandler(metaclass=Singleton):
                 raise EnrollRecordDoesNotExist(f"Record with ID:{id} does not exist")
             return subject_enrollment
 
+    @routed("student_id")
     async def _get_subject_enrollment_id(self,
                                          student_id: int,
                                          career_subject_id: int,
@@ -431,23 +1043,294 @@ class DbHandler(metaclass=Singleton):
                 raise UnenrolledStudent(f"Student in not enrolled in the subject")
             return subject_enrollment_id
 
-    async def _get_all_record_ids(self) -> List[SubjectEnrollment]:
+    @staticmethod
+    def _records_query(fields: Optional[List[str]] = None):
+        """
+        Select the complete lead records, joining every table in a single statement.
+
+        The columns are labeled as the fields of `RetriveLeadRecord`.
+
+        Args:
+            fields (Optional[List[str]]): Only select these columns, and the ID.
         """
-        Retrieve all subject enrollment record IDs.
+        names = RECORD_COLUMNS if fields is None else dict.fromkeys(["id", *fields])
+        return (
+            select(*[RECORD_COLUMNS[name] for name in names])
+            .join(Student, Student.student_id == SubjectEnrollment.student_id)
+            .join(CareerSubject, CareerSubject.id == SubjectEnrollment.career_subject_id)
+            .join(Career, Career.id == CareerSubject.career_id)
+            .join(Subject, Subject.id == CareerSubject.subject_id)
+            .join(StudentCareer, and_(StudentCareer.student_id == SubjectEnrollment.student_id,
+                                      StudentCareer.career_id == CareerSubject.career_id))
+        )
+
+    async def _get_records(self,
+                           start: int,
+                           limit: int,
+                           career: Optional[str] = None,
+                           subject: Optional[str] = None,
+                           year_enroll: Optional[int] = None,
+                           enroll_times: Optional[int] = None,
+                           date_from: Optional[datetime] = None,
+                           date_to: Optional[datetime] = None,
+                           after_id: Optional[int] = None,
+                           fields: Optional[List[str]] = None
+                           ) -> List[Union[RetriveLeadRecord, Dict[str, Any]]]:
+        """
+        Retrieve a page of complete lead records matching the given filters.
+
+        Filters, ordering and pagination run in the database, in one statement.
+        Records are ordered by their subject enrollment ID.
 
-        This function queries the database for all IDs associated with 
-        subject enrollment records and returns them as a list.
+        When sharded, every shard returns its first `start + limit` matching
+        records in parallel, and their ordered lists are merged by ID before
+        the page is cut, so the pages are the same as with a single database.
+
+        Args:
+            start (int): Number of matching records to skip.
+            limit (int): Maximum number of records to return.
+            career (Optional[str]): Name of the career.
+            subject (Optional[str]): Name of the subject.
+            year_enroll (Optional[int]): Year the student enrolled in the career.
+            enroll_times (Optional[int]): Times the student enrolled in the subject.
+            date_from (Optional[datetime]): Oldest enrollment date, inclusive.
+            date_to (Optional[datetime]): Newest enrollment date, inclusive.
+            after_id (Optional[int]): Only records with a greater ID.
+            fields (Optional[List[str]]): Only select these columns, and the ID.
 
         Returns:
-            List[SubjectEnrollment]: A list of IDs of all subject enrollment records.
+            List[Union[RetriveLeadRecord, Dict[str, Any]]]: The records of the page,
+            as dictionaries of the selected columns when `fields` is given.
+            Empty when no record matches.
         """
+        filters = dict(career=career, subject=subject, year_enroll=year_enroll,
+                       enroll_times=enroll_times, date_from=date_from, date_to=date_to,
+                       after_id=after_id)
+        if self._router is None:
+            return await self._select_records(start, limit, fields=fields, **filters)
+        shards = await self._on_every_shard(self._select_records, 0, start + limit,
+                                            fields=fields, **filters)
+        record_id = (lambda record: record.id) if fields is None else itemgetter("id")
+        merged = heapq.merge(*shards, key=record_id)
+        return list(itertools.islice(merged, start, start + limit))
+
+    async def _select_records(self,
+                              start: int,
+                              limit: int,
+                              career: Optional[str] = None,
+                              subject: Optional[str] = None,
+                              year_enroll: Optional[int] = None,
+                              enroll_times: Optional[int] = None,
+                              date_from: Optional[datetime] = None,
+                              date_to: Optional[datetime] = None,
+                              after_id: Optional[int] = None,
+                              fields: Optional[List[str]] = None
+                              ) -> List[Union[RetriveLeadRecord, Dict[str, Any]]]:
+        """Retrieve a page of the records of the current shard. See `_get_records`."""
+        query = self._filter_records(self._records_query(fields),
+                                     career=career,
+                                     subject=subject,
+                                     year_enroll=year_enroll,
+                                     enroll_times=enroll_times,
+                                     date_from=date_from,
+                                     date_to=date_to)
+        if after_id is not None:
+            query = query.where(SubjectEnrollment.id > after_id)
+        query = query.order_by(SubjectEnrollment.id).offset(start).limit(limit)
         async with self._SessionLocal() as session:
-            result = await session.execute(select(SubjectEnrollment.id))
-            query_list = list()
-            for subject_enroll_record in result:
-                query_list.append(subject_enroll_record[0])
-        return query_list
+            result = await session.execute(query)
+            return self._to_records(result, fields)
+
+    @staticmethod
+    def _filter_records(query,
+                        career: Optional[str] = None,
+                        subject: Optional[str] = None,
+                        year_enroll: Optional[int] = None,
+                        enroll_times: Optional[int] = None,
+                        date_from: Optional[datetime] = None,
+                        date_to: Optional[datetime] = None):
+        """Add the given filters of `_get_records` to a records query."""
+        if career is not None:
+            query = query.where(Career.name == career)
+        if subject is not None:
+            query = query.where(Subject.name == subject)
+        if year_enroll is not None:
+            query = query.where(StudentCareer.year_enroll == year_enroll)
+        if enroll_times is not None:
+            query = query.where(SubjectEnrollment.enroll_times == enroll_times)
+        if date_from is not None:
+            query = query.where(SubjectEnrollment.date >= date_from)
+        if date_to is not None:
+            query = query.where(SubjectEnrollment.date <= date_to)
+        return query
 
+    async def _get_changed_records(self,
+                                   updated_since: datetime,
+                                   after_id: int,
+                                   limit: int,
+                                   career: Optional[str] = None,
+                                   subject: Optional[str] = None,
+                                   year_enroll: Optional[int] = None,
+                                   enroll_times: Optional[int] = None,
+                                   date_from: Optional[datetime] = None,
+                                   date_to: Optional[datetime] = None,
+                                   fields: Optional[List[str]] = None
+                                   ) -> List[Union[ChangedLeadRecord, Dict[str, Any]]]:
+        """
+        Retrieve the complete lead records created or changed after a watermark.
+
+        A record changes with its subject enrollment, its student or its
+        enrollment in the career. Records are ordered by the time they changed,
+        then by ID, and the ones after (`updated_since`, `after_id`) are
+        returned. The candidates are found through the `date` index of each
+        table, so the cost depends on the changes, not on the table size.
+        Changes of the last `SYNC_SETTLE_SECONDS` are left for the next sync.
+
+        When sharded, every shard returns its first `limit` changes in parallel,
+        and their ordered lists are merged before the page is cut.
+
+        Args:
+            updated_since (datetime): Change time of the watermark.
+            after_id (int): ID of the watermark, for the records that changed
+            at `updated_since`.
+            limit (int): Maximum number of records to return.
+            career, subject, year_enroll, enroll_times, date_from, date_to:
+            The filters of `_get_records`.
+            fields (Optional[List[str]]): Only select these columns, the ID and
+            the change time.
+
+        Returns:
+            List[Union[ChangedLeadRecord, Dict[str, Any]]]: The changed records,
+            as dictionaries of the selected columns when `fields` is given.
+            Empty when nothing changed.
+        """
+        filters = dict(career=career, subject=subject, year_enroll=year_enroll,
+                       enroll_times=enroll_times, date_from=date_from, date_to=date_to)
+        if self._router is None:
+            return await self._select_changed_records(updated_since, after_id, limit,
+                                                      fields=fields, **filters)
+        shards = await self._on_every_shard(self._select_changed_records, updated_since,
+                                            after_id, limit, fields=fields, **filters)
+        watermark = attrgetter if fields is None else itemgetter
+        merged = heapq.merge(*shards, key=watermark("changed_at", "id"))
+        return list(itertools.islice(merged, limit))
+
+    async def _select_changed_records(self,
+                                      updated_since: datetime,
+                                      after_id: int,
+                                      limit: int,
+                                      fields: Optional[List[str]] = None,
+                                      **filters
+                                      ) -> List[Union[ChangedLeadRecord, Dict[str, Any]]]:
+        """Retrieve the changed records of the current shard. See `_get_changed_records`."""
+        query = (
+            self._filter_records(self._records_query(fields), **filters)
+            .add_columns(RECORD_CHANGED_AT.label("changed_at"))
+            .where(SubjectEnrollment.id.in_(changed_record_ids(updated_since)))
+            .where(tuple_(RECORD_CHANGED_AT, SubjectEnrollment.id) > tuple_(updated_since, after_id))
+            .where(RECORD_CHANGED_AT <= settled_before(settings.SYNC_SETTLE_SECONDS))
+            .order_by(RECORD_CHANGED_AT, SubjectEnrollment.id)
+            .limit(limit)
+        )
+        async with self._SessionLocal() as session:
+            result = await session.execute(query)
+            return self._to_records(result, fields, ChangedLeadRecord)
+
+    async def _get_last_record_ids(self) -> List[int]:
+        """
+        Retrieve the ID of the newest subject enrollment record of every shard.
+
+        The interleaved sequences of the shards advance at different paces, so
+        IDs are only ordered in time within a shard: a cursor over the records
+        needs the last ID of each one.
+
+        Returns:
+            List[int]: The greatest ID of each shard, in shard order. 0 for a
+            shard without records.
+        """
+        return await self._on_every_shard(self._select_last_record_id)
+
+    def _record_shard(self, record_id: int) -> int:
+        """Index of the shard of a record in the cursors of `_get_records_after`."""
+        return 0 if self._router is None else self._router.shard_for_id(record_id)
+
+    async def _get_records_after(self,
+                                 last_ids: List[int],
+                                 limit: int,
+                                 fields: Optional[List[str]] = None
+                                 ) -> List[Union[RetriveLeadRecord, Dict[str, Any]]]:
+        """
+        Retrieve the records after a cursor with the last ID of every shard.
+
+        Every shard returns its first `limit` records after its own last ID in
+        parallel, and they are merged by ID before the page is cut. The records
+        of each shard in the page are the first ones after its cursor, so a
+        record created later on a shard that lags behind, with a lower ID than
+        the others, is still returned.
+
+        Args:
+            last_ids (List[int]): Last ID of each shard, as `_get_last_record_ids`.
+            limit (int): Maximum number of records to return.
+            fields (Optional[List[str]]): Only select these columns, and the ID.
+
+        Returns:
+            List[Union[RetriveLeadRecord, Dict[str, Any]]]: The records, as
+            dictionaries of the selected columns when `fields` is given.
+        """
+        if self._router is None:
+            return await self._select_records(0, limit, after_id=last_ids[0], fields=fields)
+        results = await scatter({shard: (self._select_records, (0, limit),
+                                         dict(after_id=last_id, fields=fields))
+                                 for shard, last_id in enumerate(last_ids)})
+        record_id = (lambda record: record.id) if fields is None else itemgetter("id")
+        merged = heapq.merge(*(results[shard] for shard in sorted(results)), key=record_id)
+        return list(itertools.islice(merged, limit))
+
+    async def _select_last_record_id(self) -> int:
+        """Retrieve the ID of the newest record of the current shard."""
+        async with self._SessionLocal() as session:
+            result = await session.execute(
+                select(func.coalesce(func.max(SubjectEnrollment.id), 0)))
+            return result.scalar()
+
+    async def _get_records_by_ids(self,
+                                  record_ids: List[int],
+                                  fields: Optional[List[str]] = None
+                                  ) -> List[Union[RetriveLeadRecord, Dict[str, Any]]]:
+        """
+        Retrieve the complete lead records with the given subject enrollment IDs, in a single query.
+
+        Args:
+            record_ids (List[int]): The IDs of the subject enrollment records.
+            fields (Optional[List[str]]): Only select these columns, and the ID.
+
+        Returns:
+            List[Union[RetriveLeadRecord, Dict[str, Any]]]: The records found, in
+            no particular order, as dictionaries when `fields` is given. IDs
+            without a record are left out.
+        """
+        return await self._on_id_shards(self._select_records_by_ids, record_ids, fields)
+
+    async def _select_records_by_ids(self,
+                                     record_ids: List[int],
+                                     fields: Optional[List[str]] = None
+                                     ) -> List[Union[RetriveLeadRecord, Dict[str, Any]]]:
+        """Retrieve the records of the current shard with the given IDs."""
+        query = self._records_query(fields).where(SubjectEnrollment.id.in_(record_ids))
+        async with self._SessionLocal() as session:
+            result = await session.execute(query)
+            return self._to_records(result, fields)
+
+    @staticmethod
+    def _to_records(result,
+                    fields: Optional[List[str]],
+                    model: type = RetriveLeadRecord) -> List[Union[RetriveLeadRecord, Dict[str, Any]]]:
+        """Complete records as `model`, partial ones as dictionaries."""
+        if fields is None:
+            return [model(**row._mapping) for row in result]
+        return [dict(row._mapping) for row in result]
+
+    @routed("record_id")
     async def _build_record_by_id(self, record_id: int) -> RetriveLeadRecord:
         """
         Build a lead record by its subject enrollment ID.
@@ -457,6 +1340,11 @@ class DbHandler(metaclass=Singleton):
         record ID. It constructs and returns a `RetriveLeadRecord` object
         populated with the relevant data.
 
+        The lookups that don't depend on each other run concurrently, so in a
+        request their loaders batch them, and the reference rows come from the
+        catalog: only the enrollment, the student and the student_career rows
+        are queried.
+
         Args:
             record_id (int): The ID of the subject enrollment record.
 
@@ -466,12 +1354,13 @@ class DbHandler(metaclass=Singleton):
             and enrollment information.
         """
         record = await self._get_subject_enrollment_by_id(id=record_id)
-        student_obj = await self._get_student_by_id(record.student_id)
-        career_subject_obj = await self._get_career_subject_by_id(record.career_subject_id)
-        career_obj = await self._get_career_by_id(career_subject_obj.career_id)
-        student_career_obj = await self._get_student_career_by_ids(student_obj.student_id,
-                                                                        career_obj.id)
-        subject_obj = await self._get_subject_by_id(career_subject_obj.subject_id)
+        student_obj, career_subject_obj = await asyncio.gather(
+            self._get_student_by_id(record.student_id),
+            self._get_career_subject_by_id(record.career_subject_id))
+        career_obj, subject_obj, student_career_obj = await asyncio.gather(
+            self._get_career_by_id(career_subject_obj.career_id),
+            self._get_subject_by_id(career_subject_obj.subject_id),
+            self._get_student_career_by_ids(record.student_id, career_subject_obj.career_id))
         return RetriveLeadRecord(id=record_id,
                                 dni=student_obj.dni,
                                 name=student_obj.name,
@@ -483,3 +1372,139 @@ class DbHandler(metaclass=Singleton):
                                 enroll_times=record.enroll_times,
                                 career=career_obj.name,
                                 year_enroll=student_career_obj.year_enroll)
+
+    async def _increment_stats(self,
+                               session: "AsyncSession",
+                               keys: List[Tuple[str, Optional[int]]]) -> None:
+        """
+        Add one to the enrollment stats counters, in the transaction of the session.
+
+        Only delta rows are inserted, so concurrent enrollments don't wait on
+        the locks of the counters. `_fold_stats` adds them to the counters.
+
+        Args:
+            session (AsyncSession): Session with the write being counted.
+            keys (List[Tuple[str, Optional[int]]]): `(metric, key)` of each counter.
+        """
+        statement = enrollment_stats.increment(keys)
+        if statement is not None:
+            await session.execute(statement)
+
+    async def _fold_stats(self) -> int:
+        """
+        Add the enrollment stats deltas to their counters, and delete them.
+
+        Returns:
+            int: The number of deltas folded, on every shard.
+        """
+        return sum(await self._on_every_shard(self._fold_shard_stats))
+
+    async def _fold_shard_stats(self) -> int:
+        """Fold the enrollment stats deltas of the current shard. See `_fold_stats`."""
+        async with self._SessionLocal() as session:
+            async with session.begin():
+                # Only the deleted rows are added, not the ones committed meanwhile
+                deltas = (await session.execute(delete(EnrollmentStatDelta).returning(
+                    EnrollmentStatDelta.metric, EnrollmentStatDelta.key,
+                    EnrollmentStatDelta.delta))).all()
+                totals: Dict[Tuple[str, int], int] = dict()
+                for metric, key, delta in deltas:
+                    totals[(metric, key)] = totals.get((metric, key), 0) + delta
+                statement = enrollment_stats.add_totals(self._engine.dialect.name, totals)
+                if statement is not None:
+                    await session.execute(statement)
+        return len(deltas)
+
+    async def _get_stats(self, metric: str) -> List[Tuple[Union[str, int], int]]:
+        """
+        Retrieve the enrollment counters of a metric, from the most enrolled key.
+
+        Careers and subjects are reported by name, years and enroll times by value.
+        When sharded, the counters of every shard are added up.
+
+        Args:
+            metric (str): One of the `STAT_*` metrics.
+
+        Returns:
+            List[Tuple[Union[str, int], int]]: The key and total of every counter.
+        """
+        totals: Dict[int, List] = dict()
+        for rows in await self._on_every_shard(self._select_stats, metric):
+            for key, label, total in rows:
+                totals.setdefault(key, [label, 0])[1] += total
+        ordered = sorted(totals.items(), key=lambda item: (-item[1][1], item[0]))
+        return [(label, total) for _, (label, total) in ordered]
+
+    async def _select_stats(self, metric: str) -> List[Tuple[int, Union[str, int], int]]:
+        """Retrieve the `(key, label, total)` counters of a metric on the current shard."""
+        names = {STAT_CAREER: Career, STAT_SUBJECT: Subject}.get(metric)
+        counts = enrollment_stats.stored_counts(metric).subquery()
+        label = counts.c.key if names is None else names.name
+        query = select(counts.c.key, label, counts.c.total)
+        if names is not None:
+            query = query.join(names, names.id == counts.c.key)
+        query = (query.where(counts.c.total > 0)
+                 .order_by(counts.c.total.desc(), counts.c.key))
+        async with self._SessionLocal() as session:
+            result = await session.execute(query)
+            return [(key, label, total) for key, label, total in result]
+
+    async def _recompute_stats(self) -> int:
+        """
+        Rebuild every enrollment stats counter from the base tables.
+
+        On Postgres, the stats tables are locked until the commit: concurrent
+        enrollments wait for the new counters before adding their deltas, so
+        none is counted twice or lost. The deltas are dropped, the new counters
+        already count their enrollments. When sharded, every shard rebuilds its
+        own counters.
+
+        Returns:
+            int: The number of counters written.
+        """
+        return sum(await self._on_every_shard(self._recompute_shard_stats))
+
+    async def _recompute_shard_stats(self) -> int:
+        """Rebuild the enrollment stats counters of the current shard."""
+        async with self._SessionLocal() as session:
+            async with session.begin():
+                if self._engine.dialect.name == "postgresql":
+                    await session.execute(text("LOCK TABLE enrollment_stats, enrollment_stat_deltas "
+                                               "IN SHARE ROW EXCLUSIVE MODE"))
+                await session.execute(delete(EnrollmentStatDelta))
+                await session.execute(delete(EnrollmentStat))
+                written = 0
+                for query in enrollment_stats.grouped_counts().values():
+                    result = await session.execute(
+                        insert(EnrollmentStat).from_select(["metric", "key", "total"], query))
+                    written += result.rowcount
+            await session.commit()
+        return written
+
+    async def _check_stats(self) -> List[Tuple[str, int, int, int]]:
+        """
+        Compare the enrollment stats counters with `GROUP BY` queries on the base tables.
+
+        Returns:
+            List[Tuple[str, int, int, int]]: `(metric, key, expected, stored)` of
+            every counter that doesn't match, on any shard. Empty when the stats are consistent.
+        """
+        shards = await self._on_every_shard(self._check_shard_stats)
+        return [mismatch for mismatches in shards for mismatch in mismatches]
+
+    async def _check_shard_stats(self) -> List[Tuple[str, int, int, int]]:
+        """Compare the enrollment stats counters of the current shard. See `_check_stats`."""
+        async with self._SessionLocal() as session:
+            expected = dict()
+            for query in enrollment_stats.grouped_counts().values():
+                for metric, key, total in await session.execute(query):
+                    expected[(metric, key)] = total
+            stored = {(metric, key): total for metric, key, total in await session.execute(
+                enrollment_stats.stored_counts())}
+        mismatches = list()
+        for metric, key in sorted(expected.keys() | stored.keys()):
+            if expected.get((metric, key), 0) != stored.get((metric, key), 0):
+                mismatches.append((metric, key,
+                                   expected.get((metric, key), 0),
+                                   stored.get((metric, key), 0)))
+        return mismatches
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Request deadline module.
+
+Keeps the deadline of the current request in a context variable, so every
+DbHandler session can turn the remaining time into a statement timeout.
+"""
+
+import contextvars
+import math
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from challenge.exceptions import RequestDeadlineExceeded
+
+
+_deadline: contextvars.ContextVar[Optional[float]] = (
+    contextvars.ContextVar("request_deadline", default=None)
+)
+
+
+def request_timeout(milliseconds: int) -> Callable:
+    """Decorator that sets the default deadline of an endpoint, in milliseconds."""
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.request_timeout = milliseconds
+        return endpoint
+    return decorator
+
+
+@contextmanager
+def deadline_scope(timeout: float) -> Iterator[None]:
+    """Set the deadline of the code run inside, `timeout` seconds from now."""
+    token = _deadline.set(time.monotonic() + timeout)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, or None if there is no deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def remaining_ms() -> Optional[int]:
+    """
+    Milliseconds left before the deadline, or None if there is no deadline.
+
+    Raises:
+        RequestDeadlineExceeded: If the deadline has already passed.
+    """
+    seconds = remaining()
+    if seconds is None:
+        return None
+    if seconds <= 0:
+        raise RequestDeadlineExceeded("The request deadline was exceeded.")
+    return max(1, math.floor(seconds * 1000))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Enrollment stats module.
+
+Statements that maintain the `enrollment_stats` counters. Every metric counts
+rows of a base table grouped by one column:
+
+- career: student_career rows by career.
+- year: student_career rows by enrollment year.
+- subject: subject_enrollments rows by subject.
+- enroll_times: subject_enrollments rows by enroll times.
+
+Enrollments don't update the counters: concurrent enrollments would wait on
+the lock of the same counter rows, like `(enroll_times, 1)` or the current
+year, until they commit. Each one inserts a delta row per counter instead,
+and a background job folds the deltas into the counters. Reads add up the
+counters and the deltas not folded yet, so they are never behind.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Select, func, insert, literal, union_all
+from sqlalchemy.future import select
+
+from challenge.constants import (STAT_CAREER,
+                                 STAT_YEAR,
+                                 STAT_SUBJECT,
+                                 STAT_ENROLL_TIMES)
+from challenge.core.upsert import dialect_insert
+from challenge.models.sql_models import (StudentCareer,
+                                         CareerSubject,
+                                         SubjectEnrollment,
+                                         EnrollmentStat,
+                                         EnrollmentStatDelta)
+
+
+STAT_METRICS = (STAT_CAREER, STAT_YEAR, STAT_SUBJECT, STAT_ENROLL_TIMES)
+
+
+def grouped_counts() -> Dict[str, Select]:
+    """
+    Build the `GROUP BY` query of every metric from the base tables.
+
+    Each query returns the `metric`, `key` and `total` columns, so it can feed
+    an `INSERT ... SELECT` into `enrollment_stats`.
+    """
+    def grouped(metric: str, key, query):
+        return (query.add_columns(literal(metric).label("metric"),
+                                  key.label("key"),
+                                  func.count().label("total"))
+                .where(key.is_not(None))
+                .group_by(key))
+
+    return {
+        STAT_CAREER: grouped(STAT_CAREER, StudentCareer.career_id,
+                             select().select_from(StudentCareer)),
+        STAT_YEAR: grouped(STAT_YEAR, StudentCareer.year_enroll,
+                           select().select_from(StudentCareer)),
+        STAT_SUBJECT: grouped(STAT_SUBJECT, CareerSubject.subject_id,
+                              select().select_from(SubjectEnrollment)
+                              .join(CareerSubject,
+                                    CareerSubject.id == SubjectEnrollment.career_subject_id)),
+        STAT_ENROLL_TIMES: grouped(STAT_ENROLL_TIMES, SubjectEnrollment.enroll_times,
+                                   select().select_from(SubjectEnrollment)),
+    }
+
+
+def increment(keys: Iterable[Tuple[str, Optional[int]]]):
+    """
+    Build the insert of a delta of one for the counter of every `(metric, key)`.
+
+    Keys that are None are not counted, as in `grouped_counts`. The statement
+    runs in the transaction of the write it counts, so the deltas commit or
+    roll back with it.
+
+    Args:
+        keys (Iterable[Tuple[str, Optional[int]]]): Counters to increment.
+
+    Returns:
+        The insert statement, or None if there is nothing to count.
+    """
+    rows: List[dict] = [{"metric": metric, "key": key, "delta": 1}
+                        for metric, key in keys if key is not None]
+    if not rows:
+        return None
+    return insert(EnrollmentStatDelta).values(rows)
+
+
+def add_totals(dialect_name: str, totals: Dict[Tuple[str, int], int]):
+    """
+    Build the upsert that adds the folded deltas to their counters.
+
+    Args:
+        dialect_name (str): Name of the database dialect, postgresql or sqlite.
+        totals (Dict[Tuple[str, int], int]): Sum of the deltas of each `(metric, key)`.
+
+    Returns:
+        The upsert statement, or None if there is nothing to add.
+    """
+    if not totals:
+        return None
+    statement = dialect_insert(dialect_name)(EnrollmentStat).values(
+        [{"metric": metric, "key": key, "total": total}
+         for (metric, key), total in sorted(totals.items())])
+    return statement.on_conflict_do_update(
+        index_elements=[EnrollmentStat.metric, EnrollmentStat.key],
+        set_={"total": EnrollmentStat.total + statement.excluded.total})
+
+
+def stored_counts(metric: Optional[str] = None) -> Select:
+    """
+    Build the query of the counters plus their deltas not folded yet.
+
+    Returns the `metric`, `key` and `total` columns, of every metric or only of `metric`.
+    """
+    counters = select(EnrollmentStat.metric, EnrollmentStat.key, EnrollmentStat.total)
+    deltas = select(EnrollmentStatDelta.metric, EnrollmentStatDelta.key, EnrollmentStatDelta.delta)
+    if metric is not None:
+        counters = counters.where(EnrollmentStat.metric == metric)
+        deltas = deltas.where(EnrollmentStatDelta.metric == metric)
+    rows = union_all(counters, deltas).subquery()
+    return (select(rows.c.metric, rows.c.key, func.sum(rows.c.total).label("total"))
+            .group_by(rows.c.metric, rows.c.key))
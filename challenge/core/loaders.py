@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""Request loaders module.
+
+Keeps a set of loaders per request in a context variable. While a request
+runs, the lookups by ID of the DbHandler (`_get_student_by_id`,
+`_get_career_by_id`, `_get_subject_by_id` and `_get_career_subject_by_id`)
+go through them: the IDs asked for in the same event loop iteration are
+loaded with a single `WHERE id IN (...)` query, and each row found is kept
+for the rest of the request. Missing rows are not kept, so a row created
+later in the same request is found.
+
+Outside of a request, like in the CLI commands, every lookup is a query.
+"""
+
+import contextvars
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Hashable, Iterator, List, Optional
+
+from challenge.constants import MAX_BATCH_IDS
+from challenge.core.batching import BatchLoader
+
+if TYPE_CHECKING:
+    from challenge.core.db_handler import DbHandler
+
+
+_loaders: contextvars.ContextVar[Optional["RequestLoaders"]] = (
+    contextvars.ContextVar("request_loaders", default=None)
+)
+
+
+class MemoizedLoader:
+    """A `BatchLoader` that keeps the values found."""
+
+    def __init__(self, load_batch: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]) -> None:
+        self._batch = BatchLoader(load_batch, MAX_BATCH_IDS)
+        self._found: Dict[Hashable, Any] = dict()
+
+    async def load(self, key: Hashable) -> Any:
+        """Value of a key, or None if it doesn't exist."""
+        if key in self._found:
+            return self._found[key]
+        value = await self._batch.load(key)
+        if value is not None:
+            self._found[key] = value
+        return value
+
+
+class RequestLoaders:
+    """The loaders of a request, one per table."""
+
+    def __init__(self, db_handler: "DbHandler") -> None:
+        self.students = MemoizedLoader(db_handler._load_students)
+        self.careers = MemoizedLoader(db_handler._load_careers)
+        self.subjects = MemoizedLoader(db_handler._load_subjects)
+        self.career_subjects = MemoizedLoader(db_handler._load_career_subjects)
+
+
+@contextmanager
+def loader_scope(db_handler: "DbHandler") -> Iterator[RequestLoaders]:
+    """Batch and memoize the lookups of the code run inside, like a request."""
+    token = _loaders.set(RequestLoaders(db_handler))
+    try:
+        yield _loaders.get()
+    finally:
+        _loaders.reset(token)
+
+
+def current_loaders() -> Optional[RequestLoaders]:
+    """Loaders of the current request, or None outside of a request."""
+    return _loaders.get()
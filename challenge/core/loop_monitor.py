@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Event loop lag monitor module.
+
+Sync work on the event loop (file logging, a slow first construction,
+serializing a large response) delays every request in flight. The monitor
+measures that delay continuously: a task sleeps `interval` seconds at a
+time, and the time it wakes up late is the lag of the loop.
+
+A stalled loop can't report on itself, so a watchdog thread checks the
+heartbeat of the task. When it's older than `stall_threshold`, the thread
+logs the stack of the loop thread, which is the code blocking it.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, Optional
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    """Value under which `fraction` of the ordered values are (nearest rank)."""
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LoopLagMonitor:
+    """Lag samples of the event loop, and a watchdog of its stalls."""
+
+    def __init__(self,
+                 logger: logging.Logger,
+                 interval: float = 0.1,
+                 stall_threshold: float = 0.25,
+                 report_every: float = 60,
+                 window: int = 1000) -> None:
+        """
+        Args:
+            logger (logging.Logger): Logger of the stalls and the periodic reports.
+            interval (float): Seconds between two samples.
+            stall_threshold (float): Lag, in seconds, from which the loop is stalled.
+            report_every (float): Seconds between two reports of the lag percentiles.
+            window (int): Latest samples the percentiles are computed on.
+        """
+        self.logger = logger
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.report_every = report_every
+        self.stalls = 0
+        self._lags: deque = deque(maxlen=window)
+        self._heartbeat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._stopped = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    def status(self) -> Dict[str, float]:
+        """Lag percentiles of the latest samples in milliseconds, and the stalls so far."""
+        lags = sorted(self._lags)
+        return {"p50_ms": round(percentile(lags, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(lags, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(lags, 0.99) * 1000, 1),
+                "max_ms": round((lags[-1] if lags else 0.0) * 1000, 1),
+                "samples": len(lags),
+                "stalls": self.stalls}
+
+    def record(self, lag: float) -> None:
+        """Keep a lag sample, in seconds."""
+        self._lags.append(lag)
+        if lag >= self.stall_threshold:
+            self.stalls += 1
+            self.logger.warning(f"Event loop stalled for {lag * 1000:.0f}ms.")
+
+    async def run(self) -> None:
+        """Sample the lag until cancelled, with the watchdog running meanwhile."""
+        self._start_watchdog()
+        last_report = time.monotonic()
+        try:
+            while True:
+                started = time.monotonic()
+                self._heartbeat = started
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                self._heartbeat = now
+                self.record(max(0.0, now - started - self.interval))
+                if now - last_report >= self.report_every:
+                    last_report = now
+                    self.logger.info(f"Event loop lag: {self.status()}")
+        finally:
+            self._stopped.set()
+
+    def _start_watchdog(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def _watch(self) -> None:
+        """Log the stack of the loop thread once per stall, while it's stalled."""
+        reported: Optional[float] = None
+        while not self._stopped.wait(self.interval):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.stall_threshold or reported == heartbeat:
+                continue
+            reported = heartbeat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame))
+            self.logger.warning(f"Event loop blocked for more than {blocked * 1000:.0f}ms, in:\n{stack}")
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Partitions module.
+
+Maintenance of the yearly range partitions of `subject_enrollments`, once the
+table has been converted with `postgresql/migrations/004_partition_subject_enrollments.sql`.
+Partitions are named `subject_enrollments_y<year>` and hold the rows whose
+`date` falls in that year. On a table that isn't partitioned every function
+is a no-op, so the maintenance can run against any database.
+
+The primary key is `(id, date)`, so the lookups by ID alone (`/records/{id}`,
+`?ids=`, the `after_id` keyset) can't be pruned: they probe the primary key
+index of every attached partition. Archiving the old partitions keeps that
+number bounded.
+"""
+
+import datetime
+import re
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from challenge.constants import STAT_SUBJECT, STAT_ENROLL_TIMES
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+
+PARENT_TABLE = "subject_enrollments"
+ARCHIVE_SCHEMA = "archive"
+PARTITION_NAME = re.compile(rf"^{PARENT_TABLE}_y(\d{{4}})$")
+# Maximum wait for the locks of a partition change, so it never queues the traffic for long
+LOCK_TIMEOUT = "5s"
+
+
+def partition_name(year: int) -> str:
+    """Returns the name of the partition that holds the rows of `year`."""
+    return f"{PARENT_TABLE}_y{year}"
+
+
+def partition_bounds(year: int) -> Tuple[str, str]:
+    """Returns the lower (inclusive) and upper (exclusive) bounds of a partition."""
+    return f"{year}-01-01", f"{year + 1}-01-01"
+
+
+async def is_partitioned(connection: "AsyncConnection") -> bool:
+    """Whether `subject_enrollments` is a partitioned table."""
+    if connection.dialect.name != "postgresql":
+        return False
+    result = await connection.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass(:parent))"), {"parent": PARENT_TABLE})
+    return bool(result.scalar())
+
+
+async def list_partitions(connection: "AsyncConnection") -> List[Tuple[int, str]]:
+    """
+    List the yearly partitions attached to `subject_enrollments`, oldest first.
+
+    Returns:
+        List[Tuple[int, str]]: The year and name of each partition. Other
+        partitions, like a default one, are not listed.
+    """
+    result = await connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:parent)"), {"parent": PARENT_TABLE})
+    partitions = list()
+    for (name,) in result:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((int(match.group(1)), name))
+    return sorted(partitions)
+
+
+async def create_partition(connection: "AsyncConnection", year: int) -> None:
+    """
+    Create the partition of `year` without blocking the writes on the parent.
+
+    `CREATE TABLE ... PARTITION OF` locks the whole table. Instead, the table
+    is created apart with a CHECK constraint equal to the partition bounds,
+    so `ATTACH PARTITION` (which only blocks schema changes) skips the scan.
+    New partitions are empty, their indexes are built at once on attach.
+    """
+    name = partition_name(year)
+    lower, upper = partition_bounds(year)
+    await connection.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+    await connection.execute(text(
+        f"CREATE TABLE {name} (LIKE {PARENT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    await connection.execute(text(
+        f"ALTER TABLE {name} ADD CONSTRAINT {name}_bounds "
+        f"CHECK (date >= '{lower}' AND date < '{upper}')"))
+    await connection.execute(text(
+        f"ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{lower}') TO ('{upper}')"))
+    await connection.execute(text(f"ALTER TABLE {name} DROP CONSTRAINT {name}_bounds"))
+
+
+async def ensure_partitions(engine: "AsyncEngine",
+                            years_ahead: int,
+                            today: Optional[datetime.date] = None,
+                            first_year: Optional[int] = None) -> List[str]:
+    """
+    Create the missing partitions from the current year to `years_ahead` years later.
+
+    Each partition is created in its own transaction. `first_year` extends
+    the range backwards, to load older rows (for example with `challenge-seed`).
+
+    Returns:
+        List[str]: The names of the partitions created.
+    """
+    today = today or datetime.date.today()
+    created = list()
+    async with engine.connect() as connection:
+        if not await is_partitioned(connection):
+            return created
+        existing = {year for year, _ in await list_partitions(connection)}
+        await connection.commit()
+        first_year = min(first_year or today.year, today.year)
+        for year in range(first_year, today.year + years_ahead + 1):
+            if year in existing:
+                continue
+            async with connection.begin():
+                await create_partition(connection, year)
+            created.append(partition_name(year))
+    return created
+
+
+async def archive_partitions(engine: "AsyncEngine",
+                             keep_years: int,
+                             today: Optional[datetime.date] = None) -> List[str]:
+    """
+    Move the partitions older than `keep_years` full years to the archive schema.
+
+    On Postgres 14+ the partition is detached with `DETACH PARTITION ... CONCURRENTLY`,
+    which doesn't block the queries on the parent. It can't be used when the
+    table has a default partition: then the plain `DETACH` is used, bounded by
+    the lock timeout. Detached partitions keep their rows, they are only out
+    of reach of the API, and of the enrollment stats (see `_move_to_archive`).
+
+    Returns:
+        List[str]: The names of the partitions archived.
+    """
+    today = today or datetime.date.today()
+    archived = list()
+    async with engine.connect() as connection:
+        # DETACH ... CONCURRENTLY can't run inside a transaction block
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+        if not await is_partitioned(connection):
+            return archived
+        concurrently = await _can_detach_concurrently(connection)
+        await connection.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+        await connection.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+        # Detached by an archive that was interrupted before moving them
+        for name in await _detached_partitions(connection):
+            await _move_to_archive(engine, name)
+            archived.append(name)
+        for year, name in await list_partitions(connection):
+            if year >= today.year - keep_years:
+                continue
+            if await _detach_pending(connection, name):
+                # A previous concurrent detach was interrupted
+                await connection.execute(text(
+                    f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name} FINALIZE"))
+            else:
+                await connection.execute(text(
+                    f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"
+                    f"{' CONCURRENTLY' if concurrently else ''}"))
+            await _move_to_archive(engine, name)
+            archived.append(name)
+    return archived
+
+
+async def _move_to_archive(engine: "AsyncEngine", name: str) -> None:
+    """
+    Move a detached partition to the archive schema, and take its rows out of the enrollment stats.
+
+    The `subject` and `enroll_times` counters get a negative delta with the
+    grouped counts of the partition, folded like the deltas of the
+    enrollments. Both changes commit together, so an archive interrupted and
+    run again never subtracts a partition twice.
+    """
+    async with engine.begin() as connection:
+        await connection.execute(text(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'"))
+        await connection.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        archived = f"{ARCHIVE_SCHEMA}.{name}"
+        await connection.execute(text(
+            f"INSERT INTO enrollment_stat_deltas (metric, key, delta) "
+            f"SELECT :subject, career_subject.subject_id, -count(*) FROM {archived} "
+            f"JOIN career_subject ON career_subject.id = {archived}.career_subject_id "
+            f"GROUP BY career_subject.subject_id "
+            f"UNION ALL "
+            f"SELECT :enroll_times, enroll_times, -count(*) FROM {archived} "
+            f"WHERE enroll_times IS NOT NULL GROUP BY enroll_times"),
+            {"subject": STAT_SUBJECT, "enroll_times": STAT_ENROLL_TIMES})
+
+
+async def _detached_partitions(connection: "AsyncConnection") -> List[str]:
+    """Yearly partitions already detached, but not moved to the archive schema yet."""
+    result = await connection.execute(text(
+        "SELECT relname FROM pg_class "
+        "WHERE relnamespace = to_regnamespace(current_schema()) "
+        "AND relkind = 'r' AND NOT relispartition"))
+    return sorted(name for (name,) in result if PARTITION_NAME.match(name))
+
+
+async def _can_detach_concurrently(connection: "AsyncConnection") -> bool:
+    """Postgres 14+ and no default partition."""
+    version = (await connection.execute(text("SHOW server_version_num"))).scalar()
+    if int(version) < 140000:
+        return False
+    result = await connection.execute(text(
+        "SELECT partdefid = 0 FROM pg_partitioned_table "
+        "WHERE partrelid = to_regclass(:parent)"), {"parent": PARENT_TABLE})
+    return bool(result.scalar())
+
+
+async def _detach_pending(connection: "AsyncConnection", name: str) -> bool:
+    """Whether a concurrent detach of the partition was left unfinished (Postgres 14+)."""
+    version = (await connection.execute(text("SHOW server_version_num"))).scalar()
+    if int(version) < 140000:
+        return False
+    result = await connection.execute(text(
+        "SELECT inhdetachpending FROM pg_inherits "
+        "WHERE inhrelid = to_regclass(:name)"), {"name": name})
+    return bool(result.scalar())
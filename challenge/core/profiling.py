@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Request profiling module.
+
+Keeps the cProfile profiles of single requests in a directory, bounded to
+the newest `max_files`. The method, route and latency of the request are in
+the file name, so they can be listed without reading the profiles:
+
+    1718000000123-7_GET_records_{record_id}_184ms.prof
+
+The files are in the `pstats` format:
+`python -m pstats <file>`, or `snakeviz <file>`.
+"""
+
+import itertools
+import re
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Union
+
+if TYPE_CHECKING:
+    from cProfile import Profile
+
+
+PROFILE_SUFFIX = ".prof"
+PROFILE_NAME = re.compile(r"^(?P<id>\d+-\d+)_(?P<method>[A-Z]+)_(?P<route>.*)_(?P<latency>\d+)ms\.prof$")
+
+
+@dataclass(frozen=True)
+class ProfileInfo:
+    """A stored profile, as described by its file name."""
+    id: str
+    method: str
+    route: str
+    latency_ms: int
+    created: float
+    size: int
+    file_name: str
+
+
+def route_slug(route: str) -> str:
+    """Route template, like `/records/{record_id}`, as a file name part."""
+    return re.sub(r"[^A-Za-z0-9_{}.-]+", "_", route.strip("/")) or "root"
+
+
+def profile_order(path: Path) -> tuple:
+    """Sort key of a profile file: the time and counter of its ID."""
+    milliseconds, counter = PROFILE_NAME.match(path.name)["id"].split("-")
+    return int(milliseconds), int(counter)
+
+
+class ProfileStore:
+    """Directory of request profiles, keeping the newest `max_files`."""
+
+    def __init__(self, directory: Union[str, Path], max_files: int) -> None:
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self._ids = itertools.count()
+
+    def new_id(self) -> str:
+        """Unique ID of a profile of this process, sortable by time."""
+        return f"{int(time.time() * 1000)}-{next(self._ids)}"
+
+    def save(self, profile: "Profile", profile_id: str, method: str, route: str, latency: float) -> Path:
+        """
+        Write a profile, and drop the oldest ones over `max_files`.
+
+        Args:
+            profile (Profile): The stopped profiler.
+            profile_id (str): ID from `new_id`.
+            method (str): HTTP method of the request.
+            route (str): Route template of the request.
+            latency (float): Seconds the request took.
+
+        Returns:
+            Path: The file written.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / (f"{profile_id}_{method}_{route_slug(route)}_"
+                                 f"{round(latency * 1000)}ms{PROFILE_SUFFIX}")
+        profile.dump_stats(str(path))
+        for old in self._files()[self.max_files:]:
+            old.unlink(missing_ok=True)
+        return path
+
+    def _files(self) -> List[Path]:
+        """Profile files, the newest first."""
+        if not self.directory.exists():
+            return list()
+        files = [path for path in self.directory.iterdir() if PROFILE_NAME.match(path.name)]
+        return sorted(files, key=profile_order, reverse=True)
+
+    def list(self) -> List[ProfileInfo]:
+        """Stored profiles, the newest first."""
+        profiles = list()
+        for path in self._files():
+            match = PROFILE_NAME.match(path.name)
+            stat = path.stat()
+            profiles.append(ProfileInfo(id=match["id"],
+                                        method=match["method"],
+                                        route=match["route"],
+                                        latency_ms=int(match["latency"]),
+                                        created=stat.st_mtime,
+                                        size=stat.st_size,
+                                        file_name=path.name))
+        return profiles
+
+    def find(self, profile_id: str) -> Optional[Path]:
+        """File of the profile with the given ID, if it's still stored."""
+        for profile in self.list():
+            if profile.id == profile_id:
+                return self.directory / profile.file_name
+        return None
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Query counter module.
+
+Hooks the SQLAlchemy engine used by the DbHandler and records every statement
+executed while a counter is active, so query budgets and N+1 patterns can be
+detected per request.
+"""
+
+import contextvars
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+_current_counter: contextvars.ContextVar[Optional["QueryCounter"]] = (
+    contextvars.ContextVar("query_counter", default=None)
+)
+_global_counters: List["QueryCounter"] = []
+
+# Execution option that keeps a statement out of the counters, used for the
+# session settings issued by the DbHandler itself
+SKIP_QUERY_COUNT = "skip_query_count"
+
+
+class QueryCounter:
+    """Collects the statements executed while it is active."""
+
+    def __init__(self) -> None:
+        """Initializes an empty counter."""
+        self.statements: List[Tuple[str, Any]] = []
+
+    @property
+    def count(self) -> int:
+        """Number of statements recorded."""
+        return len(self.statements)
+
+    def record(self, statement: str, parameters: Any) -> None:
+        """Stores an executed statement and its parameters."""
+        self.statements.append((statement, parameters))
+
+    def repeated_statements(self, threshold: int = 2) -> Dict[str, int]:
+        """
+        Return the statements executed repeatedly with different parameters.
+
+        This is the signature of an N+1 pattern: the same query issued once
+        per item of a previously fetched list.
+
+        Args:
+            threshold (int): Minimum number of executions to report a statement.
+
+        Returns:
+            Dict[str, int]: Statement text mapped to its number of executions.
+        """
+        executions: Dict[str, int] = defaultdict(int)
+        parameters_seen: Dict[str, set] = defaultdict(set)
+        for statement, parameters in self.statements:
+            executions[statement] += 1
+            parameters_seen[statement].add(repr(parameters))
+        return {
+            statement: times
+            for statement, times in executions.items()
+            if times >= threshold and len(parameters_seen[statement]) > 1
+        }
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """SQLAlchemy hook that forwards each statement to the active counters."""
+    if context is not None and context.execution_options.get(SKIP_QUERY_COUNT):
+        return
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.record(statement, parameters)
+    for global_counter in _global_counters:
+        if global_counter is not counter:
+            global_counter.record(statement, parameters)
+
+
+def instrument_engine(engine: Any) -> None:
+    """
+    Attach the statement hook to an engine.
+
+    Args:
+        engine (Any): A sync `Engine` or an `AsyncEngine`. Calling it more than
+        once on the same engine is harmless.
+    """
+    sync_engine: Engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    """Count the statements executed in the current context (request or task)."""
+    counter = QueryCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+@contextmanager
+def capture_all_queries() -> Iterator[QueryCounter]:
+    """
+    Count every statement executed by instrumented engines, in any context.
+
+    Useful in tests, where the application runs in a different thread than
+    the assertions.
+    """
+    counter = QueryCounter()
+    _global_counters.append(counter)
+    try:
+        yield counter
+    finally:
+        _global_counters.remove(counter)
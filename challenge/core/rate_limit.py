@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""Rate limit module.
+
+Token buckets per client and route class. Each bucket holds up to `burst`
+tokens and is refilled at `rate` tokens per second; a request takes a token,
+or is refused with the time until the next one.
+
+The buckets live in a store. `MemoryBucketStore` keeps them in the process,
+in an LRU of bounded size, so each worker limits on its own.
+`SQLiteBucketStore` keeps them in a local SQLite file, shared by the workers
+of the host, so the limits apply to all of them together. The middleware
+checks them with `take_async`, which moves the SQLite transactions off the
+event loop.
+"""
+
+import asyncio
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from challenge.constants import RATE_LIMIT_MEMORY, RATE_LIMIT_SQLITE
+
+
+# Route classes, each with its own limits
+READ_ROUTES = "read"
+WRITE_ROUTES = "write"
+IMPORT_ROUTES = "import"
+
+
+def rate_limit_class(name: str) -> Callable:
+    """
+    Decorator that sets the rate limit class of an endpoint.
+
+    Endpoints without it are `READ_ROUTES` for reads (GET) and `WRITE_ROUTES`
+    otherwise. Imports, which write many rows per request, should use
+    `IMPORT_ROUTES`.
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        endpoint.rate_limit_class = name
+        return endpoint
+    return decorator
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Tokens added per second, and the most a bucket holds."""
+    rate: float
+    burst: int
+
+
+@dataclass(frozen=True)
+class Decision:
+    """Result of taking a token from a bucket."""
+    allowed: bool
+    # Tokens left, rounded down
+    remaining: int
+    # Seconds until the request can be retried, 0 when allowed
+    retry_after: float
+    # Seconds until the bucket is full again
+    reset: float
+
+
+def parse_limits(value: str) -> Dict[str, RateLimit]:
+    """
+    Limits of each route class, from a string like `read=50:100,write=10:20`.
+
+    Each item is `class=rate:burst`, with the tokens per second and the bucket size.
+
+    Raises:
+        ValueError: If an item doesn't have that format, or isn't positive.
+    """
+    limits = dict()
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        try:
+            name, limit = item.split("=")
+            rate, burst = limit.split(":")
+            limit = RateLimit(rate=float(rate), burst=int(burst))
+        except ValueError:
+            raise ValueError(f"Invalid rate limit '{item}', expected 'class=rate:burst'")
+        if limit.rate <= 0 or limit.burst < 1:
+            raise ValueError(f"Invalid rate limit '{item}', the rate and burst must be positive")
+        limits[name.strip()] = limit
+    return limits
+
+
+def refill(tokens: float, updated: float, limit: RateLimit, now: float) -> float:
+    """Tokens of a bucket at `now`, after the ones added since `updated`."""
+    return min(limit.burst, tokens + max(0.0, now - updated) * limit.rate)
+
+
+def take_token(tokens: float, limit: RateLimit) -> Tuple[float, Decision]:
+    """Take a token from a refilled bucket. Returns its new tokens and the decision."""
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    retry_after = 0.0 if allowed else (1 - tokens) / limit.rate
+    decision = Decision(allowed=allowed,
+                        remaining=math.floor(tokens),
+                        retry_after=retry_after,
+                        reset=(limit.burst - tokens) / limit.rate)
+    return tokens, decision
+
+
+class BucketStore:
+    """Storage of the token buckets."""
+
+    def take(self, key: str, limit: RateLimit, now: Optional[float] = None) -> Decision:
+        """Take a token from the bucket of `key`, a full bucket if it's new."""
+        raise NotImplementedError
+
+    async def take_async(self, key: str, limit: RateLimit) -> Decision:
+        """`take` from the event loop. Stores that block must run it in a thread."""
+        return self.take(key, limit)
+
+    def close(self) -> None:
+        """Release the resources of the store."""
+
+
+class MemoryBucketStore(BucketStore):
+    """Buckets of this process, in an LRU of at most `max_buckets`.
+
+    A bucket dropped from the LRU starts again full, so the size must hold
+    the clients active within a refill period. Every check is O(1).
+    """
+
+    def __init__(self, max_buckets: int = 10_000) -> None:
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, limit: RateLimit, now: Optional[float] = None) -> Decision:
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(limit.burst)
+            if len(self._buckets) >= self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            tokens = refill(*bucket, limit, now)
+            self._buckets.move_to_end(key)
+        tokens, decision = take_token(tokens, limit)
+        self._buckets[key] = (tokens, now)
+        return decision
+
+
+class SQLiteBucketStore(BucketStore):
+    """Buckets in a local SQLite file, shared by the processes that open it.
+
+    Each check is a short write transaction on the row of the bucket, so
+    concurrent workers never lose tokens. Buckets idle for `idle_seconds`,
+    which must be longer than the time to refill one, are deleted every
+    `prune_every` checks.
+    """
+
+    def __init__(self, path: str, idle_seconds: float = 3600, prune_every: int = 1000) -> None:
+        self.path = path
+        self.idle_seconds = idle_seconds
+        self.prune_every = prune_every
+        self._checks = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=5, isolation_level=None,
+                                           check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("CREATE TABLE IF NOT EXISTS rate_limit_buckets "
+                                 "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    def take(self, key: str, limit: RateLimit, now: Optional[float] = None) -> Decision:
+        # The clock is shared by the processes, unlike the monotonic one
+        now = time.time() if now is None else now
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute("SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?",
+                                         (key,)).fetchone()
+                tokens = float(limit.burst) if row is None else refill(*row, limit, now)
+                tokens, decision = take_token(tokens, limit)
+                connection.execute("INSERT INTO rate_limit_buckets (key, tokens, updated) "
+                                   "VALUES (?, ?, ?) ON CONFLICT (key) "
+                                   "DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                                   (key, tokens, now))
+                self._checks += 1
+                if self._checks % self.prune_every == 0:
+                    connection.execute("DELETE FROM rate_limit_buckets WHERE updated < ?",
+                                       (now - self.idle_seconds,))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return decision
+
+    async def take_async(self, key: str, limit: RateLimit) -> Decision:
+        # The transaction waits for the other workers, up to the busy timeout
+        return await asyncio.to_thread(self.take, key, limit)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def open_bucket_store(backend: str, max_buckets: int, path: str) -> BucketStore:
+    """
+    Store of the given backend.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == RATE_LIMIT_MEMORY:
+        return MemoryBucketStore(max_buckets)
+    if backend == RATE_LIMIT_SQLITE:
+        return SQLiteBucketStore(path)
+    raise ValueError(f"Unknown rate limit backend '{backend}', "
+                     f"expected '{RATE_LIMIT_MEMORY}' or '{RATE_LIMIT_SQLITE}'")
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Schema module.
+
+Creates the tables of `sql_models` and the pre-set data of
+`postgresql/initdb.sql` on databases that don't run that script, such as
+the in-memory SQLite database of `DATABASE_URL=sqlite+aiosqlite://`.
+"""
+
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import URL
+
+from challenge.models.sql_models import (Base,
+                                         Student,
+                                         Career,
+                                         Subject,
+                                         CareerSubject)
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+# Pre-set data, in the order of initdb.sql so the IDs are the same
+PRESET_STUDENTS: List[Dict[str, str]] = [
+    {"dni": "12345678", "name": "Alice Smith", "email": "alice.smith@example.com",
+     "phone": "555-1111", "address": "Address 123"},
+    {"dni": "23456789", "name": "Bob Johnson", "email": "bob.johnson@example.com",
+     "phone": "555-2222", "address": "Address 234"},
+    {"dni": "34567890", "name": "Carol Williams", "email": "carol.williams@example.com",
+     "phone": "555-3333", "address": "Address 345"},
+    {"dni": "45678901", "name": "David Brown", "email": "david.brown@example.com",
+     "phone": "555-4444", "address": "Address 456"},
+]
+PRESET_SUBJECTS: List[Tuple[str, int]] = [
+    ("mathematics", 6), ("physics", 5), ("chemistry", 3), ("biology", 4),
+    ("computer_science", 5), ("electronic_circuits", 3), ("digital_systems", 6),
+    ("structural_analysis", 5), ("geotechnical_engineering", 4),
+    ("organic_chemistry", 3), ("inorganic_chemistry", 4),
+]
+PRESET_CAREERS: List[str] = ["electrical_engineering", "civil_engineering", "chemical_engineering"]
+PRESET_CAREER_SUBJECTS: List[Tuple[str, str]] = [
+    ("electrical_engineering", "electronic_circuits"), ("electrical_engineering", "digital_systems"),
+    ("civil_engineering", "structural_analysis"), ("civil_engineering", "geotechnical_engineering"),
+    ("chemical_engineering", "organic_chemistry"), ("chemical_engineering", "inorganic_chemistry"),
+    ("electrical_engineering", "mathematics"), ("electrical_engineering", "physics"),
+    ("electrical_engineering", "computer_science"),
+    ("civil_engineering", "mathematics"), ("civil_engineering", "physics"),
+    ("civil_engineering", "chemistry"),
+    ("chemical_engineering", "mathematics"), ("chemical_engineering", "chemistry"),
+    ("chemical_engineering", "biology"),
+]
+
+
+def is_in_memory(url: URL) -> bool:
+    """Whether the URL is an in-memory SQLite database, which lives as long as its connection."""
+    return (url.get_backend_name() == "sqlite"
+            and (url.database in (None, "", ":memory:") or url.query.get("mode") == "memory"))
+
+
+async def create_schema(engine: "AsyncEngine", seed: bool = True) -> bool:
+    """
+    Create the missing tables and indexes, and the pre-set data on an empty database.
+
+    Args:
+        engine (AsyncEngine): Engine of the database.
+        seed (bool): Insert the pre-set students, careers and subjects.
+
+    Returns:
+        bool: Whether the pre-set data was inserted.
+    """
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        if not seed or (await connection.execute(select(func.count()).select_from(Career))).scalar():
+            return False
+        await connection.execute(insert(Student), PRESET_STUDENTS)
+        await connection.execute(insert(Subject), [{"id": subject_id, "name": name,
+                                                    "class_duration": class_duration}
+                                                   for subject_id, (name, class_duration)
+                                                   in enumerate(PRESET_SUBJECTS, start=1)])
+        await connection.execute(insert(Career), [{"id": career_id, "name": name}
+                                                  for career_id, name
+                                                  in enumerate(PRESET_CAREERS, start=1)])
+        career_ids = {name: career_id for career_id, name in enumerate(PRESET_CAREERS, start=1)}
+        subject_ids = {name: subject_id
+                       for subject_id, (name, _) in enumerate(PRESET_SUBJECTS, start=1)}
+        await connection.execute(insert(CareerSubject), [
+            {"id": link_id, "career_id": career_ids[career], "subject_id": subject_ids[subject]}
+            for link_id, (career, subject) in enumerate(PRESET_CAREER_SUBJECTS, start=1)])
+    return True
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""In-memory lead search index.
+
+Fallback of the pg_trgm search for databases without it (tests, SQLite). It
+follows the same ranking: exact DNI first, then name or email prefix matches,
+then fuzzy matches by trigram similarity.
+"""
+
+import bisect
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from challenge.models.sql_models import Student
+
+
+# Same default as pg_trgm's similarity_threshold
+SIMILARITY_THRESHOLD = 0.3
+EXACT_RANK = 3
+PREFIX_RANK = 2
+FUZZY_RANK = 1
+
+_WORDS = re.compile(r"[^\W_]+")
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigrams of a text, computed like pg_trgm does."""
+    result = set()
+    for word in _WORDS.findall(text.lower()):
+        padded = f"  {word} "
+        result.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return result
+
+
+def similarity(first: Set[str], second: Set[str]) -> float:
+    """Ratio of shared trigrams, like pg_trgm's similarity()."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+class LeadSearchIndex:
+    """Prefix and trigram index over the name and email of the students."""
+
+    def __init__(self, students: Iterable[Student] = ()) -> None:
+        """Builds the index with the given students."""
+        self._students: Dict[int, Student] = dict()
+        self._ids_by_dni: Dict[str, Set[int]] = defaultdict(set)
+        self._prefix_keys: List[Tuple[str, int]] = list()
+        self._trigrams: Dict[int, Tuple[Set[str], Set[str]]] = dict()
+        self._ids_by_trigram: Dict[str, Set[int]] = defaultdict(set)
+        for student in students:
+            self.add(student)
+
+    def add(self, student: Student) -> None:
+        """Index a student."""
+        student_id = student.student_id
+        self._students[student_id] = student
+        self._ids_by_dni[student.dni].add(student_id)
+        for text in (student.name, student.email):
+            if text:
+                bisect.insort(self._prefix_keys, (text.lower(), student_id))
+        name_trigrams = trigrams(student.name or "")
+        email_trigrams = trigrams(student.email or "")
+        self._trigrams[student_id] = (name_trigrams, email_trigrams)
+        for trigram in name_trigrams | email_trigrams:
+            self._ids_by_trigram[trigram].add(student_id)
+
+    def _prefix_matches(self, query: str) -> Set[int]:
+        """IDs of the students whose name or email starts with the query."""
+        query = query.lower()
+        matches = set()
+        position = bisect.bisect_left(self._prefix_keys, (query, -1))
+        while position < len(self._prefix_keys):
+            key, student_id = self._prefix_keys[position]
+            if not key.startswith(query):
+                break
+            matches.add(student_id)
+            position += 1
+        return matches
+
+    def search(self, query: str, limit: int) -> List[Student]:
+        """
+        Search students by DNI, name or email.
+
+        Args:
+            query (str): Exact DNI, or partial name or email.
+            limit (int): Maximum number of students to return.
+
+        Returns:
+            List[Student]: Matching students, best ranked first.
+        """
+        query = query.strip()
+        query_trigrams = trigrams(query)
+        exact = self._ids_by_dni.get(query, set())
+        prefix = self._prefix_matches(query)
+        candidates = set()
+        for trigram in query_trigrams:
+            candidates.update(self._ids_by_trigram.get(trigram, ()))
+
+        scored = list()
+        for student_id in exact | prefix | candidates:
+            name_trigrams, email_trigrams = self._trigrams[student_id]
+            score = max(similarity(query_trigrams, name_trigrams),
+                        similarity(query_trigrams, email_trigrams))
+            if student_id in exact:
+                rank = EXACT_RANK
+            elif student_id in prefix:
+                rank = PREFIX_RANK
+            elif score >= SIMILARITY_THRESHOLD:
+                rank = FUZZY_RANK
+            else:
+                continue
+            scored.append((-rank, -score, student_id))
+        scored.sort()
+        return [self._students[student_id] for _, _, student_id in scored[:limit]]
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""Sharding module.
+
+In sharded mode (`SHARD_DATABASE_URLS` with more than one database), the
+student-owned rows (students, student_career and subject_enrollments) live in
+the shard picked by a hash of the student's DNI. The reference tables
+(careers, subjects and career_subject) are replicated to every shard.
+
+IDs are globally unique because the sequences of each shard are interleaved:
+shard `i` of `n` hands out `i + 1`, `i + 1 + n`, `i + 1 + 2n`... so the shard
+of a row is known from its ID alone. `challenge-shards init` configures them
+on Postgres. The shards without sequences (SQLite) get their IDs explicitly,
+from `interleaved_id`.
+
+The DbHandler reads the shard to use from the `current_shard` context variable.
+"""
+
+import asyncio
+import functools
+import inspect
+import zlib
+from contextvars import ContextVar
+from typing import (TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterable,
+                    List, Tuple, TypeVar)
+
+from sqlalchemy import func, text
+from sqlalchemy.future import select
+
+from challenge.core.upsert import dialect_insert
+from challenge.models.sql_models import Student, Career, Subject, CareerSubject
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+T = TypeVar("T")
+
+# Shard of the database statements of the current task. 0 when not sharded.
+current_shard: ContextVar[int] = ContextVar("current_shard", default=0)
+
+BY_DNI = "dni"
+BY_ID = "id"
+
+# Sequences interleaved across the shards: (sequence, table, column)
+SHARDED_SEQUENCES = [
+    ("students_student_id_seq", "students", "student_id"),
+    ("student_career_id_seq", "student_career", "id"),
+    ("subject_enrollments_id_seq", "subject_enrollments", "id"),
+]
+# Replicated from the first shard, parents first
+REFERENCE_MODELS = [Career, Subject, CareerSubject]
+
+
+class ShardRouter:
+    """Maps DNIs and IDs to the index of their shard."""
+
+    def __init__(self, shards: int) -> None:
+        """Router over `shards` databases."""
+        self.shards = shards
+
+    def shard_for_dni(self, dni: str) -> int:
+        """Shard of the student with this DNI. Stable across processes."""
+        return zlib.crc32(dni.encode("utf-8")) % self.shards
+
+    def shard_for_id(self, row_id: int) -> int:
+        """Shard of a row of a sharded table, from its interleaved ID."""
+        return (row_id - 1) % self.shards
+
+    def group_ids(self, row_ids: Iterable[int]) -> Dict[int, List[int]]:
+        """Split IDs by shard, keeping their order."""
+        groups: Dict[int, List[int]] = dict()
+        for row_id in row_ids:
+            groups.setdefault(self.shard_for_id(row_id), list()).append(row_id)
+        return groups
+
+    def group_by_dni(self, rows: Iterable[Dict[str, Any]]) -> Dict[int, List[Dict[str, Any]]]:
+        """Split rows with a `dni` key by shard, keeping their order."""
+        groups: Dict[int, List[Dict[str, Any]]] = dict()
+        for row in rows:
+            groups.setdefault(self.shard_for_dni(row["dni"]), list()).append(row)
+        return groups
+
+
+async def run_on_shard(shard: int, function: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+    """Await `function` with its statements sent to `shard`."""
+    token = current_shard.set(shard)
+    try:
+        return await function(*args, **kwargs)
+    finally:
+        current_shard.reset(token)
+
+
+async def scatter(calls: Dict[int, Tuple[Callable[..., Awaitable[T]], tuple, dict]]) -> Dict[int, T]:
+    """
+    Run one call per shard in parallel.
+
+    Args:
+        calls: `(function, args, kwargs)` by shard index.
+
+    Returns:
+        The result of every call, by shard index.
+    """
+    shards = list(calls)
+    results = await asyncio.gather(*(
+        run_on_shard(shard, function, *args, **kwargs)
+        for shard, (function, args, kwargs) in calls.items()))
+    return dict(zip(shards, results))
+
+
+def routed(argument: str, by: str = BY_ID) -> Callable:
+    """
+    Route a DbHandler method to the shard of one of its arguments.
+
+    Args:
+        argument (str): Name of the argument with the DNI or the ID.
+        by (str): `BY_DNI` or `BY_ID`.
+
+    Without a router (a single database) the method runs as is.
+    """
+    def decorator(method: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs) -> T:
+            router = self._router
+            if router is None:
+                return await method(self, *args, **kwargs)
+            value = signature.bind(self, *args, **kwargs).arguments[argument]
+            shard = router.shard_for_dni(value) if by == BY_DNI else router.shard_for_id(value)
+            return await run_on_shard(shard, method, self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+#==============================================================================
+# Shard administration
+def aligned_start(max_id: int, shard: int, shards: int) -> int:
+    """First ID after `max_id` that belongs to `shard`."""
+    start = max_id + 1
+    return start + (shard - (start - 1)) % shards
+
+
+def interleaved_id(column: Any, shard: int, shards: int, offset: int = 0) -> Any:
+    """
+    SQL expression of the next ID of `shard` in `column`, for the shards without sequences.
+
+    It's `aligned_start` of the largest ID, computed by the INSERT itself, so
+    under its write lock. The rows of a multi-row INSERT pass their `offset`.
+    """
+    max_id = select(func.coalesce(func.max(column), 0)).scalar_subquery()
+    # Non-negative modulo: SQLite keeps the sign of the dividend
+    return max_id + 1 + ((shard - max_id) % shards + shards) % shards + offset * shards
+
+
+async def configure_sequences(engine: "AsyncEngine", shard: int, shards: int) -> None:
+    """
+    Interleave the sequences of the sharded tables of one shard (Postgres only).
+
+    The next value is the first ID after the existing rows that belongs to the shard.
+    """
+    async with engine.begin() as connection:
+        for sequence, table, column in SHARDED_SEQUENCES:
+            max_id = (await connection.execute(
+                text(f"SELECT coalesce(max({column}), 0) FROM {table}"))).scalar()
+            await connection.execute(text(f"ALTER SEQUENCE {sequence} INCREMENT BY {shards}"))
+            await connection.execute(text("SELECT setval(:sequence, :start, false)"),
+                                     {"sequence": sequence,
+                                      "start": aligned_start(max_id, shard, shards)})
+
+
+async def misplaced_students(engine: "AsyncEngine", shard: int, router: ShardRouter) -> int:
+    """Number of students of a shard whose DNI or ID belongs to another shard."""
+    async with engine.connect() as connection:
+        result = await connection.execute(select(Student.student_id, Student.dni))
+        return sum(1 for student_id, dni in result
+                   if router.shard_for_dni(dni) != shard or router.shard_for_id(student_id) != shard)
+
+
+async def copy_reference_tables(source: "AsyncEngine", target: "AsyncEngine") -> int:
+    """
+    Upsert the careers, subjects and career_subject rows of `source` into `target`, by ID.
+
+    Returns:
+        int: The number of rows copied.
+    """
+    copied = 0
+    async with source.connect() as source_connection, target.begin() as target_connection:
+        upsert = dialect_insert(target.dialect.name)
+        for model in REFERENCE_MODELS:
+            columns = [column.name for column in model.__table__.columns]
+            rows = [dict(row._mapping) for row in
+                    await source_connection.execute(select(model.__table__))]
+            if not rows:
+                continue
+            statement = upsert(model.__table__).values(rows)
+            await target_connection.execute(statement.on_conflict_do_update(
+                index_elements=[model.__table__.c.id],
+                set_={name: statement.excluded[name] for name in columns if name != "id"}))
+            copied += len(rows)
+    return copied
+
+
+async def reference_counts(engine: "AsyncEngine") -> Dict[str, int]:
+    """Rows of every reference table, to compare the shards."""
+    async with engine.connect() as connection:
+        return {model.__tablename__: (await connection.execute(
+                    select(func.count()).select_from(model.__table__))).scalar()
+                for model in REFERENCE_MODELS}
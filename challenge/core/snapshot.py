@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+"""Columnar snapshot module.
+
+A snapshot is a directory with a file per column of the lead records, and a
+`manifest.json` with the number of rows, the last exported record ID of every
+shard and the dictionaries of the categorical columns:
+
+    id.bin, class_duration.bin, ...      fixed width little-endian integers
+    career.bin, subject.bin              int32 codes into the dictionaries
+    name.bin + name.offsets.bin, ...     utf-8 bytes, and the int64 offset
+                                         where each value ends, after a leading 0
+
+Records are appended in chunks, ordered by ID within each shard: IDs are
+only ordered within a shard, and a shard that lags behind may create records
+with lower IDs than the ones exported from the others. The manifest is replaced
+after every chunk, so it is the commit point: bytes written past its row
+count by an interrupted export are dropped by the next one.
+
+The column files are read with `mmap`, without loading them. With NumPy
+installed, `Snapshot.array` returns them as `numpy.memmap` arrays for
+vectorized scans. NumPy is optional: `pip install challenge[analytics]`.
+"""
+
+import json
+import mmap
+import os
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from challenge.core.sharding import ShardRouter
+
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+INT64 = "int64"
+INT32 = "int32"
+CATEGORY = "category"
+STRING = "string"
+# Columns of RetriveLeadRecord, in its order
+COLUMNS: Dict[str, str] = {
+    "id": INT64,
+    "dni": STRING,
+    "name": STRING,
+    "email": STRING,
+    "phone": STRING,
+    "address": STRING,
+    "subject": CATEGORY,
+    "class_duration": INT32,
+    "enroll_times": INT32,
+    "career": CATEGORY,
+    "year_enroll": INT32,
+}
+# array typecodes and NumPy dtypes of the stored values
+TYPECODES = {INT64: "q", INT32: "i", CATEGORY: "i"}
+DTYPES = {INT64: "<i8", INT32: "<i4", CATEGORY: "<i4"}
+ITEM_SIZES = {INT64: 8, INT32: 4, CATEGORY: 4}
+
+
+def _to_little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    manifest = path / MANIFEST
+    if not manifest.exists():
+        return None
+    return json.loads(manifest.read_text())
+
+
+class SnapshotWriter:
+    """Appends chunks of records to a snapshot directory."""
+
+    def __init__(self, path: Union[str, Path], truncate: bool = False, shards: int = 1) -> None:
+        """
+        Open a snapshot to append records, creating it if needed.
+
+        Args:
+            path (Union[str, Path]): Directory of the snapshot.
+            truncate (bool): Drop the existing rows and start again.
+            shards (int): Number of shards the records are exported from.
+
+        Raises:
+            ValueError: If the directory holds a snapshot of another format, or
+            exported from another number of shards.
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        manifest = None if truncate else _read_manifest(self.path)
+        if manifest is not None and manifest["format"] != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is a snapshot of format {manifest['format']}, "
+                             f"expected {FORMAT_VERSION}")
+        if manifest is not None and len(manifest["last_ids"]) != shards:
+            raise ValueError(f"{self.path} was exported from {len(manifest['last_ids'])} shards, "
+                             f"not {shards}. Export it again from scratch")
+        self._router = ShardRouter(shards)
+        self.manifest = manifest or {"format": FORMAT_VERSION, "rows": 0, "last_ids": [0] * shards,
+                                     "columns": dict(COLUMNS),
+                                     "dictionaries": {name: [] for name, kind in COLUMNS.items()
+                                                      if kind == CATEGORY}}
+        self._codes = {name: {value: code for code, value in enumerate(values)}
+                       for name, values in self.manifest["dictionaries"].items()}
+        self._drop_uncommitted()
+        self._write_manifest()
+
+    @property
+    def rows(self) -> int:
+        return self.manifest["rows"]
+
+    @property
+    def last_ids(self) -> List[int]:
+        """ID of the last record of every shard, 0 when empty. The next export starts after them."""
+        return list(self.manifest["last_ids"])
+
+    def _drop_uncommitted(self) -> None:
+        """Cut the column files to the rows of the manifest."""
+        rows = self.rows
+        for name, kind in COLUMNS.items():
+            values = self.path / f"{name}.bin"
+            if kind != STRING:
+                self._truncate(values, rows * ITEM_SIZES[kind])
+                continue
+            offsets = self.path / f"{name}.offsets.bin"
+            # A new file is extended with zeros, the start offset of the first value
+            self._truncate(offsets, (rows + 1) * 8)
+            with open(offsets, "rb") as file:
+                file.seek(rows * 8)
+                end = array("q", file.read(8))
+            if sys.byteorder == "big":
+                end.byteswap()
+            self._truncate(values, end[0])
+
+    @staticmethod
+    def _truncate(path: Path, size: int) -> None:
+        with open(path, "ab") as file:
+            file.truncate(size)
+
+    def append(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Append a chunk of records, and commit it to the manifest.
+
+        Args:
+            records (List[Dict[str, Any]]): Records with every column, ordered
+            by ID within each shard, after the last ID of their shard.
+
+        Returns:
+            int: Number of rows of the snapshot.
+
+        Raises:
+            ValueError: If the records are not ordered after the `last_ids`.
+        """
+        if not records:
+            return self.rows
+        last_ids = self.last_ids
+        for record in records:
+            shard = self._router.shard_for_id(record["id"])
+            if record["id"] <= last_ids[shard]:
+                raise ValueError(f"Records must be ordered by ID, after {last_ids[shard]} "
+                                 f"on shard {shard}")
+            last_ids[shard] = record["id"]
+        for name, kind in COLUMNS.items():
+            values = [record[name] for record in records]
+            if kind == STRING:
+                self._append_strings(name, values)
+                continue
+            if kind == CATEGORY:
+                values = [self._code(name, value) for value in values]
+            with open(self.path / f"{name}.bin", "ab") as file:
+                file.write(_to_little_endian(array(TYPECODES[kind], values)))
+        self.manifest["rows"] += len(records)
+        self.manifest["last_ids"] = last_ids
+        self._write_manifest()
+        return self.rows
+
+    def _code(self, name: str, value: str) -> int:
+        codes = self._codes[name]
+        if value not in codes:
+            codes[value] = len(codes)
+            self.manifest["dictionaries"][name].append(value)
+        return codes[value]
+
+    def _append_strings(self, name: str, values: List[Optional[str]]) -> None:
+        """Write the values, and their end offsets. Missing values are stored empty."""
+        offsets_path = self.path / f"{name}.offsets.bin"
+        end = (self.path / f"{name}.bin").stat().st_size
+        encoded = [(value or "").encode() for value in values]
+        offsets = array("q")
+        for value in encoded:
+            end += len(value)
+            offsets.append(end)
+        with open(self.path / f"{name}.bin", "ab") as file:
+            file.write(b"".join(encoded))
+        with open(offsets_path, "ab") as file:
+            file.write(_to_little_endian(offsets))
+
+    def _write_manifest(self) -> None:
+        temporary = self.path / f"{MANIFEST}.tmp"
+        temporary.write_text(json.dumps(self.manifest, indent=2))
+        os.replace(temporary, self.path / MANIFEST)
+
+
+class Snapshot:
+    """Memory-mapped reader of a snapshot directory."""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        """
+        Open a snapshot. Only the rows of its manifest at this time are read.
+
+        Raises:
+            FileNotFoundError: If the directory has no snapshot.
+        """
+        self.path = Path(path)
+        manifest = _read_manifest(self.path)
+        if manifest is None:
+            raise FileNotFoundError(f"No snapshot in {self.path}")
+        self.manifest = manifest
+        self.rows: int = manifest["rows"]
+        self.last_ids: List[int] = manifest["last_ids"]
+        self.columns: Dict[str, str] = manifest["columns"]
+
+    def _map(self, file_name: str, size: int) -> memoryview:
+        """Read-only map of the first `size` bytes of a column file."""
+        if size == 0:
+            return memoryview(b"")
+        with open(self.path / file_name, "rb") as file:
+            return memoryview(mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ))
+
+    def column(self, name: str) -> memoryview:
+        """
+        Values of an integer or categorical column, mapped without copying.
+
+        Categorical columns are their codes, see `categories`.
+        """
+        kind = self.columns[name]
+        if kind == STRING:
+            raise ValueError(f"'{name}' is a string column, read it with `strings`")
+        values = self._map(f"{name}.bin", self.rows * ITEM_SIZES[kind])
+        if sys.byteorder == "big":
+            return memoryview(_swapped(values, TYPECODES[kind]))
+        return values.cast(TYPECODES[kind])
+
+    def array(self, name: str):
+        """
+        Values of an integer or categorical column as a read-only `numpy.memmap`.
+
+        Raises:
+            ImportError: If NumPy is not installed.
+        """
+        import numpy
+
+        kind = self.columns[name]
+        if kind == STRING:
+            raise ValueError(f"'{name}' is a string column, read it with `strings`")
+        if self.rows == 0:
+            return numpy.empty(0, dtype=DTYPES[kind])
+        return numpy.memmap(self.path / f"{name}.bin", dtype=DTYPES[kind], mode="r",
+                            shape=(self.rows,))
+
+    def categories(self, name: str) -> List[str]:
+        """Values of a categorical column, indexed by their code."""
+        return self.manifest["dictionaries"][name]
+
+    def strings(self, name: str) -> List[str]:
+        """Values of a string column, decoded."""
+        if self.columns[name] != STRING:
+            raise ValueError(f"'{name}' is not a string column")
+        offsets = self._map(f"{name}.offsets.bin", (self.rows + 1) * 8)
+        offsets = _swapped(offsets, "q") if sys.byteorder == "big" else offsets.cast("q")
+        data = self._map(f"{name}.bin", offsets[self.rows] if self.rows else 0)
+        return [bytes(data[start:end]).decode() for start, end in zip(offsets, offsets[1:])]
+
+
+def _swapped(values: memoryview, typecode: str) -> array:
+    swapped = array(typecode, values)
+    swapped.byteswap()
+    return swapped
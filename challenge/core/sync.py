@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Incremental sync module.
+
+A record changes when its subject enrollment, its student or its enrollment
+in the career is written, so the time it changed is the newest `date` of the
+three rows. `POST /leads/bulk` with `on_conflict=update` sets the `date` of
+the students it updates, so `date` is the time of the last write, not only
+of the creation.
+
+Mirrors page through the changes in (changed at, ID) order with a watermark:
+the changed at and ID of the last record they got. The records that changed
+since a watermark are found through the `date` index of each table, so a
+sync reads the changes, not the whole table.
+
+`date` is set when the writing transaction starts, not when it commits. The
+changes of the last `SYNC_SETTLE_SECONDS` are held back, so a transaction
+that commits after a mirror synced can't be behind its watermark.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import DateTime, and_, select, union
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement, ReturnTypeFromArgs
+
+from challenge.models.sql_models import (Student,
+                                         StudentCareer,
+                                         CareerSubject,
+                                         SubjectEnrollment)
+
+
+class greatest(ReturnTypeFromArgs):
+    """Greatest of its arguments, `greatest` in Postgres and `max` in SQLite."""
+    inherit_cache = True
+
+
+@compiles(greatest, "sqlite")
+def _sqlite_greatest(element, compiler, **kw) -> str:
+    return f"max({compiler.process(element.clauses, **kw)})"
+
+
+class settled_before(FunctionElement):
+    """Database time, `seconds` ago. The changes before it are committed."""
+    type = DateTime()
+    name = "settled_before"
+    inherit_cache = True
+
+
+@compiles(settled_before, "postgresql")
+def _postgresql_settled_before(element, compiler, **kw) -> str:
+    return f"LOCALTIMESTAMP - make_interval(secs => {compiler.process(element.clauses, **kw)})"
+
+
+@compiles(settled_before, "sqlite")
+def _sqlite_settled_before(element, compiler, **kw) -> str:
+    return f"datetime('now', (0 - {compiler.process(element.clauses, **kw)}) || ' seconds')"
+
+
+# Time a record changed, over the tables joined by the records query
+RECORD_CHANGED_AT = greatest(SubjectEnrollment.date, Student.date, StudentCareer.date)
+
+
+def changed_record_ids(since: datetime):
+    """
+    Select the IDs of the records whose rows were written at or after `since`.
+
+    Each part of the union starts from the `date` index of a table, and joins
+    to the enrollments of the changed student or student career.
+    """
+    return union(
+        select(SubjectEnrollment.id).where(SubjectEnrollment.date >= since),
+        select(SubjectEnrollment.id)
+        .join(Student, Student.student_id == SubjectEnrollment.student_id)
+        .where(Student.date >= since),
+        select(SubjectEnrollment.id)
+        .join(CareerSubject, CareerSubject.id == SubjectEnrollment.career_subject_id)
+        .join(StudentCareer, and_(StudentCareer.student_id == SubjectEnrollment.student_id,
+                                  StudentCareer.career_id == CareerSubject.career_id))
+        .where(StudentCareer.date >= since),
+    )
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Upsert module.
+
+`INSERT ... ON CONFLICT` is dialect specific in SQLAlchemy. Postgres and
+SQLite share the same API, other databases are not supported.
+"""
+
+from typing import Callable
+
+# Dialects with `INSERT ... ON CONFLICT`, the only databases the API can write to
+UPSERT_DIALECTS = ("postgresql", "sqlite")
+
+
+def dialect_insert(dialect_name: str) -> Callable:
+    """
+    Return the `insert` construct of the dialect, with `on_conflict_do_*` support.
+
+    Args:
+        dialect_name (str): Name of the database dialect, postgresql or sqlite.
+
+    Raises:
+        NotImplementedError: If the dialect has no upsert support.
+    """
+    if dialect_name not in UPSERT_DIALECTS:
+        raise NotImplementedError(f"Upsert not supported on {dialect_name}")
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
@@ -50,3 +50,17 @@ class CareerSubjectDoesNotExist(BaseError):
 class EnrollRecordDoesNotExist(BaseError):
     """Exception that occurs when the enroll record does not exist"""
     pass
+
+
+class RequestDeadlineExceeded(BaseError):
+    """Exception that occurs when the request runs out of time"""
+    pass
+
+
+class ApiRequestError(BaseError):
+    """Exception that occurs when the API answers a request of the client with an error"""
+
+    def __init__(self, message=DEFAULT_ERROR_MESSAGE, status_code=None):
+        """Construct message, with the HTTP status of the answer."""
+        super().__init__(message)
+        self.status_code = status_code
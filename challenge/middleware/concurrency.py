@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Concurrency limit middleware module."""
+
+import time
+from typing import Iterable
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette import status
+
+from challenge.constants import SERVICE_OVERLOADED
+from challenge.core.concurrency import (AdaptiveLimiter,
+                                        HIGH_PRIORITY,
+                                        NORMAL_PRIORITY)
+from challenge.core.deadline import remaining
+from challenge.middleware.routing import matched_endpoint
+
+
+def route_priority(scope: Scope) -> int:
+    """Priority set with the `priority` decorator on the matched endpoint, or
+    the default one for the HTTP method."""
+    default = HIGH_PRIORITY if scope["method"] in ("GET", "HEAD") else NORMAL_PRIORITY
+    return getattr(matched_endpoint(scope), "priority", default)
+
+
+class ConcurrencyLimitMiddleware:
+    """Caps the database-bound requests in flight and sheds the excess.
+
+    Requests wait for a slot of the `AdaptiveLimiter` up to `queue_timeout`
+    seconds, or less if the request deadline is closer. When they can't get one, they are answered right away with a
+    503 and a `Retry-After` header, instead of piling up in the connection
+    pool queue.
+    """
+
+    def __init__(self,
+                 app: ASGIApp,
+                 limiter: AdaptiveLimiter,
+                 queue_timeout: float,
+                 retry_after: int,
+                 exempt_paths: Iterable[str] = ()) -> None:
+        """Initializes the middleware with its limiter and the paths not limited."""
+        self.app = app
+        self.limiter = limiter
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.exempt_paths = set(exempt_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        queue_timeout = self.queue_timeout
+        time_left = remaining()
+        if time_left is not None:
+            queue_timeout = max(0.0, min(queue_timeout, time_left))
+        if not await self.limiter.acquire(route_priority(scope), queue_timeout):
+            response = JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                    content={"detail": SERVICE_OVERLOADED},
+                                    headers={"Retry-After": str(self.retry_after)})
+            await response(scope, receive, send)
+            return
+
+        started = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release(time.monotonic() - started)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Request deadline middleware module."""
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from challenge.core.deadline import deadline_scope
+from challenge.middleware.routing import matched_endpoint
+
+
+DEADLINE_HEADER = b"x-request-timeout"
+
+
+class DeadlineMiddleware:
+    """Sets the deadline of each request.
+
+    The timeout, in milliseconds, comes from the `request_timeout` decorator
+    of the endpoint, or else from the default, capped at `max_timeout_ms`.
+    The `X-Request-Timeout` header of the client can only shorten it, so no
+    client holds a connection for longer than its route allows.
+    """
+
+    def __init__(self, app: ASGIApp, default_timeout_ms: int, max_timeout_ms: int) -> None:
+        """Initializes the middleware with the default and maximum timeouts."""
+        self.app = app
+        self.default_timeout_ms = default_timeout_ms
+        self.max_timeout_ms = max_timeout_ms
+
+    def _timeout_ms(self, scope: Scope) -> int:
+        """Timeout configured for the route, or the shorter one requested by the client."""
+        endpoint = matched_endpoint(scope)
+        timeout = min(getattr(endpoint, "request_timeout", self.default_timeout_ms),
+                      self.max_timeout_ms)
+        for name, value in scope.get("headers", []):
+            if name == DEADLINE_HEADER:
+                try:
+                    requested = int(value)
+                except ValueError:
+                    break
+                if requested > 0:
+                    return min(requested, timeout)
+                break
+        return timeout
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with deadline_scope(self._timeout_ms(scope) / 1000):
+            await self.app(scope, receive, send)
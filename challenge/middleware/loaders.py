@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Request loaders middleware module."""
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from challenge.core.db_handler import DbHandler
+from challenge.core.loaders import loader_scope
+
+
+class RequestLoaderMiddleware:
+    """Gives each request its own loaders, see `challenge/core/loaders.py`.
+
+    The DbHandler lookups by ID made while the request runs are batched and
+    memoized, without changes to the routers.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with loader_scope(DbHandler()):
+            await self.app(scope, receive, send)
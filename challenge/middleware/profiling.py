@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Request profiling middleware module."""
+
+import asyncio
+import cProfile
+import hmac
+import logging
+import random
+import time
+from typing import Iterable
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from challenge.constants import TITLE
+from challenge.core.profiling import ProfileStore
+from challenge.middleware.routing import route_path
+
+
+logger = logging.getLogger(TITLE)
+
+PROFILE_ID_HEADER = b"x-profile-id"
+
+
+class ProfilingMiddleware:
+    """Profiles single requests with cProfile, on demand.
+
+    A request is profiled when its `header` holds the profiling `token`, or
+    with a probability of `sample_rate`. Its profile is saved to the `store`,
+    and its ID is returned in the `X-Profile-Id` header.
+
+    The profiler sees every coroutine that runs on the event loop while the
+    request is in flight, so the profile is only clean when the request runs
+    alone. Only one request is profiled at a time. The profile is written
+    from a thread, off the event loop. Without the middleware, when
+    `PROFILING_ENABLED` is off, nothing is added to the requests.
+    """
+
+    def __init__(self,
+                 app: ASGIApp,
+                 store: ProfileStore,
+                 token: str,
+                 header: str,
+                 sample_rate: float,
+                 exempt_prefixes: Iterable[str] = ()) -> None:
+        """Initializes the middleware with its store and triggers."""
+        self.app = app
+        self.store = store
+        self.token = token.encode()
+        self.header = header.lower().encode()
+        self.sample_rate = sample_rate
+        self.exempt_prefixes = tuple(exempt_prefixes)
+        self._profiling = False
+
+    def _requested(self, scope: Scope) -> bool:
+        """Whether the request asks to be profiled, with the token."""
+        if not self.token:
+            return False
+        for name, value in scope.get("headers", []):
+            if name == self.header:
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (scope["type"] != "http" or self._profiling
+                or scope["path"].startswith(self.exempt_prefixes)
+                or not (self._requested(scope) or random.random() < self.sample_rate)):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = self.store.new_id()
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        self._profiling = True
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.disable()
+            latency = time.perf_counter() - started
+            self._profiling = False
+            try:
+                await asyncio.to_thread(self.store.save, profile, profile_id, scope["method"],
+                                        route_path(scope), latency)
+            except OSError as exc:
+                logger.warning(f"Profile {profile_id} could not be saved ({exc}).")
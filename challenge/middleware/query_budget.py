@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Query budget middleware module."""
+
+import logging
+from typing import Dict
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from challenge.constants import TITLE, N_PLUS_ONE_THRESHOLD
+from challenge.core.query_counter import count_queries
+from challenge.middleware.routing import route_path
+
+
+logger = logging.getLogger(TITLE)
+
+def route_key(scope: Scope) -> str:
+    """Build the "METHOD /path/template" key used to identify a route."""
+    return f"{scope['method']} {route_path(scope)}"
+
+
+class QueryBudgetMiddleware:
+    """Counts the statements each request runs and flags budget violations.
+
+    Every request gets its own counter. When the response starts, the number of
+    statements is reported in the `X-Query-Count` header. Once the request is
+    done, a warning is logged if the route exceeded its budget or repeated the
+    same statement with different parameters (N+1).
+    """
+
+    def __init__(self, app: ASGIApp, budgets: Dict[str, int]) -> None:
+        """Initializes the middleware with the budget of each route."""
+        self.app = app
+        self.budgets = budgets
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as counter:
+            async def send_with_count(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-query-count", str(counter.count).encode()))
+                    message["headers"] = headers
+                await send(message)
+
+            await self.app(scope, receive, send_with_count)
+
+        key = route_key(scope)
+        budget = self.budgets.get(key)
+        if budget is not None and counter.count > budget:
+            logger.warning(
+                f"Query budget exceeded on '{key}': "
+                f"{counter.count} statements, budget {budget}")
+        for statement, times in counter.repeated_statements(N_PLUS_ONE_THRESHOLD).items():
+            logger.warning(
+                f"Possible N+1 on '{key}': statement executed {times} times "
+                f"with different parameters: {statement}")
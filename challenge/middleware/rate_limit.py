@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Rate limit middleware module."""
+
+import hashlib
+import math
+from typing import Dict, Iterable, List, Tuple
+
+from starlette import status
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from challenge.constants import RATE_LIMITED
+from challenge.core.rate_limit import (BucketStore,
+                                       Decision,
+                                       RateLimit,
+                                       READ_ROUTES,
+                                       WRITE_ROUTES)
+from challenge.middleware.routing import matched_endpoint
+
+
+def route_class(scope: Scope) -> str:
+    """Class set with the `rate_limit_class` decorator on the matched endpoint, or
+    the default one for the HTTP method."""
+    default = READ_ROUTES if scope["method"] in ("GET", "HEAD") else WRITE_ROUTES
+    return getattr(matched_endpoint(scope), "rate_limit_class", default)
+
+
+def hash_key(api_key: bytes) -> str:
+    """Digest of an API key, so the keys aren't kept in the store."""
+    return hashlib.sha256(api_key).hexdigest()[:32]
+
+
+def rate_limit_headers(limit: RateLimit, decision: Decision) -> List[Tuple[bytes, bytes]]:
+    """`RateLimit-*` headers of a decision: bucket size, tokens left and seconds to refill it."""
+    return [(b"ratelimit-limit", str(limit.burst).encode()),
+            (b"ratelimit-remaining", str(decision.remaining).encode()),
+            (b"ratelimit-reset", str(math.ceil(decision.reset)).encode())]
+
+
+class RateLimitMiddleware:
+    """Limits the requests of each client with a token bucket per route class.
+
+    The client is the value of the `key_header`, when it's one of the known
+    `api_keys`, or else the IP address: the header isn't authenticated, so
+    unknown keys would let a client get a new bucket with every request.
+    Requests over the limit are answered right away with a 429 and a
+    `Retry-After` header. Every limited response has the `RateLimit-Limit`,
+    `RateLimit-Remaining` and `RateLimit-Reset` headers. Route classes
+    without limits, and the exempt paths, are not limited.
+    """
+
+    def __init__(self,
+                 app: ASGIApp,
+                 store: BucketStore,
+                 limits: Dict[str, RateLimit],
+                 key_header: str,
+                 api_keys: Iterable[str] = (),
+                 exempt_paths: Iterable[str] = ()) -> None:
+        """Initializes the middleware with its store, the limits of each class, the known keys and the paths not limited."""
+        self.app = app
+        self.store = store
+        self.limits = limits
+        self.key_header = key_header.lower().encode()
+        self.api_keys = {hash_key(api_key.encode()) for api_key in api_keys}
+        self.exempt_paths = set(exempt_paths)
+
+    def client_key(self, scope: Scope) -> str:
+        """Key of the client: its hashed API key when it's a known one, or else its IP address."""
+        for name, value in scope.get("headers", []):
+            if name == self.key_header and value:
+                api_key = hash_key(value)
+                if api_key in self.api_keys:
+                    return f"key:{api_key}"
+                break
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope)
+        limit = self.limits.get(name)
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        decision = await self.store.take_async(f"{self.client_key(scope)}|{name}", limit)
+        headers = rate_limit_headers(limit, decision)
+        if not decision.allowed:
+            response = JSONResponse(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                    content={"detail": RATE_LIMITED},
+                                    headers={"Retry-After": str(math.ceil(decision.retry_after))})
+            response.raw_headers.extend(headers)
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
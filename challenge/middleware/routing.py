@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""Route lookup for middlewares, which run before the router."""
+
+from typing import Callable, Optional
+
+from starlette.routing import Match
+from starlette.types import Scope
+
+
+def matched_endpoint(scope: Scope) -> Optional[Callable]:
+    """Returns the endpoint the router will dispatch the request to, if any."""
+    app = scope.get("app")
+    if app is None:
+        return None
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "endpoint", None)
+    return None
+
+
+def route_path(scope: Scope) -> str:
+    """Path template of the route that served the request, or its path when none matched."""
+    route = scope.get("route")
+    return route.path if route is not None else scope["path"]
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 """API Models module."""
 
-from pydantic import BaseModel, ConfigDict
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Dict, List, Literal, Optional, Union
+
+from challenge.constants import MAX_BULK_LEADS, BULK_SKIP, BULK_UPDATE, BULK_REPORT
 
 
 class CreateLeadModel(BaseModel):
@@ -40,6 +44,18 @@ class ResponseLeadId(BaseModel):
     student_id: int
     model_config = ConfigDict(from_attributes=True)
 
+class BulkLeadsModel(BaseModel):
+    """Students to create in bulk, and what to do with the DNIs that exist"""
+    leads: List[CreateLeadModel] = Field(min_length=1, max_length=MAX_BULK_LEADS)
+    on_conflict: Literal[BULK_SKIP, BULK_UPDATE, BULK_REPORT] = BULK_SKIP
+
+class ResponseBulkLeads(BaseModel):
+    """Students' Ids by DNI, and outcome of the bulk creation"""
+    student_ids: Dict[str, int]
+    created: int
+    updated: int
+    conflicts: List[str]
+
 class ResponseStudentCareer(BaseModel):
     """Created Student's Id"""
     id: int
@@ -77,3 +93,98 @@ class RetriveLeadRecord(AddLeadRecord):
     id: int
     class_duration: int
     model_config = ConfigDict(from_attributes=True)
+
+# Models for batch lookups
+class BatchLeadsModel(BaseModel):
+    """Leads found by a batch lookup, and the IDs not found"""
+    leads: List[ResponseLead]
+    missing: List[int]
+
+class BatchRecordsModel(BaseModel):
+    """Records found by a batch lookup, and the IDs not found"""
+    records: List[RetriveLeadRecord]
+    missing: List[int]
+
+# Models for the incremental sync
+class ChangedLeadRecord(RetriveLeadRecord):
+    """Lead record, and the time it was created or last changed"""
+    changed_at: datetime
+
+class SyncWatermarkModel(BaseModel):
+    """Change time and ID of the last record synced"""
+    updated_since: datetime
+    after_id: int
+
+class SyncRecordsModel(BaseModel):
+    """Records changed after a watermark, and the watermark to continue from"""
+    records: List[ChangedLeadRecord]
+    next: SyncWatermarkModel
+    has_more: bool
+
+# Models for health and readiness
+class PoolStatusModel(BaseModel):
+    """Connection pool usage"""
+
+    size: int
+    max_overflow: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    saturation: float
+
+class ConcurrencyStatusModel(BaseModel):
+    """Concurrency limiter state"""
+
+    limit: int
+    in_flight: int
+    queued: int
+
+class LoopLagModel(BaseModel):
+    """Event loop lag of the latest samples"""
+
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+    samples: int
+    stalls: int
+
+class HealthModel(BaseModel):
+    """Model for health path"""
+
+    status: str
+    ready: bool
+    pool: PoolStatusModel
+    concurrency: Optional[ConcurrencyStatusModel] = None
+    loop: Optional[LoopLagModel] = None
+
+class ReadyModel(BaseModel):
+    """Model for ready path"""
+
+    ready: bool
+
+# Models for the admin router
+class ProfileModel(BaseModel):
+    """A stored request profile"""
+
+    id: str
+    method: str
+    route: str
+    latency_ms: int
+    created: datetime
+    size: int
+
+# Models for enrollment stats
+class StatEntryModel(BaseModel):
+    """Enrollments of a career, subject, year or enroll times"""
+
+    key: Union[str, int]
+    enrollments: int
+
+class StatsModel(BaseModel):
+    """Model for stats path"""
+
+    careers: List[StatEntryModel]
+    subjects: List[StatEntryModel]
+    years: List[StatEntryModel]
+    enroll_times: List[StatEntryModel]
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """SQL Models module."""
 
-from sqlalchemy import Column, String, Integer, ForeignKey, TIMESTAMP
+from sqlalchemy import Column, String, Integer, ForeignKey, TIMESTAMP, Index
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
 
@@ -23,6 +23,18 @@ class Student(Base):
     careers = relationship('StudentCareer', back_populates='student', cascade='all, delete-orphan')
     enrollments = relationship('SubjectEnrollment', back_populates='student', cascade='all, delete-orphan')
 
+    __table_args__ = (
+        # Exact lookups by DNI, and ON CONFLICT (dni) target of the bulk creation
+        Index('ix_students_dni', 'dni', unique=True),
+        # Prefix (ILIKE) and fuzzy (%) searches, with the pg_trgm extension
+        Index('ix_students_name_trgm', 'name',
+              postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        Index('ix_students_email_trgm', 'email',
+              postgresql_using='gin', postgresql_ops={'email': 'gin_trgm_ops'}),
+        # Students written since the watermark of an incremental sync
+        Index('ix_students_date', 'date'),
+    )
+
 # Model for Careers
 class Career(Base):
     __tablename__ = 'careers'
@@ -49,21 +61,30 @@ class StudentCareer(Base):
     __tablename__ = 'student_career'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    student_id = Column(Integer, ForeignKey('students.student_id', ondelete='CASCADE'), primary_key=True)
-    career_id = Column(Integer, ForeignKey('careers.id', ondelete='CASCADE'), primary_key=True)
+    student_id = Column(Integer, ForeignKey('students.student_id', ondelete='CASCADE'), nullable=False)
+    career_id = Column(Integer, ForeignKey('careers.id', ondelete='CASCADE'), nullable=False)
     year_enroll =  Column(Integer, nullable=True)
     date = Column(TIMESTAMP, server_default=func.now())
 
     student = relationship('Student', back_populates='careers')
     career = relationship('Career', back_populates='students')
 
+    __table_args__ = (
+        # Join from the enrollments and lookups of a student in a career
+        Index('ix_student_career_student_career', 'student_id', 'career_id'),
+        # Records filtered by career and year
+        Index('ix_student_career_career_year', 'career_id', 'year_enroll'),
+        # Enrollments in a career written since the watermark of an incremental sync
+        Index('ix_student_career_date', 'date'),
+    )
+
 # Model for Careers and Subjects
 class CareerSubject(Base):
     __tablename__ = 'career_subject'
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    career_id = Column(Integer, ForeignKey('careers.id', ondelete='CASCADE'), primary_key=True)
-    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete='CASCADE'), primary_key=True)
+    career_id = Column(Integer, ForeignKey('careers.id', ondelete='CASCADE'), nullable=False)
+    subject_id = Column(Integer, ForeignKey('subjects.id', ondelete='CASCADE'), nullable=False)
 
     career = relationship('Career', back_populates='subjects')
     subject = relationship('Subject', back_populates='careers')
@@ -81,3 +102,29 @@ class SubjectEnrollment(Base):
 
     career_subject = relationship('CareerSubject', back_populates='enrollments')
     student = relationship('Student', back_populates='enrollments')
+
+    __table_args__ = (
+        # Records filtered by career-subject and enroll times, in ID order
+        Index('ix_subject_enrollments_career_subject', 'career_subject_id', 'enroll_times', 'id'),
+        # Enrollments of a student
+        Index('ix_subject_enrollments_student', 'student_id', 'career_subject_id', 'enroll_times'),
+        # Records filtered by date range
+        Index('ix_subject_enrollments_date', 'date', 'id'),
+    )
+
+# Model for the enrollment counters served by /stats
+class EnrollmentStat(Base):
+    __tablename__ = 'enrollment_stats'
+
+    metric = Column(String(20), primary_key=True)
+    key = Column(Integer, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+# Model for the changes to the enrollment counters, not folded into them yet
+class EnrollmentStatDelta(Base):
+    __tablename__ = 'enrollment_stat_deltas'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    metric = Column(String(20), nullable=False)
+    key = Column(Integer, nullable=False)
+    delta = Column(Integer, nullable=False)
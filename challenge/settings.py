@@ -19,3 +19,84 @@ POSTGRES_PASSWORD = os.environ.get("POSTGRES_PASSWORD", "postgres")
 POSTGRES_DB       = os.environ.get("POSTGRES_DB", "challenge_db")
 POSTGRES_HOST     = os.environ.get("POSTGRES_HOST", "localhost")
 POSTGRES_ECHO     = os.environ.get("ECHO", "false").lower() in ('true', '1', 't')
+
+# A Postgres or SQLite async URL, instead of the POSTGRES_* settings. With
+# sqlite+aiosqlite:// the database is in memory, created and seeded at startup
+DATABASE_URL = os.environ.get("DATABASE_URL", "")
+
+# Shards: comma-separated database URLs. With more than one, the student-owned
+# rows are sharded by DNI across them and the POSTGRES_* settings are not used
+SHARD_DATABASE_URLS = [url.strip() for url in os.environ.get("SHARD_DATABASE_URLS", "").split(",") if url.strip()]
+
+# Connection pool and warm-up
+POOL_SIZE               = int(os.environ.get("POOL_SIZE", 10))
+POOL_MAX_OVERFLOW       = int(os.environ.get("POOL_MAX_OVERFLOW", 10))
+POOL_WARMUP_CONNECTIONS = int(os.environ.get("POOL_WARMUP_CONNECTIONS", 5))
+WARMUP_RETRY_SECONDS    = float(os.environ.get("WARMUP_RETRY_SECONDS", 2))
+
+# Yearly partitions of subject_enrollments (once migrated to a partitioned table)
+PARTITION_MAINTENANCE_ENABLED = os.environ.get("PARTITION_MAINTENANCE_ENABLED", "false").lower() in ('true', '1', 't')
+PARTITIONS_AHEAD              = int(os.environ.get("PARTITIONS_AHEAD", 2))
+PARTITION_RETENTION_YEARS     = int(os.environ.get("PARTITION_RETENTION_YEARS", 5))
+
+# Enrollment stats: seconds between the folds of the deltas into the counters
+STATS_FOLD_SECONDS = float(os.environ.get("STATS_FOLD_SECONDS", 5))
+
+# ==================================================================================
+# Concurrency limiter and load shedding
+CONCURRENCY_LIMIT_ENABLED = os.environ.get("CONCURRENCY_LIMIT_ENABLED", "true").lower() in ('true', '1', 't')
+CONCURRENCY_INITIAL_LIMIT = int(os.environ.get("CONCURRENCY_INITIAL_LIMIT", 20))
+CONCURRENCY_MIN_LIMIT     = int(os.environ.get("CONCURRENCY_MIN_LIMIT", 2))
+CONCURRENCY_MAX_LIMIT     = int(os.environ.get("CONCURRENCY_MAX_LIMIT", 100))
+CONCURRENCY_TARGET_MS     = float(os.environ.get("CONCURRENCY_TARGET_MS", 250))
+CONCURRENCY_MAX_QUEUE     = int(os.environ.get("CONCURRENCY_MAX_QUEUE", 200))
+CONCURRENCY_QUEUE_TIMEOUT = float(os.environ.get("CONCURRENCY_QUEUE_TIMEOUT", 2))
+CONCURRENCY_RETRY_AFTER   = int(os.environ.get("CONCURRENCY_RETRY_AFTER", 1))
+
+# ==================================================================================
+# Change feed of GET /records/stream: memory (a single process) or postgres (LISTEN/NOTIFY)
+CHANGE_FEED_BACKEND           = os.environ.get("CHANGE_FEED_BACKEND", "memory").lower()
+CHANGE_FEED_BUFFER            = int(os.environ.get("CHANGE_FEED_BUFFER", 1000))
+CHANGE_FEED_HEARTBEAT_SECONDS = float(os.environ.get("CHANGE_FEED_HEARTBEAT_SECONDS", 15))
+
+# Incremental sync of GET /records?updated_since=: the newest changes are held back
+# this long, until the transactions that wrote them have committed
+SYNC_SETTLE_SECONDS = float(os.environ.get("SYNC_SETTLE_SECONDS", 5))
+
+# ==================================================================================
+# Rate limits per client (API key header, or else IP) and route class,
+# as `class=rate:burst` items: tokens per second and bucket size
+RATE_LIMIT_ENABLED     = os.environ.get("RATE_LIMIT_ENABLED", "false").lower() in ('true', '1', 't')
+RATE_LIMITS            = os.environ.get("RATE_LIMITS", "read=50:100,write=10:20,import=1:5")
+RATE_LIMIT_KEY_HEADER  = os.environ.get("RATE_LIMIT_KEY_HEADER", "X-API-Key")
+RATE_LIMIT_API_KEYS    = [key.strip() for key in os.environ.get("RATE_LIMIT_API_KEYS", "").split(",") if key.strip()]
+RATE_LIMIT_BACKEND     = os.environ.get("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", 10000))
+RATE_LIMIT_SQLITE_PATH = os.environ.get("RATE_LIMIT_SQLITE_PATH", "/tmp/challenge_rate_limits.db")
+
+# ==================================================================================
+# Request deadlines, in milliseconds
+REQUEST_TIMEOUT_MS     = int(os.environ.get("REQUEST_TIMEOUT_MS", 30000))
+REQUEST_TIMEOUT_MAX_MS = int(os.environ.get("REQUEST_TIMEOUT_MAX_MS", 120000))
+
+# ==================================================================================
+# Batched and memoized lookups by ID, per request
+REQUEST_LOADERS_ENABLED = os.environ.get("REQUEST_LOADERS_ENABLED", "true").lower() in ('true', '1', 't')
+
+# ==================================================================================
+# Instrumentation configurations
+QUERY_BUDGET_ENABLED = os.environ.get("QUERY_BUDGET_ENABLED", "false").lower() in ('true', '1', 't')
+
+# Event loop lag: sampled every interval, stacks logged from the stall threshold
+LOOP_MONITOR_ENABLED     = os.environ.get("LOOP_MONITOR_ENABLED", "true").lower() in ('true', '1', 't')
+LOOP_MONITOR_INTERVAL_MS = float(os.environ.get("LOOP_MONITOR_INTERVAL_MS", 100))
+LOOP_STALL_THRESHOLD_MS  = float(os.environ.get("LOOP_STALL_THRESHOLD_MS", 250))
+LOOP_LAG_REPORT_SECONDS  = float(os.environ.get("LOOP_LAG_REPORT_SECONDS", 60))
+
+# Profiles of single requests: the ones with the token in the header, and a sample
+PROFILING_ENABLED     = os.environ.get("PROFILING_ENABLED", "false").lower() in ('true', '1', 't')
+PROFILING_TOKEN       = os.environ.get("PROFILING_TOKEN", "")
+PROFILING_HEADER      = os.environ.get("PROFILING_HEADER", "X-Profile")
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+PROFILING_DIR         = os.environ.get("PROFILING_DIR", "/tmp/challenge_profiles")
+PROFILING_MAX_FILES   = int(os.environ.get("PROFILING_MAX_FILES", 50))
@@ -6,10 +6,15 @@ from fastapi.responses import JSONResponse
 from starlette import status
 from typing import Union
 from pydantic import ValidationError
+from sqlalchemy.exc import DBAPIError
 
-from challenge.exceptions import BaseError
+from challenge.exceptions import BaseError, RequestDeadlineExceeded
 from challenge.core.log_manager import LogManager
-from challenge.constants import DATA_INVALID, CONNECTIO_ISSUE
+from challenge.constants import DATA_INVALID, CONNECTIO_ISSUE, DEADLINE_EXCEEDED
+
+
+# SQLSTATE raised by Postgres when a statement is canceled by statement_timeout
+QUERY_CANCELED_SQLSTATE = "57014"
 
 
 def make_response_based_in_exception(
@@ -79,3 +84,18 @@ def connection_refused_error(request: Request, exc:ConnectionRefusedError):
     return JSONResponse(
         status_code=status.HTTP_428_PRECONDITION_REQUIRED,
         content=CONNECTIO_ISSUE)
+
+def deadline_exceeded_error(request: Request,
+                            exc: Union[RequestDeadlineExceeded, DBAPIError]):
+    """Use RequestDeadlineExceeded raiser to report requests out of time"""
+    request.app.logger.warning(
+        f"Deadline exceeded on {request.method} {request.url.path}")
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": DEADLINE_EXCEEDED})
+
+def database_error_handler(request: Request, exc: DBAPIError):
+    """Use DBAPIError raiser to report statement timeouts, other errors are unexpected"""
+    if getattr(exc.orig, "sqlstate", None) == QUERY_CANCELED_SQLSTATE:
+        return deadline_exceeded_error(request, exc)
+    return unexpected_error_handler(request, exc)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Parsing of query parameters that FastAPI can't validate by itself."""
+
+from datetime import datetime, timezone
+from fastapi.exceptions import RequestValidationError
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from challenge.constants import MAX_BATCH_IDS
+
+
+def parse_ids(values: List[str], max_ids: int = MAX_BATCH_IDS) -> List[int]:
+    """
+    Parse the `ids` query parameter of a batch lookup.
+
+    IDs can be repeated (`?ids=1&ids=2`), comma separated (`?ids=1,2`) or both.
+    Duplicates are dropped, keeping the order of the first occurrence.
+
+    Args:
+        values (List[str]): Every value of the `ids` parameter.
+        max_ids (int): Maximum number of distinct IDs.
+
+    Raises:
+        RequestValidationError: If an ID is not a positive integer, or there
+        are none or more than `max_ids`. Answered as any invalid request.
+
+    Returns:
+        List[int]: The distinct IDs.
+    """
+    ids = dict()
+    for value in values:
+        for item in value.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            try:
+                record_id = int(item)
+            except ValueError:
+                record_id = 0
+            if record_id <= 0:
+                raise RequestValidationError([{"type": "value_error",
+                                               "loc": ("query", "ids"),
+                                               "msg": f"Invalid ID: {item}",
+                                               "input": item}])
+            ids[record_id] = None
+    if not ids or len(ids) > max_ids:
+        raise RequestValidationError([{"type": "value_error",
+                                       "loc": ("query", "ids"),
+                                       "msg": f"Between 1 and {max_ids} IDs are required",
+                                       "input": values}])
+    return list(ids)
+
+
+def parse_fields(values: List[str], allowed: Iterable[str]) -> List[str]:
+    """
+    Parse the `fields` query parameter of a sparse fieldset.
+
+    Fields can be repeated (`?fields=id&fields=name`), comma separated
+    (`?fields=id,name`) or both. Duplicates are dropped, keeping the order
+    of the first occurrence, which is the order of the response.
+
+    Args:
+        values (List[str]): Every value of the `fields` parameter.
+        allowed (Iterable[str]): Field names of the response model.
+
+    Raises:
+        RequestValidationError: If a field is not in `allowed`, or there are
+        none. Answered as any invalid request.
+
+    Returns:
+        List[str]: The distinct fields.
+    """
+    allowed = list(allowed)
+    fields = dict()
+    for value in values:
+        for item in value.split(","):
+            item = item.strip()
+            if not item:
+                continue
+            if item not in allowed:
+                raise RequestValidationError([{"type": "value_error",
+                                               "loc": ("query", "fields"),
+                                               "msg": f"Unknown field: {item}. "
+                                                      f"Valid fields: {', '.join(allowed)}",
+                                               "input": item}])
+            fields[item] = None
+    if not fields:
+        raise RequestValidationError([{"type": "value_error",
+                                       "loc": ("query", "fields"),
+                                       "msg": "At least one field is required",
+                                       "input": values}])
+    return list(fields)
+
+
+def parse_cursor(value: str, shards: int, location: Tuple[str, str]) -> List[int]:
+    """
+    Parse a record stream cursor, the last record ID of every shard.
+
+    The cursor is the ID of the events of `GET /records/stream`, with one
+    comma separated ID per shard. A single ID is a position on every shard.
+
+    Args:
+        value (str): The cursor.
+        shards (int): Number of shards.
+        location (Tuple[str, str]): Where the cursor comes from, for the error.
+
+    Raises:
+        RequestValidationError: If an ID is not a non-negative integer, or
+        there is not one per shard. Answered as any invalid request.
+
+    Returns:
+        List[int]: The last ID of each shard, in shard order.
+    """
+    try:
+        last_ids = [int(item) for item in value.split(",")]
+    except ValueError:
+        last_ids = list()
+    if len(last_ids) == 1:
+        last_ids = last_ids * shards
+    if len(last_ids) != shards or any(last_id < 0 for last_id in last_ids):
+        raise RequestValidationError([{"type": "value_error",
+                                       "loc": location,
+                                       "msg": f"Expected {shards} comma separated record IDs",
+                                       "input": value}])
+    return last_ids
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    Convert a time query parameter to the naive UTC of the database columns.
+
+    The `TIMESTAMP` columns have no time zone, and hold UTC times. Times with
+    an offset (like `2024-05-01T09:00:00Z` or `...-03:00`) are converted to
+    UTC, since they can't be compared with them as they are. Naive times are
+    taken as UTC.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def project(rows: List[Dict[str, Any]], fields: List[str]) -> List[Dict[str, Any]]:
+    """Keep only `fields` of every row, in that order."""
+    return [{name: row[name] for name in fields} for row in rows]
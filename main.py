@@ -1,25 +1,108 @@
 # -*- coding: utf-8 -*-
 """Main application"""
 
-import uvicorn
+import asyncio
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.exc import DBAPIError
 from typing import AsyncIterator
 from contextlib import asynccontextmanager
 
-from challenge import constants
-from challenge.api import (api_leads,
+from challenge import constants, settings
+from challenge.api import (api_admin,
+                           api_leads,
                            api_enroll,
                            api_records,
-                           api_root)
+                           api_root,
+                           api_health,
+                           api_stats)
 from challenge.core.log_manager import LogManager
 from challenge.utils.error_management import (unexpected_error_handler,
                                               expected_error_handler,
                                               data_type_error_request,
-                                              connection_refused_error)
-from challenge.exceptions import BaseError
+                                              connection_refused_error,
+                                              deadline_exceeded_error,
+                                              database_error_handler)
+from challenge.exceptions import BaseError, RequestDeadlineExceeded
 from challenge.core.db_handler import DbHandler
+from challenge.core.query_counter import instrument_engine
+from challenge.core.partitions import ensure_partitions
+from challenge.core.change_feed import listen
+from challenge.middleware.query_budget import QueryBudgetMiddleware
+from challenge.middleware.concurrency import ConcurrencyLimitMiddleware
+from challenge.middleware.deadline import DeadlineMiddleware
+from challenge.middleware.loaders import RequestLoaderMiddleware
+from challenge.middleware.rate_limit import RateLimitMiddleware
+from challenge.middleware.profiling import ProfilingMiddleware
+from challenge.core.concurrency import AdaptiveLimiter
+from challenge.core.rate_limit import open_bucket_store, parse_limits
+from challenge.core.profiling import ProfileStore
+from challenge.core.loop_monitor import LoopLagMonitor
+
+
+async def warm_up_database(app: FastAPI, db_handler: DbHandler) -> None:
+    """Warm up the connection pool, retrying until the database is reachable.
+
+    The application is flagged as ready once the warm-up completes.
+    """
+    if settings.POOL_WARMUP_CONNECTIONS <= 0:
+        app.state.ready = True
+        return
+    while True:
+        try:
+            await db_handler.warm_up(settings.POOL_WARMUP_CONNECTIONS)
+        except Exception as exc:
+            app.logger.warning(
+                f"Database warm-up failed ({type(exc).__name__}). "
+                f"Retrying in {settings.WARMUP_RETRY_SECONDS}s.")
+            await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+        else:
+            app.state.ready = True
+            app.logger.info(
+                f"Database warm-up completed: {settings.POOL_WARMUP_CONNECTIONS} connections.")
+            return
+
+
+async def maintain_partitions(app: FastAPI, db_handler: DbHandler) -> None:
+    """Create the upcoming partitions of subject_enrollments, once a day."""
+    while True:
+        try:
+            created = list()
+            for engine in db_handler._engines:
+                created.extend(await ensure_partitions(engine, settings.PARTITIONS_AHEAD))
+        except Exception as exc:
+            app.logger.warning(f"Partition maintenance failed ({type(exc).__name__}: {exc}).")
+        else:
+            if created:
+                app.logger.info(f"Partitions created: {', '.join(created)}.")
+        await asyncio.sleep(constants.PARTITION_MAINTENANCE_SECONDS)
+
+
+async def fold_stats(app: FastAPI, db_handler: DbHandler) -> None:
+    """Fold the enrollment stats deltas into their counters, every STATS_FOLD_SECONDS."""
+    while True:
+        await asyncio.sleep(settings.STATS_FOLD_SECONDS)
+        try:
+            await db_handler._fold_stats()
+        except Exception as exc:
+            app.logger.warning(f"Enrollment stats fold failed ({type(exc).__name__}: {exc}).")
+
+
+async def listen_changes(app: FastAPI, db_handler: DbHandler) -> None:
+    """Republish the new records notified by every process (on every shard) to the local streams."""
+    async def listen_shard(shard: int, engine) -> None:
+        while True:
+            try:
+                await listen(engine, db_handler._change_feed, constants.CHANGE_FEED_CHANNEL)
+            except Exception as exc:
+                app.logger.warning(
+                    f"Change feed listener of shard {shard} failed ({type(exc).__name__}). "
+                    f"Retrying in {settings.WARMUP_RETRY_SECONDS}s.")
+                await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+
+    await asyncio.gather(*(listen_shard(shard, engine)
+                           for shard, engine in enumerate(db_handler._engines)))
 
 
 #Lifespan events
@@ -28,7 +111,13 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     """Manages the lifecycle of the FastAPI application.
 
     This function handles the startup and shutdown events for the application:
-    - **Startup**: Initializes the logger, logs application version and startup message.
+    - **Startup**: Initializes the logger, logs application version and startup message,
+      creates the schema of an in-memory database,
+      and starts the database warm-up in background. `/ready` answers 200 once it completes.
+      The enrollment stats deltas are folded into their counters in background.
+      The partition maintenance also runs in background, when it's enabled,
+      the event loop lag monitor, when it's enabled,
+      and the change feed listener, with the postgres backend.
     - **Shutdown**: Logs a shutdown message when the application is closing.
 
     Args:
@@ -45,10 +134,33 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     app.logger.info(f"Unit version: {constants.VERSION}")
     app.logger.info(f"Starting unit execution.")
     db_handler = DbHandler()
+    if db_handler.in_memory:
+        await db_handler.create_schema(seed=True)
+        app.logger.info("In-memory database created with the pre-set data.")
+    if settings.QUERY_BUDGET_ENABLED:
+        for engine in db_handler._engines:
+            instrument_engine(engine)
+        app.logger.info("Query budget instrumentation enabled.")
+    app.state.ready = False
+    background_tasks = [asyncio.create_task(warm_up_database(app, db_handler)),
+                        asyncio.create_task(fold_stats(app, db_handler))]
+    if settings.LOOP_MONITOR_ENABLED:
+        app.state.loop_monitor = LoopLagMonitor(app.logger,
+                                                interval=settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+                                                stall_threshold=settings.LOOP_STALL_THRESHOLD_MS / 1000,
+                                                report_every=settings.LOOP_LAG_REPORT_SECONDS)
+        background_tasks.append(asyncio.create_task(app.state.loop_monitor.run()))
+    if settings.PARTITION_MAINTENANCE_ENABLED:
+        background_tasks.append(asyncio.create_task(maintain_partitions(app, db_handler)))
+    if settings.CHANGE_FEED_BACKEND == constants.CHANGE_FEED_POSTGRES:
+        background_tasks.append(asyncio.create_task(listen_changes(app, db_handler)))
     try:
         yield
     finally:
     # ShutDown event
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
         await db_handler.close()
         app.logger.info("Shutting down.")
 
@@ -56,6 +168,56 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
 # Initialize App object
 app = FastAPI(lifespan=lifespan)
 
+# Middlewares, from the innermost to the outermost
+# Batch and memoize the lookups by ID of each request
+if settings.REQUEST_LOADERS_ENABLED:
+    app.add_middleware(RequestLoaderMiddleware)
+
+# Count statements per request and flag query budget violations
+if settings.QUERY_BUDGET_ENABLED:
+    app.add_middleware(QueryBudgetMiddleware, budgets=constants.QUERY_BUDGETS)
+
+# Profile single requests on demand, the queue wait is left out
+if settings.PROFILING_ENABLED:
+    app.state.profile_store = ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
+    app.add_middleware(ProfilingMiddleware,
+                       store=app.state.profile_store,
+                       token=settings.PROFILING_TOKEN,
+                       header=settings.PROFILING_HEADER,
+                       sample_rate=settings.PROFILING_SAMPLE_RATE,
+                       exempt_prefixes=["/admin/"])
+
+# Cap the database-bound requests in flight and shed the excess
+if settings.CONCURRENCY_LIMIT_ENABLED:
+    app.state.concurrency_limiter = AdaptiveLimiter(
+        initial_limit=settings.CONCURRENCY_INITIAL_LIMIT,
+        min_limit=settings.CONCURRENCY_MIN_LIMIT,
+        max_limit=settings.CONCURRENCY_MAX_LIMIT,
+        target_latency=settings.CONCURRENCY_TARGET_MS / 1000,
+        max_queue=settings.CONCURRENCY_MAX_QUEUE)
+    app.add_middleware(ConcurrencyLimitMiddleware,
+                       limiter=app.state.concurrency_limiter,
+                       queue_timeout=settings.CONCURRENCY_QUEUE_TIMEOUT,
+                       retry_after=settings.CONCURRENCY_RETRY_AFTER,
+                       exempt_paths=constants.CONCURRENCY_EXEMPT_PATHS)
+
+# Set the deadline of each request, the queue wait counts against it
+app.add_middleware(DeadlineMiddleware,
+                   default_timeout_ms=settings.REQUEST_TIMEOUT_MS,
+                   max_timeout_ms=settings.REQUEST_TIMEOUT_MAX_MS)
+
+# Limit the requests of each client, before they wait for a slot
+if settings.RATE_LIMIT_ENABLED:
+    app.state.rate_limit_store = open_bucket_store(settings.RATE_LIMIT_BACKEND,
+                                                   max_buckets=settings.RATE_LIMIT_MAX_CLIENTS,
+                                                   path=settings.RATE_LIMIT_SQLITE_PATH)
+    app.add_middleware(RateLimitMiddleware,
+                       store=app.state.rate_limit_store,
+                       limits=parse_limits(settings.RATE_LIMITS),
+                       key_header=settings.RATE_LIMIT_KEY_HEADER,
+                       api_keys=settings.RATE_LIMIT_API_KEYS,
+                       exempt_paths=constants.RATE_LIMIT_EXEMPT_PATHS)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -73,18 +235,25 @@ app.contact     = constants.CONTACT
 
 # Include all APIs routers
 app.include_router(api_root.router,                       tags=["root"])
+app.include_router(api_health.router,                     tags=["health"])
 app.include_router(api_leads.router,   prefix="/leads",   tags=["leads"])
 app.include_router(api_enroll.router,  prefix="/enroll",  tags=["enroll"])
 app.include_router(api_records.router, prefix="/records", tags=["records"])
+app.include_router(api_stats.router,   prefix="/stats",   tags=["stats"])
+if settings.PROFILING_ENABLED:
+    app.include_router(api_admin.router, prefix="/admin", tags=["admin"])
 
 # Response exceptions Handlers
 app.add_exception_handler(OSError, connection_refused_error)
+app.add_exception_handler(RequestDeadlineExceeded, deadline_exceeded_error)
+app.add_exception_handler(DBAPIError, database_error_handler)
 app.add_exception_handler(RequestValidationError, data_type_error_request)
 app.add_exception_handler(BaseError, expected_error_handler)
 app.add_exception_handler(Exception, unexpected_error_handler)
 
 def run_dev_server():
     """Run the server for development purposes."""
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
 if __name__ == "__main__":
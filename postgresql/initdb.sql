@@ -9,6 +9,15 @@ CREATE TABLE students (
     date TIMESTAMP DEFAULT CURRENT_TIMESTAMP  -- Automatically set date when record is created
 );
 
+-- Indexes for lead search: exact DNI (unique), and prefix/fuzzy name and email (pg_trgm)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE UNIQUE INDEX ix_students_dni ON students (dni);
+CREATE INDEX ix_students_name_trgm ON students USING gin (name gin_trgm_ops);
+CREATE INDEX ix_students_email_trgm ON students USING gin (email gin_trgm_ops);
+
+-- Index for the incremental sync of GET /records?updated_since=: students written since a time
+CREATE INDEX ix_students_date ON students (date);
+
 -- Table for Careers
 CREATE TABLE careers (
     id SERIAL PRIMARY KEY,            -- Auto-incremental ID, used as the primary key
@@ -33,6 +42,11 @@ CREATE TABLE student_career (
     date TIMESTAMP DEFAULT CURRENT_TIMESTAMP                                     -- Automatically set date when record is created
 );
 
+-- Indexes for the records listing: join by student and career, and filter by career and year
+CREATE INDEX ix_student_career_student_career ON student_career (student_id, career_id);
+CREATE INDEX ix_student_career_career_year ON student_career (career_id, year_enroll);
+CREATE INDEX ix_student_career_date ON student_career (date);
+
 -- Table for the many-to-many relationship between Careers and Subjects
 CREATE TABLE career_subject (
     id SERIAL PRIMARY KEY,
@@ -53,6 +67,27 @@ CREATE TABLE subject_enrollments (
     FOREIGN KEY (career_subject_id) REFERENCES career_subject(id) ON DELETE CASCADE -- Foreign key constraint
 );
 
+-- Indexes for the records listing: filter by career-subject, enroll times and date, and join by student
+CREATE INDEX ix_subject_enrollments_career_subject ON subject_enrollments (career_subject_id, enroll_times, id);
+CREATE INDEX ix_subject_enrollments_student ON subject_enrollments (student_id, career_subject_id, enroll_times);
+CREATE INDEX ix_subject_enrollments_date ON subject_enrollments (date, id);
+
+-- Table for the enrollment counters served by /stats, updated with every enrollment
+CREATE TABLE enrollment_stats (
+    metric VARCHAR(20) NOT NULL,      -- career, year, subject or enroll_times
+    key INT NOT NULL,                 -- ID of the career or subject, year or enroll times
+    total INT NOT NULL DEFAULT 0,     -- Number of enrollments
+    PRIMARY KEY (metric, key)
+);
+
+-- Changes to the enrollment counters, written by every enrollment and folded into them in background
+CREATE TABLE enrollment_stat_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    metric VARCHAR(20) NOT NULL,      -- Metric and key of the counter
+    key INT NOT NULL,
+    delta INT NOT NULL                -- Enrollments added, or removed when negative
+);
+
 -- Insert 4 students
 INSERT INTO students (dni, name, email, phone, address) VALUES
 ('12345678', 'Alice Smith', 'alice.smith@example.com', '555-1111', 'Address 123'),
@@ -0,0 +1,9 @@
+-- Indexes for GET /leads/search on existing databases.
+-- New databases get them from initdb.sql.
+-- CONCURRENTLY avoids locking the table for writes, so it can't run in a transaction.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_students_dni ON students (dni);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_students_name_trgm ON students USING gin (name gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_students_email_trgm ON students USING gin (email gin_trgm_ops);
@@ -0,0 +1,10 @@
+-- Indexes for the filters of GET /records on existing databases.
+-- New databases get them from initdb.sql.
+-- CONCURRENTLY avoids locking the table for writes, so it can't run in a transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_student_career_student_career ON student_career (student_id, career_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_student_career_career_year ON student_career (career_id, year_enroll);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_subject_enrollments_career_subject ON subject_enrollments (career_subject_id, enroll_times, id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_subject_enrollments_student ON subject_enrollments (student_id, career_subject_id, enroll_times);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_subject_enrollments_date ON subject_enrollments (date, id);
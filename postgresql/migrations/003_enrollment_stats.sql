@@ -0,0 +1,33 @@
+-- Enrollment counters for /stats on existing databases.
+-- New databases get the table from initdb.sql.
+-- The counters start from the current rows, the API keeps them updated afterwards.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS enrollment_stats (
+    metric VARCHAR(20) NOT NULL,
+    key INT NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, key)
+);
+
+LOCK TABLE enrollment_stats IN SHARE ROW EXCLUSIVE MODE;
+DELETE FROM enrollment_stats;
+
+INSERT INTO enrollment_stats (metric, key, total)
+SELECT 'career', career_id, count(*) FROM student_career GROUP BY career_id;
+
+INSERT INTO enrollment_stats (metric, key, total)
+SELECT 'year', year_enroll, count(*) FROM student_career
+WHERE year_enroll IS NOT NULL GROUP BY year_enroll;
+
+INSERT INTO enrollment_stats (metric, key, total)
+SELECT 'subject', cs.subject_id, count(*)
+FROM subject_enrollments se JOIN career_subject cs ON cs.id = se.career_subject_id
+GROUP BY cs.subject_id;
+
+INSERT INTO enrollment_stats (metric, key, total)
+SELECT 'enroll_times', enroll_times, count(*) FROM subject_enrollments
+WHERE enroll_times IS NOT NULL GROUP BY enroll_times;
+
+COMMIT;
@@ -0,0 +1,60 @@
+-- Optional: convert subject_enrollments into a table partitioned by year of `date`.
+-- Rows are copied under an exclusive lock, so run it in a maintenance window.
+-- Afterwards, `challenge-partitions ensure` (or PARTITION_MAINTENANCE_ENABLED=true)
+-- creates the upcoming partitions, and `challenge-partitions archive` detaches the old ones.
+-- There is no default partition: an enrollment dated outside every partition fails.
+-- Lookups by ID alone can't be pruned: they probe the primary key of every partition.
+
+BEGIN;
+
+LOCK TABLE subject_enrollments IN ACCESS EXCLUSIVE MODE;
+
+-- Keep the ID sequence when the old table is dropped
+ALTER SEQUENCE subject_enrollments_id_seq OWNED BY NONE;
+ALTER TABLE subject_enrollments RENAME TO subject_enrollments_unpartitioned;
+
+-- The partition key must be part of the primary key
+CREATE TABLE subject_enrollments (
+    id INT NOT NULL DEFAULT nextval('subject_enrollments_id_seq'),
+    student_id INT NOT NULL,
+    career_subject_id INT NOT NULL,
+    enroll_times INT NOT NULL,
+    date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, date),
+    FOREIGN KEY (student_id) REFERENCES students(student_id) ON DELETE CASCADE,
+    FOREIGN KEY (career_subject_id) REFERENCES career_subject(id) ON DELETE CASCADE
+) PARTITION BY RANGE (date);
+
+ALTER SEQUENCE subject_enrollments_id_seq OWNED BY subject_enrollments.id;
+
+-- One partition per year, from the oldest enrollment to the next year
+DO $$
+DECLARE
+    year INT;
+BEGIN
+    FOR year IN
+        SELECT generate_series(
+            coalesce(extract(year FROM min(date))::INT, extract(year FROM now())::INT),
+            extract(year FROM now())::INT + 1)
+        FROM subject_enrollments_unpartitioned
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE subject_enrollments_y%s PARTITION OF subject_enrollments FOR VALUES FROM (%L) TO (%L)',
+            year, make_date(year, 1, 1), make_date(year + 1, 1, 1));
+    END LOOP;
+END $$;
+
+INSERT INTO subject_enrollments (id, student_id, career_subject_id, enroll_times, date)
+SELECT id, student_id, career_subject_id, enroll_times, coalesce(date, CURRENT_TIMESTAMP)
+FROM subject_enrollments_unpartitioned;
+
+DROP TABLE subject_enrollments_unpartitioned;
+
+-- Indexes on the parent are created on every partition, present and future
+CREATE INDEX ix_subject_enrollments_career_subject ON subject_enrollments (career_subject_id, enroll_times, id);
+CREATE INDEX ix_subject_enrollments_student ON subject_enrollments (student_id, career_subject_id, enroll_times);
+CREATE INDEX ix_subject_enrollments_date ON subject_enrollments (date, id);
+
+COMMIT;
+
+ANALYZE subject_enrollments;
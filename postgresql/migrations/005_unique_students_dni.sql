@@ -0,0 +1,9 @@
+-- Unique DNI, required by the ON CONFLICT (dni) of POST /leads/bulk, on existing databases.
+-- New databases get it from initdb.sql.
+-- It fails if a DNI is repeated. Find the duplicates with:
+--   SELECT dni, array_agg(student_id) FROM students GROUP BY dni HAVING count(*) > 1;
+-- CONCURRENTLY avoids locking the table for writes, so it can't run in a transaction.
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_students_dni ON students (dni);
+DROP INDEX CONCURRENTLY IF EXISTS ix_students_dni;
+ALTER INDEX ux_students_dni RENAME TO ix_students_dni;
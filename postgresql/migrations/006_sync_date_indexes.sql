@@ -0,0 +1,6 @@
+-- Indexes for the incremental sync of GET /records?updated_since= on existing databases.
+-- New databases get them from initdb.sql. subject_enrollments already has ix_subject_enrollments_date.
+-- CONCURRENTLY avoids locking the table for writes, so it can't run in a transaction.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_students_date ON students (date);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_student_career_date ON student_career (date);
@@ -0,0 +1,11 @@
+-- Changes to the enrollment counters on existing databases.
+-- New databases get the table from initdb.sql.
+-- Enrollments insert a row per counter instead of updating the shared counter rows,
+-- and the API folds them into enrollment_stats in background.
+
+CREATE TABLE IF NOT EXISTS enrollment_stat_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    metric VARCHAR(20) NOT NULL,
+    key INT NOT NULL,
+    delta INT NOT NULL
+);
@@ -50,9 +50,18 @@ setup(
     ],
     scripts=SCRIPT,
     install_requires=unit_deps,
+    extras_require={
+        # Vectorized reads of the snapshots of `challenge-export`
+        "analytics": ["numpy"],
+    },
     entry_points={
         "console_scripts": [
             f"{NAME} = main:run_dev_server",
+            f"{NAME}-seed = challenge.cli.seeder:main",
+            f"{NAME}-stats = challenge.cli.stats:main",
+            f"{NAME}-partitions = challenge.cli.partitions:main",
+            f"{NAME}-shards = challenge.cli.shards:main",
+            f"{NAME}-export = challenge.cli.export:main",
         ],
     },
 )
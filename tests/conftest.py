@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Shared pytest fixtures."""
+
+import pytest
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+from unittest.mock import patch
+
+from challenge import settings
+from challenge.constants import QUERY_BUDGETS, N_PLUS_ONE_THRESHOLD
+from challenge.core.db_handler import DbHandler
+from challenge.core.query_counter import (QueryCounter,
+                                          capture_all_queries,
+                                          instrument_engine)
+
+
+def new_db_handler(database_url: str = "", shard_urls: Optional[List[str]] = None) -> DbHandler:
+    """
+    A DbHandler on other databases, outside of the Singleton, so the other tests keep their handler.
+
+    Args:
+        database_url (str): `DATABASE_URL` of the handler.
+        shard_urls (Optional[List[str]]): `SHARD_DATABASE_URLS` of the handler, none by default.
+    """
+    with patch.object(settings, "DATABASE_URL", database_url), \
+         patch.object(settings, "SHARD_DATABASE_URLS", shard_urls or []):
+        db_handler = object.__new__(DbHandler)
+        DbHandler.__init__(db_handler)
+    return db_handler
+
+
+@pytest.fixture
+def query_counter() -> Iterator[QueryCounter]:
+    """Count every statement the DbHandler engine runs during the test."""
+    instrument_engine(DbHandler()._engine)
+    with capture_all_queries() as counter:
+        yield counter
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Assert that the code run inside the returned context manager stays within
+    the query budget of a route and doesn't repeat statements (N+1).
+
+    Usage:
+        with query_budget("GET /records/"):
+            client.get("/records")
+    """
+    instrument_engine(DbHandler()._engine)
+
+    @contextmanager
+    def check(route: str, budget: Optional[int] = None) -> Iterator[QueryCounter]:
+        max_statements = QUERY_BUDGETS[route] if budget is None else budget
+        with capture_all_queries() as counter:
+            yield counter
+        assert counter.count <= max_statements, (
+            f"'{route}' ran {counter.count} statements, budget is {max_statements}")
+        repeated = counter.repeated_statements(N_PLUS_ONE_THRESHOLD)
+        assert not repeated, f"'{route}' repeated statements (N+1): {repeated}"
+
+    return check
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""Query plan harness.
+
+Runs the query paths of `DbHandler` against a seeded Postgres database,
+captures every statement they issue and runs it again under
+`EXPLAIN (ANALYZE, BUFFERS)`. Each scenario is reduced to a summary (the
+plan nodes and the shared buffers touched by each statement) that is kept
+as a golden file in `tests/query_plans/`, so a plan change shows up in the
+diff of the pull request that caused it.
+
+A scenario regresses when a hot path scans `students` or
+`subject_enrollments` (or one of its partitions) sequentially, or when a
+statement touches more buffers than its budget. The budgets are written
+with the golden files, as `PLAN_BUFFER_TOLERANCE` times the buffers seen,
+so they are reviewed with every regeneration (`PLAN_UPDATE_GOLDEN=1`).
+A statement without a golden entry, new or rewritten, has no budget and
+regresses too, until the golden file is regenerated.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.future import select
+
+from challenge.constants import STAT_CAREER, STAT_YEAR
+from challenge.core.enrollment_stats import grouped_counts
+from challenge.core.query_counter import capture_all_queries, instrument_engine
+from challenge.models.sql_models import (EnrollmentStatDelta,
+                                         Student,
+                                         StudentCareer,
+                                         SubjectEnrollment)
+
+
+GOLDEN_DIR = Path(__file__).resolve().parent / "query_plans"
+# Tables that must never be read with a sequential scan on a hot path
+LARGE_TABLES = re.compile(r"^(students|subject_enrollments)(_y\d{4}|_default)?$")
+# Buffers allowed to a statement, as a multiple of the ones of the golden run
+PLAN_BUFFER_TOLERANCE = 2.0
+# Floor of the budgets, so tiny plans don't fail on a page more
+PLAN_MIN_BUFFER_BUDGET = 50
+# DNI prefix of the students created by the write scenarios, deleted after the run
+PLAN_DNI_PREFIX = "PLAN-"
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+WRITES = ("INSERT", "UPDATE", "DELETE")
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """A call of the DbHandler, and whether it runs on a hot path."""
+    name: str
+    call: Callable[[Any, Dict[str, Any]], Awaitable[Any]]
+    hot: bool = True
+
+
+SCENARIOS: List[Scenario] = [
+    Scenario("get_student_by_id",
+             lambda db, sample: db._get_student_by_id(sample["student_id"])),
+    Scenario("get_student_id_by_dni",
+             lambda db, sample: db._get_student_id_by_dni(sample["dni"])),
+    Scenario("get_students_by_ids",
+             lambda db, sample: db._get_students_by_ids(sample["student_ids"])),
+    Scenario("search_students_by_dni",
+             lambda db, sample: db._search_students(sample["dni"], 10)),
+    Scenario("search_students_by_name",
+             lambda db, sample: db._search_students(sample["name"][:5], 10)),
+    Scenario("get_all_students",
+             lambda db, sample: db._get_all_students(), hot=False),
+    Scenario("get_records_first_page",
+             lambda db, sample: db._get_records(0, 10)),
+    Scenario("get_records_after_id",
+             lambda db, sample: db._get_records(0, 10, after_id=sample["record_id"])),
+    Scenario("get_records_by_career_and_year",
+             lambda db, sample: db._get_records(0, 10, career=sample["career"],
+                                                year_enroll=sample["year_enroll"])),
+    Scenario("get_records_by_subject",
+             lambda db, sample: db._get_records(0, 10, subject=sample["subject"],
+                                                enroll_times=1)),
+    Scenario("get_records_by_date",
+             lambda db, sample: db._get_records(0, 10, date_from=sample["date"] - timedelta(days=1),
+                                                date_to=sample["date"])),
+    Scenario("get_records_by_ids",
+             lambda db, sample: db._get_records_by_ids(sample["record_ids"])),
+    Scenario("build_record_by_id",
+             lambda db, sample: db._build_record_by_id(sample["record_id"])),
+    Scenario("get_changed_records",
+             lambda db, sample: db._get_changed_records(sample["latest"] - timedelta(hours=1), 0, 100)),
+    Scenario("get_last_record_ids",
+             lambda db, sample: db._get_last_record_ids()),
+    Scenario("get_student_career_by_ids",
+             lambda db, sample: db._get_student_career_by_ids(sample["student_id"],
+                                                              sample["career_id"])),
+    Scenario("get_subject_enrollment_id",
+             lambda db, sample: db._get_subject_enrollment_id(sample["student_id"],
+                                                              sample["career_subject_id"],
+                                                              sample["enroll_times"])),
+    Scenario("get_stats",
+             lambda db, sample: db._get_stats(STAT_CAREER)),
+    Scenario("create_and_enroll_student",
+             lambda db, sample: create_and_enroll_student(db, sample)),
+]
+
+
+async def create_and_enroll_student(db_handler, sample: Dict[str, Any]) -> None:
+    """The writes of `POST /records/` for a new student, removed by `delete_plan_students`."""
+    student_id = await db_handler._create_student(f"{PLAN_DNI_PREFIX}{sample['student_id']}",
+                                                  "Plan Student",
+                                                  email="plan.student@example.com",
+                                                  phone="555-0000",
+                                                  address="Plan street 1")
+    await db_handler._enroll_student_in_a_career(student_id, sample["career_id"],
+                                                 sample["year_enroll"])
+    await db_handler._enroll_student_in_a_subject(student_id, sample["career_subject_id"], 1)
+
+
+async def load_sample(engine) -> Dict[str, Any]:
+    """IDs and values of real rows, for the arguments of the scenarios."""
+    async with engine.connect() as connection:
+        row = (await connection.execute(text(
+            "SELECT se.id, se.student_id, se.career_subject_id, se.enroll_times, se.date, "
+            "       s.dni, s.name, c.id, c.name, su.name, sc.year_enroll "
+            "FROM subject_enrollments se "
+            "JOIN students s ON s.student_id = se.student_id "
+            "JOIN career_subject cs ON cs.id = se.career_subject_id "
+            "JOIN careers c ON c.id = cs.career_id "
+            "JOIN subjects su ON su.id = cs.subject_id "
+            "JOIN student_career sc ON sc.student_id = se.student_id AND sc.career_id = c.id "
+            "ORDER BY se.id DESC LIMIT 1"))).one()
+        student_ids = (await connection.execute(text(
+            "SELECT student_id FROM students ORDER BY student_id LIMIT 50"))).scalars().all()
+        record_ids = (await connection.execute(text(
+            "SELECT id FROM subject_enrollments ORDER BY id LIMIT 50"))).scalars().all()
+        # A mirror syncs the changes since its last call, the newest ones
+        latest = (await connection.execute(text(
+            "SELECT max(date) FROM subject_enrollments"))).scalar()
+    (record_id, student_id, career_subject_id, enroll_times, date,
+     dni, name, career_id, career, subject, year_enroll) = row
+    return {"record_id": record_id, "student_id": student_id,
+            "career_subject_id": career_subject_id, "enroll_times": enroll_times,
+            "date": date, "dni": dni, "name": name, "career_id": career_id,
+            "career": career, "subject": subject, "year_enroll": year_enroll,
+            "student_ids": list(student_ids), "record_ids": list(record_ids), "latest": latest}
+
+
+async def delete_plan_students(engine) -> None:
+    """Remove the rows of the write scenarios, and take them out of the enrollment stats."""
+    plan_students = select(Student.student_id).where(Student.dni.like(f"{PLAN_DNI_PREFIX}%"))
+    async with engine.begin() as connection:
+        deltas = list()
+        for metric, query in grouped_counts().items():
+            table = StudentCareer if metric in (STAT_CAREER, STAT_YEAR) else SubjectEnrollment
+            deltas.extend({"metric": metric, "key": key, "delta": -total}
+                          for _, key, total in await connection.execute(
+                              query.where(table.student_id.in_(plan_students))))
+        if deltas:
+            await connection.execute(insert(EnrollmentStatDelta).values(deltas))
+        await connection.execute(text(
+            "DELETE FROM subject_enrollments WHERE student_id IN "
+            "(SELECT student_id FROM students WHERE dni LIKE :prefix)"), {"prefix": f"{PLAN_DNI_PREFIX}%"})
+        await connection.execute(text(
+            "DELETE FROM student_career WHERE student_id IN "
+            "(SELECT student_id FROM students WHERE dni LIKE :prefix)"), {"prefix": f"{PLAN_DNI_PREFIX}%"})
+        await connection.execute(text("DELETE FROM students WHERE dni LIKE :prefix"),
+                                 {"prefix": f"{PLAN_DNI_PREFIX}%"})
+
+
+def is_explainable(statement: str, parameters: Any) -> bool:
+    """Whether `EXPLAIN` accepts the statement. Batches of `executemany` are left out."""
+    if isinstance(parameters, list) and parameters and isinstance(parameters[0], (tuple, list, dict)):
+        return False
+    return statement.lstrip().upper().startswith(EXPLAINABLE)
+
+
+def is_write(statement: str) -> bool:
+    return statement.lstrip().upper().startswith(WRITES)
+
+
+async def explain(engine, statement: str, parameters: Any) -> Dict[str, Any]:
+    """
+    Run a captured statement under `EXPLAIN`, in a transaction that is rolled back.
+
+    Writes are explained without `ANALYZE`: they already ran, and running them
+    again would conflict with their own rows.
+    """
+    options = "FORMAT JSON" if is_write(statement) else "ANALYZE, BUFFERS, FORMAT JSON"
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        try:
+            result = await connection.exec_driver_sql(f"EXPLAIN ({options}) {statement}",
+                                                      tuple(parameters or ()))
+            plan = result.scalar()
+        finally:
+            await transaction.rollback()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]
+
+
+def plan_nodes(node: Dict[str, Any]) -> List[str]:
+    """Labels of the nodes of a plan, depth first, like `Index Scan using ix on students`."""
+    label = node["Node Type"]
+    if "Index Name" in node:
+        label += f" using {node['Index Name']}"
+    if "Relation Name" in node:
+        label += f" on {node['Relation Name']}"
+    labels = [label]
+    for child in node.get("Plans", ()):
+        labels.extend(plan_nodes(child))
+    return labels
+
+
+def plan_buffers(plan: Dict[str, Any]) -> int:
+    """
+    Shared buffers touched by the statement, hits and reads.
+
+    The hits are counted too, so the figure doesn't depend on what is cached.
+    The counters of the top node include the ones of its children.
+    """
+    node = plan["Plan"]
+    return node.get("Shared Hit Blocks", 0) + node.get("Shared Read Blocks", 0)
+
+
+def summarize(statement: str, plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary of a statement and its plan, as stored in the golden files."""
+    buffers = plan_buffers(plan)
+    return {"statement": " ".join(statement.split()),
+            "nodes": plan_nodes(plan["Plan"]),
+            "buffers": buffers,
+            "budget": max(PLAN_MIN_BUFFER_BUDGET, int(buffers * PLAN_BUFFER_TOLERANCE))}
+
+
+def sequential_scans(summary: Dict[str, Any]) -> List[str]:
+    """Sequential scans of `students` or `subject_enrollments` in a statement summary."""
+    return [node for node in summary["nodes"]
+            if node.startswith("Seq Scan on ") and LARGE_TABLES.match(node[len("Seq Scan on "):])]
+
+
+def regressions(scenario: str,
+                hot: bool,
+                summaries: List[Dict[str, Any]],
+                golden: Optional[Dict[str, Any]]) -> List[str]:
+    """
+    Problems of the plans of a scenario, compared with its golden file.
+
+    Args:
+        scenario (str): Name of the scenario.
+        hot (bool): Whether sequential scans of the large tables are forbidden.
+        summaries (List[Dict[str, Any]]): Summaries of the statements of this run.
+        golden (Optional[Dict[str, Any]]): Golden file of the scenario, if any.
+
+    Returns:
+        List[str]: A message per problem, empty if the plans are fine.
+    """
+    problems = list()
+    if hot:
+        for summary in summaries:
+            for node in sequential_scans(summary):
+                problems.append(f"{scenario}: {node} in {summary['statement'][:120]}")
+    if golden is None:
+        return problems
+    budgets = {entry["statement"]: entry["budget"] for entry in golden["statements"]}
+    for summary in summaries:
+        budget = budgets.get(summary["statement"])
+        if budget is None:
+            problems.append(f"{scenario}: no golden plan, regenerate it with PLAN_UPDATE_GOLDEN=1, "
+                            f"for {summary['statement'][:120]}")
+        elif summary["buffers"] > budget:
+            problems.append(f"{scenario}: {summary['buffers']} buffers, budget is {budget}, "
+                            f"in {summary['statement'][:120]}")
+    return problems
+
+
+async def capture_scenario(db_handler, scenario: Scenario, sample: Dict[str, Any]
+                           ) -> List[Tuple[str, Any]]:
+    """Statements issued by the scenario, with their parameters."""
+    instrument_engine(db_handler._engine)
+    with capture_all_queries() as counter:
+        await scenario.call(db_handler, sample)
+    return list(counter.statements)
+
+
+async def run_scenario(db_handler, scenario: Scenario, sample: Dict[str, Any]
+                       ) -> List[Dict[str, Any]]:
+    """Summaries of the plans of every explainable statement of a scenario."""
+    summaries = list()
+    for statement, parameters in await capture_scenario(db_handler, scenario, sample):
+        if is_explainable(statement, parameters):
+            plan = await explain(db_handler._engine, statement, parameters)
+            summaries.append(summarize(statement, plan))
+    return summaries
+
+
+def golden_path(scenario: str) -> Path:
+    return GOLDEN_DIR / f"{scenario}.json"
+
+
+def load_golden(scenario: str) -> Optional[Dict[str, Any]]:
+    path = golden_path(scenario)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def write_golden(scenario: str, students: int, summaries: List[Dict[str, Any]]) -> None:
+    """Store the summaries of a scenario, with the scale of the dataset they were taken on."""
+    GOLDEN_DIR.mkdir(exist_ok=True)
+    golden = {"scenario": scenario, "students": students,
+              "generated": datetime.now().date().isoformat(), "statements": summaries}
+    golden_path(scenario).write_text(json.dumps(golden, indent=2) + "\n")
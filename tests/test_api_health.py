@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Api Health test"""
+
+import time
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from starlette import status
+
+from main import app
+from challenge.core.db_handler import DbHandler
+
+
+class ServiceTests(unittest.TestCase):
+    """Test for Health API Endpoints"""
+
+    health_url = "/health"
+    ready_url = "/ready"
+
+    def test_get_health(self):
+        """Health reports the pool saturation"""
+        with TestClient(app) as client:
+            response = client.get(self.health_url)
+            assert response.status_code == status.HTTP_200_OK
+            pool = response.json()["pool"]
+            assert pool["checked_out"] == 0
+            assert pool["saturation"] == 0.0
+
+    @patch.object(DbHandler, "warm_up", side_effect=ConnectionRefusedError("down"))
+    def test_not_ready_while_warm_up_fails(self, warm_up):
+        """Ready answers 503 until the warm-up succeeds"""
+        with TestClient(app) as client:
+            response = client.get(self.ready_url)
+            assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+            assert response.json() == {"ready": False}
+
+    @patch.object(DbHandler, "warm_up")
+    def test_ready_after_warm_up(self, warm_up):
+        """Ready answers 200 once the warm-up completes"""
+        with TestClient(app) as client:
+            for _ in range(50):
+                response = client.get(self.ready_url)
+                if response.status_code == status.HTTP_200_OK:
+                    break
+                time.sleep(0.01)
+            assert response.status_code == status.HTTP_200_OK
+            warm_up.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -21,6 +21,7 @@ class ServiceTests(unittest.TestCase):
     leads_url = "/leads"
     lead_by_id = "/leads/1"
     lead_by_id_0 = "/leads/0"
+    leads_search = "/leads/search"
 
     leads_result = [
         Student(student_id=1,
@@ -65,6 +66,81 @@ class ServiceTests(unittest.TestCase):
             assert response.status_code == status.HTTP_200_OK
             assert response.json()["student_id"] == self.leads_result[0].student_id
 
+    @patch.object(DbHandler, "_search_students")
+    def test_search_leads(self, search_students):
+        """Test request to the lead search endpoint"""
+        with TestClient(app) as client:
+            search_students.return_value = self.leads_result
+            response = client.get(self.leads_search, params={"q": "pep", "limit": 5})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()[0]["student_id"] == self.leads_result[0].student_id
+            search_students.assert_awaited_once_with(query="pep", limit=5)
+
+    @patch.object(DbHandler, "_get_students_by_ids")
+    def test_get_leads_by_ids(self, get_students):
+        """Test request to the leads endpoint with a batch of IDs"""
+        with TestClient(app) as client:
+            get_students.return_value = self.leads_result
+            response = client.get(self.leads_url, params={"ids": ["7,1", "1"]})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()["leads"][0]["student_id"] == 1
+            assert response.json()["missing"] == [7]
+            get_students.assert_awaited_once_with([7, 1], fields=None)
+
+    @patch.object(DbHandler, "_get_students_by_ids")
+    def test_get_leads_by_ids_with_fields(self, get_students):
+        """Test request to the leads endpoint with a batch of IDs and a sparse fieldset"""
+        with TestClient(app) as client:
+            get_students.return_value = [{"student_id": 1, "name": "pepe"}]
+            response = client.get(self.leads_url, params={"ids": "1,7", "fields": ["name", "name"]})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json() == {"leads": [{"name": "pepe"}], "missing": [7]}
+            get_students.assert_awaited_once_with([1, 7], fields=["name"])
+            response = client.get(self.leads_url, params={"fields": "date"})
+            assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+
+    def test_get_leads_by_invalid_ids(self):
+        """Test request to the leads endpoint with invalid or too many IDs"""
+        with TestClient(app) as client:
+            response = client.get(self.leads_url, params={"ids": "1,a"})
+            assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+            response = client.get(self.leads_url,
+                                  params={"ids": ",".join(str(i) for i in range(1, 102))})
+            assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+
+    @patch.object(DbHandler, "_bulk_create_students")
+    def test_create_leads_in_bulk(self, bulk_create):
+        """Test request to create leads in bulk"""
+        with TestClient(app) as client:
+            bulk_create.return_value = {"student_ids": {"12345678": 1},
+                                        "created": 0,
+                                        "updated": 0,
+                                        "conflicts": ["12345678"]}
+            response = client.post(f"{self.leads_url}/bulk",
+                                   json={"leads": [self.lead_creation],
+                                         "on_conflict": "report"})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json()["student_ids"] == {"12345678": 1}
+            assert response.json()["conflicts"] == ["12345678"]
+            bulk_create.assert_awaited_once_with(leads=[self.lead_creation],
+                                                 on_conflict="report")
+
+    def test_create_leads_in_bulk_invalid(self):
+        """Test request to create leads in bulk with an unknown conflict mode"""
+        with TestClient(app) as client:
+            response = client.post(f"{self.leads_url}/bulk",
+                                   json={"leads": [self.lead_creation],
+                                         "on_conflict": "merge"})
+            assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+            response = client.post(f"{self.leads_url}/bulk", json={"leads": []})
+            assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+
+    def test_search_leads_without_query(self):
+        """Test request to the lead search endpoint without query"""
+        with TestClient(app) as client:
+            response = client.get(self.leads_search)
+            assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+
     def test_get_lead_by_id_0(self):
         """Test request to lead with invalid ID endpoint"""
         with TestClient(app) as client:
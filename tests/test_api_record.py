@@ -10,10 +10,11 @@ from datetime import datetime
 from main import app
 from challenge.core.db_handler import DbHandler
 from challenge.models.sql_models import Student
+from challenge.models.api_models import ChangedLeadRecord, RetriveLeadRecord
 from challenge.exceptions import (CareerDoesNotExist,
                                   SubjectDoesNotExist,
                                   CareerSubjectDoesNotExist)
-from challenge.constants import DATA_INVALID
+from challenge.constants import DATA_INVALID, MAX_RECORDS_PAGE
 
 
 class ServiceTests(unittest.TestCase):
@@ -141,5 +142,128 @@ class ServiceTests(unittest.TestCase):
             assert response.text == f'"{DATA_INVALID}"'
 
 
+    @patch.object(DbHandler, "_get_records")
+    def test_get_filtered_records(self, get_records):
+        """Test request for records filtered by career, subject, year and date"""
+        with TestClient(app) as client:
+            get_records.return_value = []
+            response = client.get(self.records_url,
+                                  params={"start": 5,
+                                          "limit": 20,
+                                          "career": "electrical_engineering",
+                                          "subject": "physics",
+                                          "year_enroll": 2024,
+                                          "enroll_times": 2,
+                                          "date_from": "2024-01-01T00:00:00",
+                                          "date_to": "2025-01-01T02:59:59+03:00"})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json() == []
+            get_records.assert_called_once_with(start=5,
+                                                limit=20,
+                                                career="electrical_engineering",
+                                                subject="physics",
+                                                year_enroll=2024,
+                                                enroll_times=2,
+                                                date_from=datetime(2024, 1, 1),
+                                                date_to=datetime(2024, 12, 31, 23, 59, 59),
+                                                fields=None)
+
+    @patch.object(DbHandler, "_get_records")
+    def test_get_records_without_filters(self, get_records):
+        """Test request for records without filters"""
+        with TestClient(app) as client:
+            get_records.return_value = []
+            response = client.get(self.records_url)
+            assert response.status_code == status.HTTP_200_OK
+            get_records.assert_called_once_with(start=0,
+                                                limit=10,
+                                                career=None,
+                                                subject=None,
+                                                year_enroll=None,
+                                                enroll_times=None,
+                                                date_from=None,
+                                                date_to=None,
+                                                fields=None)
+
+    @patch.object(DbHandler, "_get_records_by_ids")
+    def test_get_records_by_ids(self, get_records):
+        """Test request for a batch of records, with missing IDs"""
+        with TestClient(app) as client:
+            record = dict(self.record_creation, id=3, class_duration=4)
+            get_records.return_value = [RetriveLeadRecord(**record)]
+            response = client.get(self.records_url, params={"ids": "5,3,9"})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json() == {"records": [record], "missing": [5, 9]}
+            get_records.assert_awaited_once_with([5, 3, 9], fields=None)
+
+    @patch.object(DbHandler, "_get_records")
+    def test_get_records_with_fields(self, get_records):
+        """Test request for records with a sparse fieldset"""
+        with TestClient(app) as client:
+            get_records.return_value = [{"id": 3, "name": "pepe", "career": "civil_engineering"}]
+            response = client.get(self.records_url, params={"fields": "name,career"})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json() == [{"name": "pepe", "career": "civil_engineering"}]
+            assert get_records.call_args.kwargs["fields"] == ["name", "career"]
+
+    def test_get_records_with_unknown_fields(self):
+        """Test request for records with a field that doesn't exist"""
+        with TestClient(app) as client:
+            response = client.get(self.records_url, params={"fields": "name,password"})
+            assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+            assert response.text == f'"{DATA_INVALID}"'
+
+    def test_records_query_with_fields(self):
+        """Only the requested columns, and the ID, are selected"""
+        query = str(DbHandler._records_query(["name", "career"]))
+        select_list = query.split("FROM")[0]
+        assert "students.name" in select_list and "careers.name AS career" in select_list
+        assert "subject_enrollments.id" in select_list
+        assert "address" not in select_list and "phone" not in select_list
+
+    @patch.object(DbHandler, "_get_changed_records")
+    def test_get_changed_records(self, get_changes):
+        """Test request for the records changed after a watermark"""
+        with TestClient(app) as client:
+            record = dict(self.record_creation, id=7, class_duration=4,
+                          changed_at="2024-05-01T10:00:00")
+            get_changes.return_value = [ChangedLeadRecord(**record)]
+            response = client.get(self.records_url, params={"updated_since": "2024-05-01T09:00:00Z",
+                                                            "after_id": 3,
+                                                            "limit": 1})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json() == {"records": [record],
+                                       "next": {"updated_since": "2024-05-01T10:00:00",
+                                                "after_id": 7},
+                                       "has_more": True}
+            assert get_changes.call_args.kwargs["updated_since"] == datetime(2024, 5, 1, 9)
+            assert get_changes.call_args.kwargs["after_id"] == 3
+            # Nothing changed, the mirror keeps its watermark
+            get_changes.return_value = []
+            response = client.get(self.records_url, params={"updated_since": "2024-05-01T10:00:00",
+                                                            "after_id": 7,
+                                                            "fields": "name"})
+            assert response.json() == {"records": [],
+                                       "next": {"updated_since": "2024-05-01T10:00:00",
+                                                "after_id": 7},
+                                       "has_more": False}
+            assert get_changes.call_args.kwargs["fields"] == ["name"]
+
+    def test_get_records_invalid_filter(self):
+        """Test request for records with an invalid filter"""
+        with TestClient(app) as client:
+            response = client.get(self.records_url,
+                                  params={"enroll_times": 0})
+            assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+            assert response.text == f'"{DATA_INVALID}"'
+
+    def test_get_records_limit_is_bounded(self):
+        """Test request for a page over the maximum"""
+        with TestClient(app) as client:
+            response = client.get(self.records_url,
+                                  params={"limit": MAX_RECORDS_PAGE + 1})
+            assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Api Stats test"""
+
+import unittest
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from starlette import status
+from sqlalchemy.dialects import postgresql
+
+from main import app
+from challenge.core.db_handler import DbHandler
+from challenge.core import enrollment_stats
+from challenge.cli import stats as stats_cli
+from challenge.constants import (STAT_CAREER,
+                                 STAT_YEAR,
+                                 STAT_SUBJECT,
+                                 STAT_ENROLL_TIMES)
+
+
+class ServiceTests(unittest.TestCase):
+    """Test for Stats API Endpoints"""
+
+    stats_url = "/stats"
+
+    counters = {
+        STAT_CAREER: [("electrical_engineering", 3), ("civil_engineering", 1)],
+        STAT_SUBJECT: [("physics", 4)],
+        STAT_YEAR: [(2024, 3), (2023, 1)],
+        STAT_ENROLL_TIMES: [(1, 3), (2, 1)],
+    }
+
+    def get_counters(self, metric):
+        return self.counters[metric]
+
+    def test_get_stats(self):
+        """Stats reports every metric"""
+        with patch.object(DbHandler, "_get_stats", side_effect=self.get_counters), \
+             TestClient(app) as client:
+            response = client.get(self.stats_url)
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json() == {
+                "careers": [{"key": "electrical_engineering", "enrollments": 3},
+                            {"key": "civil_engineering", "enrollments": 1}],
+                "subjects": [{"key": "physics", "enrollments": 4}],
+                "years": [{"key": 2024, "enrollments": 3},
+                          {"key": 2023, "enrollments": 1}],
+                "enroll_times": [{"key": 1, "enrollments": 3},
+                                 {"key": 2, "enrollments": 1}],
+            }
+
+    @patch.object(DbHandler, "_get_stats")
+    def test_get_enroll_times_stats(self, get_stats):
+        """Each metric has its own route"""
+        with TestClient(app) as client:
+            get_stats.return_value = [(1, 3), (2, 1)]
+            response = client.get(f"{self.stats_url}/enroll-times")
+            assert response.status_code == status.HTTP_200_OK
+            assert response.json() == [{"key": 1, "enrollments": 3},
+                                       {"key": 2, "enrollments": 1}]
+            get_stats.assert_called_once_with(STAT_ENROLL_TIMES)
+
+
+class EnrollmentStatsTests(unittest.TestCase):
+    """Test for the enrollment stats statements and command"""
+
+    def test_increment_skips_missing_keys(self):
+        """Keys that are None are not counted, and the counters aren't locked"""
+        statement = enrollment_stats.increment([(STAT_CAREER, 1), (STAT_YEAR, None)])
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        assert "INSERT INTO enrollment_stat_deltas" in sql and "ON CONFLICT" not in sql
+        assert sql.count("%(metric_m") == 1
+        assert enrollment_stats.increment([(STAT_YEAR, None)]) is None
+
+    def test_add_totals(self):
+        """The folded deltas are added to the counters, in key order"""
+        statement = enrollment_stats.add_totals("postgresql", {(STAT_YEAR, 2024): 3,
+                                                               (STAT_CAREER, 2): -1})
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (metric, key) DO UPDATE" in sql
+        assert statement.compile().params["metric_m0"] == STAT_CAREER
+        assert enrollment_stats.add_totals("postgresql", {}) is None
+        with self.assertRaises(NotImplementedError):
+            enrollment_stats.add_totals("mysql", {(STAT_CAREER, 1): 1})
+
+    def test_grouped_counts_cover_every_metric(self):
+        """Every metric can be recomputed and checked"""
+        assert set(enrollment_stats.grouped_counts()) == set(enrollment_stats.STAT_METRICS)
+
+    @patch.object(DbHandler, "close")
+    @patch.object(DbHandler, "_check_stats")
+    def test_check_command_fails_on_mismatch(self, check_stats, close):
+        """The check command exits with 1 when a counter differs"""
+        check_stats.return_value = [(STAT_YEAR, 2024, 3, 2)]
+        with self.assertRaises(SystemExit) as exit_info:
+            stats_cli.main(["check"])
+        assert exit_info.exception.code == 1
+        check_stats.return_value = []
+        with self.assertRaises(SystemExit) as exit_info:
+            stats_cli.main(["check"])
+        assert exit_info.exception.code == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
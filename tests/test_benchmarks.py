@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Benchmark report test"""
+
+import unittest
+
+from benchmarks.bulk_leads import make_leads
+from benchmarks.load_test import EndpointResult, compare_with_baseline, percentile
+
+
+class BenchmarkReportTests(unittest.TestCase):
+    """Test for the load test report helpers"""
+
+    baseline = {"GET /records/": {"throughput_rps": 100.0,
+                                  "p50_ms": 10.0, "p95_ms": 20.0, "p99_ms": 30.0}}
+
+    def test_percentile(self):
+        """Nearest-rank percentiles"""
+        values = [float(value) for value in range(1, 101)]
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([], 95) == 0.0
+
+    def test_summary(self):
+        """Summary reports throughput and latency in milliseconds"""
+        result = EndpointResult(name="GET /leads/", latencies=[0.01, 0.02], elapsed=1.0)
+        summary = result.summary()
+        assert summary["throughput_rps"] == 2.0
+        assert summary["p99_ms"] == 20.0
+
+    def test_no_regression_within_threshold(self):
+        """Small degradations under the threshold are accepted"""
+        results = {"GET /records/": {"throughput_rps": 95.0,
+                                     "p50_ms": 10.5, "p95_ms": 21.0, "p99_ms": 32.0}}
+        assert compare_with_baseline(results, self.baseline, 0.1) == []
+
+    def test_regression_detected(self):
+        """Latency and throughput regressions are reported"""
+        results = {"GET /records/": {"throughput_rps": 50.0,
+                                     "p50_ms": 10.0, "p95_ms": 40.0, "p99_ms": 30.0}}
+        regressions = compare_with_baseline(results, self.baseline, 0.1)
+        assert len(regressions) == 2
+
+    def test_bulk_leads_are_distinct_per_path(self):
+        """Each lead creation path gets its own valid DNIs"""
+        single, bulk = make_leads(100, "S"), make_leads(100, "B")
+        dnis = {lead["dni"] for lead in single + bulk}
+        assert len(dnis) == 200
+        assert max(len(dni) for dni in dnis) <= 20
+
+
+if __name__ == '__main__':
+    unittest.main()
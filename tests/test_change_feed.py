@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Change feed test"""
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+from fastapi.testclient import TestClient
+from starlette import status
+
+from main import app
+from challenge.api.api_records import record_events
+from challenge.constants import CHANGE_FEED_PAGE, DATA_INVALID
+from challenge.core.change_feed import ChangeFeed, sse_event
+from challenge.models.api_models import RetriveLeadRecord
+
+
+def make_record(record_id: int) -> RetriveLeadRecord:
+    return RetriveLeadRecord(id=record_id, dni="12345678", name="pepe", email="pepe@example.com",
+                             phone="+5433333333", address="pepe's house", subject="physics",
+                             class_duration=4, enroll_times=1, career="civil_engineering",
+                             year_enroll=2024)
+
+
+class FakeDbHandler:
+    """Records by ID on interleaved shards, and the change feed of the stream"""
+
+    def __init__(self, record_ids, shards=1):
+        self._change_feed = ChangeFeed(max_buffer=3)
+        self._shards = shards
+        self.records = {record_id: make_record(record_id) for record_id in record_ids}
+        self._get_records_after = AsyncMock(side_effect=self.get_records_after)
+        self._get_records_by_ids = AsyncMock(side_effect=self.get_records_by_ids)
+
+    def _record_shard(self, record_id):
+        return (record_id - 1) % self._shards
+
+    async def get_records_after(self, last_ids, limit):
+        return [self.records[record_id] for record_id in sorted(self.records)
+                if record_id > last_ids[self._record_shard(record_id)]][:limit]
+
+    async def get_records_by_ids(self, record_ids):
+        return [self.records[record_id] for record_id in record_ids if record_id in self.records]
+
+
+class ChangeFeedTests(unittest.TestCase):
+    """Test for the in-process change feed and the record stream"""
+
+    def test_subscribers_get_the_published_ids(self):
+        """Every subscriber gets the IDs published after it subscribed"""
+        async def test():
+            feed = ChangeFeed(max_buffer=10)
+            feed.publish(1)
+            first, second = feed.subscribe(), feed.subscribe()
+            feed.publish(2)
+            feed.publish(3)
+            assert await first.next(1) == ([2, 3], False)
+            assert await second.next(1) == ([2, 3], False)
+            assert await first.next(0.01) == ([], False)
+            feed.unsubscribe(first)
+            assert feed.subscribers == 1
+        asyncio.run(test())
+
+    def test_full_buffer_asks_to_catch_up(self):
+        """A subscriber that falls behind drops its buffer and catches up"""
+        async def test():
+            feed = ChangeFeed(max_buffer=2)
+            subscription = feed.subscribe()
+            for record_id in range(1, 6):
+                feed.publish(record_id)
+            assert await subscription.next(1) == ([], True)
+            feed.publish(6)
+            assert await subscription.next(1) == ([6], False)
+        asyncio.run(test())
+
+    def test_stream_resumes_then_follows_the_feed(self):
+        """The stream sends the missed records, then the published ones, in ID order"""
+        async def test():
+            db_handler = FakeDbHandler(range(1, CHANGE_FEED_PAGE + 6))
+            subscription = db_handler._change_feed.subscribe()
+            events = record_events(db_handler, subscription, last_ids=[2])
+            sent = [await events.__anext__() for _ in range(CHANGE_FEED_PAGE + 3)]
+            assert sent[0] == sse_event("record", make_record(3).model_dump_json(), "3")
+            assert db_handler._get_records_after.await_count == 2
+            # Published during the catch up, or while the client was listening
+            db_handler.records[200] = make_record(200)
+            db_handler.records[199] = make_record(199)
+            for record_id in (CHANGE_FEED_PAGE + 5, 200, 199):
+                db_handler._change_feed.publish(record_id)
+            assert await events.__anext__() == sse_event(
+                "record", make_record(199).model_dump_json(), "199")
+            assert await events.__anext__() == sse_event(
+                "record", make_record(200).model_dump_json(), "200")
+            db_handler._get_records_by_ids.assert_awaited_once_with([199, 200])
+            await events.aclose()
+            assert db_handler._change_feed.subscribers == 0
+        asyncio.run(test())
+
+    def test_stream_heartbeat(self):
+        """A comment is sent when there is nothing new"""
+        async def test():
+            db_handler = FakeDbHandler([])
+            subscription = db_handler._change_feed.subscribe()
+            with patch("challenge.settings.CHANGE_FEED_HEARTBEAT_SECONDS", 0.01):
+                events = record_events(db_handler, subscription, last_ids=[0])
+                assert await events.__anext__() == ": keep-alive\n\n"
+                await events.aclose()
+        asyncio.run(test())
+
+    def test_stream_resumes_on_every_shard(self):
+        """A shard that lags behind is resumed after its own last ID"""
+        async def test():
+            # Shard 0 has IDs 1, 3, 5... and shard 1 has 2, 4, 6...
+            db_handler = FakeDbHandler([1, 2, 4, 6], shards=2)
+            subscription = db_handler._change_feed.subscribe()
+            events = record_events(db_handler, subscription, last_ids=[1, 4])
+            assert await events.__anext__() == sse_event(
+                "record", make_record(6).model_dump_json(), "1,6")
+            # Created later on shard 0, below the greatest ID sent
+            db_handler.records[3] = make_record(3)
+            db_handler._change_feed.publish(3)
+            assert await events.__anext__() == sse_event(
+                "record", make_record(3).model_dump_json(), "3,6")
+            await events.aclose()
+            # A client that reconnects with "1,6" gets it too
+            resumed = record_events(db_handler, db_handler._change_feed.subscribe(), last_ids=[1, 6])
+            assert await resumed.__anext__() == sse_event(
+                "record", make_record(3).model_dump_json(), "3,6")
+            await resumed.aclose()
+        asyncio.run(test())
+
+    def test_stream_invalid_last_event_id(self):
+        """An invalid Last-Event-ID header is rejected"""
+        with TestClient(app) as client:
+            for last_event_id in ("abc", "-1", "1,2"):
+                response = client.get("/records/stream", headers={"Last-Event-ID": last_event_id})
+                assert response.status_code == status.HTTP_406_NOT_ACCEPTABLE
+                assert response.text == f'"{DATA_INVALID}"'
+
+
+if __name__ == '__main__':
+    unittest.main()
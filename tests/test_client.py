@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""Client test, against a mock transport"""
+
+import asyncio
+import json
+import unittest
+from datetime import datetime
+
+import httpx
+
+from challenge.client import ApiRequestError, ChallengeClient, RetryPolicy
+from challenge.models.api_models import CreateLeadModel, RetriveLeadRecord
+
+
+def make_record(record_id: int) -> dict:
+    return {"id": record_id, "dni": "12345678", "name": "pepe", "email": "pepe@example.com",
+            "phone": "+5433333333", "address": "pepe's house", "subject": "physics",
+            "class_duration": 4, "enroll_times": 1, "career": "civil_engineering",
+            "year_enroll": 2024}
+
+
+class FakeApi:
+    """Answers the records router from a list of records, and keeps every request"""
+
+    def __init__(self, record_ids, failures=()):
+        self.records = {record_id: make_record(record_id) for record_id in record_ids}
+        # Status codes of the first answers, before the real ones
+        self.failures = list(failures)
+        self.requests = list()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.failures:
+            return httpx.Response(self.failures.pop(0), json={"detail": "busy"},
+                                  headers={"Retry-After": "0"})
+        params = request.url.params
+        if request.method == "POST":
+            return httpx.Response(200, json={"student_id": 1})
+        if "ids" in params:
+            ids = [int(item) for item in params["ids"].split(",")]
+            return httpx.Response(200, json={
+                "records": [self.records[item] for item in ids if item in self.records],
+                "missing": [item for item in ids if item not in self.records]})
+        if "updated_since" in params:
+            after_id, limit = int(params["after_id"]), int(params["limit"])
+            page = [dict(self.records[item], changed_at=params["updated_since"])
+                    for item in sorted(self.records) if item > after_id][:limit]
+            last_id = page[-1]["id"] if page else after_id
+            return httpx.Response(200, json={
+                "records": page,
+                "next": {"updated_since": params["updated_since"], "after_id": last_id},
+                "has_more": len(page) == limit})
+        start, limit = int(params["start"]), int(params["limit"])
+        return httpx.Response(200, json=[self.records[item] for item in sorted(self.records)]
+                              [start:start + limit])
+
+    def client(self, **kwargs) -> ChallengeClient:
+        return ChallengeClient("http://testserver",
+                               retry=RetryPolicy(retries=2, backoff=0),
+                               transport=httpx.MockTransport(self.handler),
+                               **kwargs)
+
+
+class ClientTests(unittest.TestCase):
+    """Test for the batching, pagination and retries of the client"""
+
+    def test_concurrent_lookups_are_batched(self):
+        """Lookups of the same iteration are sent as one batch request"""
+        async def test():
+            api = FakeApi(range(1, 6))
+            async with api.client() as client:
+                records = await asyncio.gather(*[client.get_record(record_id)
+                                                 for record_id in (3, 1, 3, 5)])
+                assert [record.id for record in records] == [3, 1, 3, 5]
+                assert len(api.requests) == 1
+                assert api.requests[0].url.params["ids"] == "3,1,5"
+                with self.assertRaises(ApiRequestError):
+                    await client.get_record(9)
+        asyncio.run(test())
+
+    def test_records_are_paginated(self):
+        """The iterators request every page, and stop after the last one"""
+        async def test():
+            api = FakeApi(range(1, 8))
+            async with api.client() as client:
+                records = [record.id async for record in client.iter_records(page_size=3)]
+                assert records == list(range(1, 8))
+                assert len(api.requests) == 3
+                changes = [record.id async for record in
+                           client.iter_changes(datetime(2024, 1, 1), after_id=2, page_size=5)]
+                assert changes == [3, 4, 5, 6, 7]
+                assert api.requests[-1].url.params["after_id"] == "7"
+        asyncio.run(test())
+
+    def test_idempotent_calls_are_retried(self):
+        """Reads are retried on transient errors, until the retries run out"""
+        async def test():
+            api = FakeApi([1], failures=[503, 504])
+            async with api.client() as client:
+                assert (await client.get_records()) == [RetriveLeadRecord(**make_record(1))]
+                assert len(api.requests) == 3
+            api = FakeApi([1], failures=[503, 503, 503])
+            async with api.client() as client:
+                with self.assertRaises(ApiRequestError) as error:
+                    await client.get_records()
+                assert error.exception.status_code == 503
+        asyncio.run(test())
+
+    def test_writes_are_not_retried(self):
+        """A write that may have run is not sent again"""
+        async def test():
+            api = FakeApi([], failures=[503])
+            async with api.client() as client:
+                lead = CreateLeadModel(dni="1", name="pepe", email="pepe@example.com",
+                                       phone="555", address="Street")
+                with self.assertRaises(ApiRequestError):
+                    await client.create_lead(lead)
+                assert len(api.requests) == 1
+                assert json.loads(api.requests[0].content)["dni"] == "1"
+        asyncio.run(test())
+
+    def test_rate_limited_writes_are_retried(self):
+        """A rate limited write never ran, so it's sent again"""
+        async def test():
+            api = FakeApi([], failures=[429])
+            async with api.client() as client:
+                lead = CreateLeadModel(dni="1", name="pepe", email="pepe@example.com",
+                                       phone="555", address="Street")
+                assert await client.create_lead(lead) == 1
+                assert len(api.requests) == 2
+        asyncio.run(test())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Concurrency limiter test"""
+
+import asyncio
+import unittest
+import httpx
+from fastapi import FastAPI
+from starlette import status
+
+from challenge.core.concurrency import (AdaptiveLimiter,
+                                        priority,
+                                        HIGH_PRIORITY,
+                                        LOW_PRIORITY)
+from challenge.middleware.concurrency import ConcurrencyLimitMiddleware
+
+
+def make_limiter(limit: int = 1, max_queue: int = 10) -> AdaptiveLimiter:
+    return AdaptiveLimiter(initial_limit=limit, min_limit=1, max_limit=4,
+                           target_latency=0.1, max_queue=max_queue)
+
+
+class AdaptiveLimiterTests(unittest.TestCase):
+    """Test for the adaptive limiter"""
+
+    def test_limit_grows_on_fast_requests(self):
+        """Latency under target increases the limit additively"""
+        async def scenario():
+            limiter = make_limiter(limit=2)
+            for _ in range(10):
+                assert await limiter.acquire(HIGH_PRIORITY, 0.1)
+                limiter.release(0.01)
+            return limiter.limit
+        assert 3 <= asyncio.run(scenario()) <= 4
+
+    def test_limit_shrinks_on_slow_requests(self):
+        """Latency over target decreases the limit multiplicatively"""
+        async def scenario():
+            limiter = make_limiter(limit=4)
+            assert await limiter.acquire(HIGH_PRIORITY, 0.1)
+            limiter.release(1.0)
+            return limiter.limit
+        assert asyncio.run(scenario()) == 3.6
+
+    def test_queue_timeout_sheds(self):
+        """A request that can't get a slot before its deadline is shed"""
+        async def scenario():
+            limiter = make_limiter()
+            assert await limiter.acquire(HIGH_PRIORITY, 0.1)
+            return await limiter.acquire(HIGH_PRIORITY, 0.01)
+        assert asyncio.run(scenario()) is False
+
+    def test_queue_counts_the_waiters(self):
+        """Waiters leave the count when granted, shed or cancelled, and the heap is compacted"""
+        async def scenario():
+            limiter = make_limiter()
+            assert await limiter.acquire(HIGH_PRIORITY, 0.1)
+            shed = [limiter.acquire(HIGH_PRIORITY, 0.01) for _ in range(40)]
+            assert not any(await asyncio.gather(*shed))
+            assert limiter.queued == 0 and len(limiter._waiters) <= 16
+            granted = asyncio.create_task(limiter.acquire(HIGH_PRIORITY, 1))
+            cancelled = asyncio.create_task(limiter.acquire(HIGH_PRIORITY, 1))
+            await asyncio.sleep(0)
+            assert limiter.queued == 2
+            cancelled.cancel()
+            await asyncio.sleep(0)
+            limiter.release(0.01)
+            assert await granted
+            return limiter.queued, limiter.in_flight
+        assert asyncio.run(scenario()) == (0, 1)
+
+    def test_full_queue_sheds(self):
+        """A request is shed right away when the queue is full"""
+        async def scenario():
+            limiter = make_limiter(max_queue=0)
+            assert await limiter.acquire(HIGH_PRIORITY, 0.1)
+            return await limiter.acquire(HIGH_PRIORITY, 10)
+        assert asyncio.run(scenario()) is False
+
+    def test_priority_order(self):
+        """Queued high priority requests get a slot before low priority ones"""
+        async def scenario():
+            limiter = make_limiter()
+            served = list()
+            assert await limiter.acquire(HIGH_PRIORITY, 0.1)
+
+            async def request(name, level):
+                if await limiter.acquire(level, 1):
+                    served.append(name)
+                    limiter.release(0.01)
+
+            low = asyncio.create_task(request("low", LOW_PRIORITY))
+            await asyncio.sleep(0)
+            high = asyncio.create_task(request("high", HIGH_PRIORITY))
+            await asyncio.sleep(0)
+            limiter.release(0.01)
+            await asyncio.gather(low, high)
+            return served
+        assert asyncio.run(scenario()) == ["high", "low"]
+
+
+class ConcurrencyLimitMiddlewareTests(unittest.TestCase):
+    """Test for the concurrency limit middleware"""
+
+    def test_excess_requests_are_shed(self):
+        """Requests over the limit get a 503 with Retry-After"""
+        async def scenario():
+            app = FastAPI()
+            release = asyncio.Event()
+            app.add_middleware(ConcurrencyLimitMiddleware,
+                               limiter=make_limiter(max_queue=0),
+                               queue_timeout=0.01,
+                               retry_after=3,
+                               exempt_paths=["/health"])
+
+            @app.get("/slow")
+            @priority(HIGH_PRIORITY)
+            async def slow():
+                await release.wait()
+                return {}
+
+            @app.get("/health")
+            async def health():
+                return {}
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = asyncio.create_task(client.get("/slow"))
+                await asyncio.sleep(0.05)
+                shed = await client.get("/slow")
+                exempt = await client.get("/health")
+                release.set()
+                return (await first), shed, exempt
+
+        first, shed, exempt = asyncio.run(scenario())
+        assert first.status_code == status.HTTP_200_OK
+        assert shed.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert shed.headers["retry-after"] == "3"
+        assert exempt.status_code == status.HTTP_200_OK
+
+
+if __name__ == '__main__':
+    unittest.main()
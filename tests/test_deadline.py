@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Request deadline test"""
+
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import DBAPIError
+from starlette import status
+
+from main import app
+from challenge.constants import DEADLINE_EXCEEDED
+from challenge.core.db_handler import DbHandler, apply_statement_timeout
+from challenge.core.deadline import deadline_scope, remaining_ms, request_timeout
+from challenge.exceptions import RequestDeadlineExceeded
+from challenge.middleware.deadline import DeadlineMiddleware
+
+
+class Canceled(Exception):
+    """DBAPI error raised by Postgres on statement_timeout"""
+    sqlstate = "57014"
+
+
+class DeadlineTests(unittest.TestCase):
+    """Test for the request deadline"""
+
+    def test_no_deadline(self):
+        """Without deadline there is no time limit"""
+        assert remaining_ms() is None
+
+    def test_remaining_time(self):
+        """Remaining time decreases from the timeout"""
+        with deadline_scope(1):
+            assert 0 < remaining_ms() <= 1000
+
+    def test_expired_deadline(self):
+        """An expired deadline raises"""
+        with deadline_scope(0.001):
+            time.sleep(0.002)
+            with self.assertRaises(RequestDeadlineExceeded):
+                remaining_ms()
+
+    def test_statement_timeout_on_postgres(self):
+        """Each transaction gets the remaining time as statement timeout"""
+        connection = MagicMock()
+        connection.dialect.name = "postgresql"
+        with deadline_scope(2):
+            apply_statement_timeout(None, None, connection)
+        statement = connection.exec_driver_sql.call_args.args[0]
+        assert statement.startswith("SET LOCAL statement_timeout = ")
+        assert 0 < int(statement.rsplit(" ", 1)[1]) <= 2000
+
+    def test_no_statement_timeout_without_deadline(self):
+        """Nothing is set outside a request or on other databases"""
+        connection = MagicMock()
+        connection.dialect.name = "postgresql"
+        apply_statement_timeout(None, None, connection)
+        connection.dialect.name = "sqlite"
+        with deadline_scope(2):
+            apply_statement_timeout(None, None, connection)
+        connection.exec_driver_sql.assert_not_called()
+
+
+class DeadlineMiddlewareTests(unittest.TestCase):
+    """Test for the deadline middleware"""
+
+    deadline_app = FastAPI()
+    deadline_app.add_middleware(DeadlineMiddleware, default_timeout_ms=5000, max_timeout_ms=8000)
+
+    @deadline_app.get("/default")
+    async def default():
+        return remaining_ms()
+
+    @deadline_app.get("/short")
+    @request_timeout(1000)
+    async def short():
+        return remaining_ms()
+
+    def test_default_timeout(self):
+        """Routes without configuration get the default timeout"""
+        with TestClient(self.deadline_app) as client:
+            assert 4000 < client.get("/default").json() <= 5000
+
+    def test_route_timeout(self):
+        """Routes can set their own default timeout"""
+        with TestClient(self.deadline_app) as client:
+            assert 0 < client.get("/short").json() <= 1000
+
+    def test_header_timeout(self):
+        """The client timeout header can only shorten the timeout of the route"""
+        with TestClient(self.deadline_app) as client:
+            response = client.get("/default", headers={"X-Request-Timeout": "3000"})
+            assert 2000 < response.json() <= 3000
+            response = client.get("/short", headers={"X-Request-Timeout": "500"})
+            assert 0 < response.json() <= 500
+            response = client.get("/short", headers={"X-Request-Timeout": "3000"})
+            assert 0 < response.json() <= 1000
+            response = client.get("/default", headers={"X-Request-Timeout": "60000"})
+            assert 4000 < response.json() <= 5000
+
+
+class DeadlineErrorTests(unittest.TestCase):
+    """Test for the deadline errors reported by the API"""
+
+    @patch.object(DbHandler, "_get_all_students", side_effect=RequestDeadlineExceeded)
+    def test_deadline_exceeded(self, get_students):
+        """A request out of time answers 504"""
+        with TestClient(app) as client:
+            response = client.get("/leads")
+            assert response.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+            assert response.json()["detail"] == DEADLINE_EXCEEDED
+
+    @patch.object(DbHandler, "_get_all_students",
+                  side_effect=DBAPIError("SELECT", {}, Canceled("canceled")))
+    def test_statement_timeout(self, get_students):
+        """A statement canceled by statement_timeout answers 504"""
+        with TestClient(app) as client:
+            response = client.get("/leads")
+            assert response.status_code == status.HTTP_504_GATEWAY_TIMEOUT
+
+    @patch.object(DbHandler, "_get_all_students",
+                  side_effect=DBAPIError("SELECT", {}, Exception("broken")))
+    def test_other_database_error(self, get_students):
+        """Other database errors are still unexpected errors"""
+        with TestClient(app, raise_server_exceptions=False) as client:
+            response = client.get("/leads")
+            assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+
+if __name__ == '__main__':
+    unittest.main()
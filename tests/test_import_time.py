@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""Import time test"""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks.import_time import import_times, measure
+from challenge.constants import IMPORT_TIME_BUDGET_MS
+
+
+class ImportTimeTests(unittest.TestCase):
+    """Test for the import time of the application"""
+
+    deferred_modules = ["uvicorn", "asyncpg", "sqlalchemy.ext.asyncio"]
+
+    def test_import_time_budget(self):
+        """Importing main stays within the budget"""
+        budget = float(os.environ.get("IMPORT_TIME_BUDGET_MS", IMPORT_TIME_BUDGET_MS))
+        median_ms, _ = measure("main", runs=3)
+        assert median_ms <= budget, f"import main took {median_ms:.1f} ms, budget {budget} ms"
+
+    def test_deferred_imports(self):
+        """Server, driver and async engine are not imported with main"""
+        times = import_times("main")
+        for module in self.deferred_modules:
+            assert module not in times, f"{module} is imported with main"
+
+    def test_no_file_io_on_import(self):
+        """Importing main doesn't create the log directory"""
+        with tempfile.TemporaryDirectory() as tmp:
+            log_dir = Path(tmp) / "logs"
+            import_times("main", env={"LOG_DIR": str(log_dir)})
+            assert not log_dir.exists()
+
+
+if __name__ == '__main__':
+    unittest.main()
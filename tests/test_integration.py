@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""Integration test, on the real query paths of an in-memory SQLite database"""
+
+import pytest
+import time
+from typing import Iterator
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from starlette import status
+
+from main import app
+from challenge import settings
+from challenge.core.db_handler import DbHandler
+from challenge.core.singleton import Singleton
+from tests.conftest import new_db_handler
+
+
+LEAD_RECORD = {
+    "dni": "87654321",
+    "name": "pepe",
+    "email": "pepe@example.com",
+    "phone": "+5433333333",
+    "address": "pepe's house",
+    "subject": "physics",
+    "enroll_times": 1,
+    "career": "civil_engineering",
+    "year_enroll": 2024,
+}
+
+
+@pytest.fixture
+def client() -> Iterator[TestClient]:
+    """The application on a new in-memory database, with the pre-set data."""
+    db_handler = new_db_handler("sqlite+aiosqlite://")
+    # The tests fold the enrollment stats themselves
+    with patch.dict(Singleton._instances, {DbHandler: db_handler}), \
+         patch.object(settings, "STATS_FOLD_SECONDS", 3600):
+        with TestClient(app) as test_client:
+            # The warm-up queries aren't counted in the budgets of the tests
+            while not test_client.get("/ready").json()["ready"]:
+                time.sleep(0.01)
+            yield test_client
+
+
+@pytest.mark.parametrize("urls", [("mysql+aiomysql://user@localhost/challenge", []),
+                                  ("", ["sqlite+aiosqlite://", "mysql+aiomysql://user@localhost/a"])])
+def test_unsupported_databases_fail_fast(urls):
+    """A database without upserts is refused when the handler is created, not on the first write"""
+    database_url, shard_urls = urls
+    with pytest.raises(ValueError, match="'mysql\\+aiomysql' databases are not supported"):
+        new_db_handler(database_url, shard_urls)
+
+
+def test_load_and_get_records(client, query_budget):
+    """A complete record is created, then read by ID, by page, by batch and with fields"""
+    with query_budget("POST /records/"):
+        response = client.post("/records/", json=LEAD_RECORD)
+    assert response.status_code == status.HTTP_200_OK
+    record_id = response.json()["id"]
+    with query_budget("GET /records/{record_id}"):
+        record = client.get(f"/records/{record_id}").json()
+    assert record == dict(LEAD_RECORD, id=record_id, class_duration=5)
+    with query_budget("GET /records/"):
+        page = client.get("/records/", params={"career": "civil_engineering",
+                                               "year_enroll": 2024}).json()
+    assert page == [record]
+    batch = client.get("/records/", params={"ids": f"{record_id},999"}).json()
+    assert batch == {"records": [record], "missing": [999]}
+    sparse = client.get("/records/", params={"fields": "name,career"}).json()
+    assert sparse == [{"name": "pepe", "career": "civil_engineering"}]
+    # Loading the same record again doesn't duplicate it
+    assert client.post("/records/", json=LEAD_RECORD).json()["id"] == record_id
+
+
+def test_leads(client, query_budget):
+    """Leads are created, looked up, searched and updated in bulk"""
+    lead = {key: LEAD_RECORD[key] for key in ("dni", "name", "email", "phone", "address")}
+    with query_budget("POST /leads/"):
+        student_id = client.post("/leads/", json=lead).json()["student_id"]
+    with query_budget("GET /leads/{register_id}"):
+        assert client.get(f"/leads/{student_id}").json()["dni"] == lead["dni"]
+    with query_budget("GET /leads/"):
+        leads = client.get("/leads/").json()
+    # The pre-set students, and the new one
+    assert len(leads) == 5
+    assert [found["name"] for found in client.get("/leads/search", params={"q": "Alice"}).json()] \
+        == ["Alice Smith"]
+    bulk = client.post("/leads/bulk", json={"leads": [dict(lead, name="Renamed")],
+                                            "on_conflict": "update"}).json()
+    assert bulk["updated"] == 1
+    assert client.get(f"/leads/{student_id}").json()["name"] == "Renamed"
+
+
+def test_bulk_leads_inserted_meanwhile(client):
+    """A lead inserted by another request during the bulk write is counted as updated"""
+    db_handler = DbHandler()
+    leads = [{"dni": dni, "name": "Racing", "email": None, "phone": None, "address": None}
+             for dni in ("55500001", "55500002")]
+
+    racing = ["55500001"]
+
+    def insert_first(connection, cursor, statement, parameters, context, executemany):
+        if racing and statement.startswith("INSERT INTO students"):
+            cursor.execute(f"INSERT INTO students (dni, name) VALUES ('{racing.pop()}', 'Other')")
+
+    event.listen(db_handler._engine.sync_engine, "before_cursor_execute", insert_first)
+    try:
+        result = client.portal.call(db_handler._bulk_create_students, leads, "update")
+    finally:
+        event.remove(db_handler._engine.sync_engine, "before_cursor_execute", insert_first)
+    assert (result["created"], result["updated"]) == (1, 1)
+    assert sorted(result["student_ids"]) == ["55500001", "55500002"]
+
+
+def test_enroll_and_stats(client, query_budget):
+    """Enrollments of a pre-set student are counted in the stats"""
+    with query_budget("POST /enroll/career"):
+        response = client.post("/enroll/career", json={"student_dni": "12345678",
+                                                       "career_name": "electrical_engineering",
+                                                       "year_enroll": 2023})
+    assert response.status_code == status.HTTP_200_OK
+    with query_budget("POST /enroll/subject"):
+        response = client.post("/enroll/subject", json={"student_dni": "12345678",
+                                                        "career_name": "electrical_engineering",
+                                                        "subject_name": "mathematics",
+                                                        "enroll_times": 1})
+    assert response.status_code == status.HTTP_200_OK
+    with query_budget("GET /stats/"):
+        stats = client.get("/stats/").json()
+    assert stats["careers"] == [{"key": "electrical_engineering", "enrollments": 1}]
+    assert stats["years"] == [{"key": 2023, "enrollments": 1}]
+    # The deltas are counted before and after they are folded
+    db_handler = DbHandler()
+    assert client.portal.call(db_handler._fold_stats) == 4
+    assert client.portal.call(db_handler._fold_stats) == 0
+    assert client.get("/stats/").json() == stats
+    assert client.portal.call(db_handler._check_stats) == []
+
+
+def test_incremental_sync(client):
+    """The new records are synced once, after the watermark"""
+    record_id = client.post("/records/", json=LEAD_RECORD).json()["id"]
+    with patch.object(settings, "SYNC_SETTLE_SECONDS", -60):
+        changes = client.get("/records/", params={"updated_since": "2000-01-01T00:00:00"}).json()
+        assert [record["id"] for record in changes["records"]] == [record_id]
+        assert changes["next"]["after_id"] == record_id
+        again = client.get("/records/", params=changes["next"]).json()
+    assert again["records"] == [] and not again["has_more"]
+
+
+def test_expected_errors(client):
+    """Missing rows answer as in Postgres"""
+    assert client.get("/records/999").status_code == status.HTTP_303_SEE_OTHER
+    response = client.post("/records/", json=dict(LEAD_RECORD, career="law"))
+    assert response.status_code == status.HTTP_303_SEE_OTHER
+
+
+def test_health_of_the_in_memory_pool(client):
+    """The in-memory database is a pool of one connection"""
+    health = client.get("/health").json()
+    assert health["pool"]["size"] == 1 and health["pool"]["max_overflow"] == 0
+    # The lag of the event loop is sampled in background
+    assert health["loop"]["samples"] >= 0 and health["loop"]["stalls"] >= 0
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Request loaders test, on an in-memory SQLite database"""
+
+import asyncio
+import unittest
+
+from challenge.core.loaders import current_loaders, loader_scope
+from challenge.core.query_counter import capture_all_queries, instrument_engine
+from challenge.exceptions import StudentDoesNotExist
+from tests.conftest import new_db_handler
+
+
+class RequestLoaderTests(unittest.TestCase):
+    """Test for the batched and memoized lookups by ID"""
+
+    def run_with_handler(self, test):
+        """Run `test(db_handler)` on a new in-memory database with the pre-set data."""
+        db_handler = new_db_handler("sqlite+aiosqlite://")
+
+        async def run():
+            try:
+                await db_handler.create_schema(seed=True)
+                instrument_engine(db_handler._engine)
+                await test(db_handler)
+            finally:
+                await db_handler.close()
+        asyncio.run(run())
+
+    def test_concurrent_lookups_are_one_query(self):
+        """Lookups of the same iteration are a single query, and found rows are memoized"""
+        async def test(db_handler):
+            with loader_scope(db_handler):
+                with capture_all_queries() as counter:
+                    students = await asyncio.gather(*(db_handler._get_student_by_id(student_id)
+                                                      for student_id in (1, 2, 1, 4)))
+                    assert [student.name for student in students] == \
+                        ["Alice Smith", "Bob Johnson", "Alice Smith", "David Brown"]
+                    assert counter.count == 1
+                    await db_handler._get_student_by_id(2)
+                    assert counter.count == 1
+                    subjects = await asyncio.gather(*(db_handler._get_subject_by_id(subject_id)
+                                                      for subject_id in (1, 2, 99)))
+                    assert [subject and subject.name for subject in subjects] == \
+                        ["mathematics", "physics", None]
+                    assert counter.count == 2
+        self.run_with_handler(test)
+
+    def test_missing_rows_are_not_memoized(self):
+        """A student created after a failed lookup is found in the same request"""
+        async def test(db_handler):
+            with loader_scope(db_handler):
+                with self.assertRaises(StudentDoesNotExist):
+                    await db_handler._get_student_by_id(5)
+                student_id = await db_handler._create_student("99999999", "pepe")
+                assert student_id == 5
+                assert (await db_handler._get_student_by_id(5)).name == "pepe"
+            assert current_loaders() is None
+        self.run_with_handler(test)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""Event loop lag monitor test"""
+
+import asyncio
+import logging
+import time
+import unittest
+
+from challenge.core.loop_monitor import LoopLagMonitor, percentile
+
+
+def block_the_loop(seconds: float) -> None:
+    time.sleep(seconds)
+
+
+class LoopLagMonitorTests(unittest.TestCase):
+    """Test for the lag samples and the stall watchdog"""
+
+    logger = logging.getLogger("loop_monitor_test")
+
+    def test_stalls_are_measured_with_their_stack(self):
+        """A blocking call is counted as a stall, and its stack is logged while it blocks"""
+        async def scenario():
+            monitor = LoopLagMonitor(self.logger, interval=0.01, stall_threshold=0.1)
+            task = asyncio.create_task(monitor.run())
+            await asyncio.sleep(0.05)
+            block_the_loop(0.3)
+            await asyncio.sleep(0.05)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return monitor.status()
+
+        with self.assertLogs(self.logger, level="WARNING") as logs:
+            status = asyncio.run(scenario())
+        assert status["stalls"] == 1
+        assert status["max_ms"] >= 250
+        assert status["samples"] >= 5
+        blocked = [line for line in logs.output if "blocked for more than" in line]
+        assert len(blocked) == 1 and "block_the_loop" in blocked[0]
+
+    def test_percentiles(self):
+        values = [i / 1000 for i in range(1, 101)]
+        assert percentile(values, 0.5) == 0.05
+        assert percentile(values, 0.99) == 0.099
+        assert percentile([], 0.99) == 0.0
+        monitor = LoopLagMonitor(self.logger)
+        for lag in values:
+            monitor._lags.append(lag)
+        assert monitor.status()["p95_ms"] == 95.0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""Partition maintenance test"""
+
+import asyncio
+import datetime
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from challenge.core import partitions
+from challenge.cli.partitions import parse_args
+
+
+class FakeConnection:
+    """Postgres connection that records the statements it runs"""
+
+    def __init__(self, partitioned=True, existing=(), version=160000, default_partition=False,
+                 detached=()):
+        self.dialect = MagicMock()
+        self.dialect.name = "postgresql"
+        self.statements = list()
+        self.partitioned = partitioned
+        self.existing = [partitions.partition_name(year) for year in existing]
+        self.version = version
+        self.default_partition = default_partition
+        self.detached = [partitions.partition_name(year) for year in detached]
+
+    async def execute(self, statement, parameters=None):
+        sql = str(statement)
+        self.statements.append(sql)
+        result = MagicMock()
+        if "pg_partitioned_table" in sql and "EXISTS" in sql:
+            result.scalar.return_value = self.partitioned
+        elif "partdefid" in sql:
+            result.scalar.return_value = not self.default_partition
+        elif "server_version_num" in sql:
+            result.scalar.return_value = str(self.version)
+        elif "inhdetachpending" in sql:
+            result.scalar.return_value = False
+        elif "relispartition" in sql:
+            result.__iter__.return_value = iter([(name,) for name in self.detached]
+                                                + [("students",)])
+        elif "relname" in sql:
+            result.__iter__.return_value = iter([(name,) for name in self.existing]
+                                                + [("subject_enrollments_default",)])
+        return result
+
+    async def commit(self):
+        pass
+
+    async def execution_options(self, **options):
+        return self
+
+    def begin(self):
+        transaction = MagicMock()
+        transaction.__aenter__ = AsyncMock()
+        transaction.__aexit__ = AsyncMock(return_value=False)
+        return transaction
+
+
+def fake_engine(connection):
+    engine = MagicMock()
+    engine.connect.return_value.__aenter__ = AsyncMock(return_value=connection)
+    engine.connect.return_value.__aexit__ = AsyncMock(return_value=False)
+    engine.begin.return_value.__aenter__ = AsyncMock(return_value=connection)
+    engine.begin.return_value.__aexit__ = AsyncMock(return_value=False)
+    return engine
+
+
+class PartitionsTests(unittest.TestCase):
+    """Test for the yearly partitions of subject_enrollments"""
+
+    today = datetime.date(2026, 3, 1)
+
+    def test_partition_naming(self):
+        """Partitions are named and bounded by year"""
+        assert partitions.partition_name(2025) == "subject_enrollments_y2025"
+        assert partitions.partition_bounds(2025) == ("2025-01-01", "2026-01-01")
+
+    def test_ensure_creates_missing_partitions(self):
+        """Only the missing partitions of the upcoming years are created"""
+        connection = FakeConnection(existing=[2026])
+        created = asyncio.run(partitions.ensure_partitions(fake_engine(connection), 2,
+                                                           today=self.today))
+        assert created == ["subject_enrollments_y2027", "subject_enrollments_y2028"]
+        attach = [sql for sql in connection.statements if "ATTACH PARTITION" in sql]
+        assert attach[0].endswith("FOR VALUES FROM ('2027-01-01') TO ('2028-01-01')")
+
+    def test_partition_attached_with_bounds_check(self):
+        """The CHECK constraint is added before the attach, to skip its scan"""
+        connection = FakeConnection()
+        asyncio.run(partitions.create_partition(connection, 2027))
+        steps = [sql.split()[0:3] for sql in connection.statements]
+        assert steps[0] == ["SET", "LOCAL", "lock_timeout"]
+        check = next(i for i, sql in enumerate(connection.statements) if "ADD CONSTRAINT" in sql)
+        attach = next(i for i, sql in enumerate(connection.statements) if "ATTACH" in sql)
+        assert check < attach
+        assert "DROP CONSTRAINT subject_enrollments_y2027_bounds" in connection.statements[-1]
+
+    def test_unpartitioned_table_is_left_alone(self):
+        """Nothing is done until the table is partitioned"""
+        connection = FakeConnection(partitioned=False)
+        engine = fake_engine(connection)
+        assert asyncio.run(partitions.ensure_partitions(engine, 2, today=self.today)) == []
+        assert asyncio.run(partitions.archive_partitions(engine, 5, today=self.today)) == []
+        assert not any("ALTER" in sql for sql in connection.statements)
+
+    def test_archive_detaches_old_partitions(self):
+        """Old partitions are detached concurrently and moved to the archive schema"""
+        connection = FakeConnection(existing=[2019, 2020, 2021, 2026])
+        archived = asyncio.run(partitions.archive_partitions(fake_engine(connection), 5,
+                                                             today=self.today))
+        assert archived == ["subject_enrollments_y2019", "subject_enrollments_y2020"]
+        assert ("ALTER TABLE subject_enrollments DETACH PARTITION "
+                "subject_enrollments_y2019 CONCURRENTLY") in connection.statements
+        assert "ALTER TABLE subject_enrollments_y2020 SET SCHEMA archive" in connection.statements
+
+    def test_archive_subtracts_the_stats(self):
+        """Each archived partition, also one left detached, takes its rows out of the stats"""
+        connection = FakeConnection(existing=[2019, 2026], detached=[2018])
+        archived = asyncio.run(partitions.archive_partitions(fake_engine(connection), 5,
+                                                             today=self.today))
+        assert archived == ["subject_enrollments_y2018", "subject_enrollments_y2019"]
+        moves = [i for i, sql in enumerate(connection.statements) if "SET SCHEMA" in sql]
+        deltas = [i for i, sql in enumerate(connection.statements)
+                  if sql.startswith("INSERT INTO enrollment_stat_deltas")]
+        assert [i + 1 for i in moves] == deltas
+        assert "FROM archive.subject_enrollments_y2019" in connection.statements[deltas[1]]
+
+    def test_archive_without_concurrently(self):
+        """Before Postgres 14 the detach is not concurrent"""
+        connection = FakeConnection(existing=[2019], version=130000)
+        asyncio.run(partitions.archive_partitions(fake_engine(connection), 5, today=self.today))
+        assert ("ALTER TABLE subject_enrollments DETACH PARTITION "
+                "subject_enrollments_y2019") in connection.statements
+
+    def test_cli_arguments(self):
+        """The command defaults come from the settings"""
+        args = parse_args(["ensure", "--ahead", "3"])
+        assert (args.command, args.ahead, args.first_year) == ("ensure", 3, None)
+        assert parse_args(["archive"]).keep_years == 5
+
+
+if __name__ == '__main__':
+    unittest.main()
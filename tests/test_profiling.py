@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Request profiling test"""
+
+import pstats
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette import status
+
+from challenge import settings
+from challenge.api import api_admin
+from challenge.core.profiling import ProfileStore
+from challenge.middleware.profiling import ProfilingMiddleware
+
+
+TOKEN = "secret"
+
+
+class ProfilingTests(unittest.TestCase):
+    """Test for the on-demand profiles and their listing"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ProfileStore(self.directory.name, max_files=2)
+        app = FastAPI()
+        app.state.profile_store = self.store
+        app.add_middleware(ProfilingMiddleware, store=self.store, token=TOKEN,
+                           header="X-Profile", sample_rate=0, exempt_prefixes=["/admin/"])
+        app.include_router(api_admin.router, prefix="/admin")
+
+        @app.get("/records/{record_id}")
+        async def get_record(record_id: int):
+            return {"id": record_id}
+
+        self.client = TestClient(app)
+        settings_patch = patch.multiple(settings, PROFILING_TOKEN=TOKEN, PROFILING_HEADER="X-Profile")
+        settings_patch.start()
+        self.addCleanup(settings_patch.stop)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_only_requests_with_the_token_are_profiled(self):
+        """The profile is saved with its route and latency, and its ID is returned"""
+        assert "x-profile-id" not in self.client.get("/records/1").headers
+        assert "x-profile-id" not in self.client.get("/records/1", headers={"X-Profile": "guess"}).headers
+        assert list(Path(self.directory.name).iterdir()) == []
+        response = self.client.get("/records/1", headers={"X-Profile": TOKEN})
+        assert response.json() == {"id": 1}
+        [profile] = self.store.list()
+        assert response.headers["x-profile-id"] == profile.id
+        assert (profile.method, profile.route) == ("GET", "records_{record_id}")
+        # A readable pstats file
+        pstats.Stats(str(Path(self.directory.name) / profile.file_name))
+
+    def test_profiles_are_saved_off_the_event_loop(self):
+        """The profile file is written from another thread than the one of the requests"""
+        threads = list()
+        save = self.store.save
+
+        def save_in_thread(*args):
+            threads.append(threading.current_thread())
+            return save(*args)
+
+        @self.client.app.get("/thread")
+        async def request_thread():
+            threads.append(threading.current_thread())
+
+        with patch.object(self.store, "save", save_in_thread):
+            self.client.get("/thread", headers={"X-Profile": TOKEN})
+        request, saving = threads
+        assert saving is not request
+        assert len(self.store.list()) == 1
+
+    def test_profiles_are_listed_and_bounded(self):
+        """Only the newest profiles are kept, and they are listed with the token"""
+        ids = [self.client.get(f"/records/{record_id}", headers={"X-Profile": TOKEN})
+               .headers["x-profile-id"] for record_id in range(3)]
+        listing = self.client.get("/admin/profiles", headers={"X-Profile": TOKEN})
+        assert listing.status_code == status.HTTP_200_OK
+        assert [profile["id"] for profile in listing.json()] == ids[:0:-1]
+        download = self.client.get(f"/admin/profiles/{ids[-1]}", headers={"X-Profile": TOKEN})
+        assert download.status_code == status.HTTP_200_OK and download.content
+        missing = self.client.get(f"/admin/profiles/{ids[0]}", headers={"X-Profile": TOKEN})
+        assert missing.status_code == status.HTTP_404_NOT_FOUND
+        assert self.client.get("/admin/profiles").status_code == status.HTTP_403_FORBIDDEN
+
+
+if __name__ == '__main__':
+    unittest.main()
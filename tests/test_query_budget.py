@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Query budget test"""
+
+import pytest
+import unittest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from starlette import status
+
+from challenge.core.query_counter import (count_queries,
+                                          capture_all_queries,
+                                          instrument_engine)
+from challenge.middleware.query_budget import QueryBudgetMiddleware
+
+
+engine = create_engine("sqlite://")
+instrument_engine(engine)
+
+def run_statements(times: int) -> None:
+    """Run the same statement several times with different parameters."""
+    with engine.connect() as connection:
+        for value in range(times):
+            connection.execute(text("SELECT :value"), {"value": value})
+
+
+class QueryCounterTests(unittest.TestCase):
+    """Test for the statement counter"""
+
+    def test_count_statements(self):
+        """Statements run inside the context are counted"""
+        with count_queries() as counter:
+            run_statements(2)
+        assert counter.count == 2
+
+    def test_statements_outside_context_are_ignored(self):
+        """Statements run after the context is closed are not counted"""
+        with count_queries() as counter:
+            pass
+        run_statements(2)
+        assert counter.count == 0
+
+    def test_repeated_statements(self):
+        """Same statement with different parameters is reported as N+1"""
+        with count_queries() as counter:
+            run_statements(3)
+        assert list(counter.repeated_statements(3).values()) == [3]
+        assert counter.repeated_statements(4) == {}
+
+    def test_instrument_engine_twice(self):
+        """Instrumenting twice doesn't count statements twice"""
+        instrument_engine(engine)
+        with capture_all_queries() as counter:
+            run_statements(1)
+        assert counter.count == 1
+
+
+class QueryBudgetMiddlewareTests(unittest.TestCase):
+    """Test for the query budget middleware"""
+
+    app = FastAPI()
+    app.add_middleware(QueryBudgetMiddleware, budgets={"GET /items": 2})
+
+    @app.get("/items")
+    def get_items(times: int = 1):
+        run_statements(times)
+        return []
+
+    def test_query_count_header(self):
+        """Response reports the number of statements run"""
+        with TestClient(self.app) as client:
+            response = client.get("/items", params={"times": 2})
+            assert response.status_code == status.HTTP_200_OK
+            assert response.headers["x-query-count"] == "2"
+
+    def test_budget_exceeded_is_logged(self):
+        """A route over its budget logs a warning"""
+        with TestClient(self.app) as client:
+            with self.assertLogs(level="WARNING") as logs:
+                client.get("/items", params={"times": 3})
+        assert any("Query budget exceeded on 'GET /items'" in line
+                   for line in logs.output)
+        assert any("Possible N+1" in line for line in logs.output)
+
+
+def test_query_budget_fixture(query_budget):
+    """The fixture fails when the budget is exceeded"""
+    with query_budget("GET /items", budget=2):
+        run_statements(2)
+    with pytest.raises(AssertionError):
+        with query_budget("GET /items", budget=1):
+            run_statements(2)
+
+
+if __name__ == '__main__':
+    unittest.main()
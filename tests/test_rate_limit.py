@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Rate limit test"""
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from starlette import status
+
+from challenge.core.rate_limit import (IMPORT_ROUTES,
+                                       MemoryBucketStore,
+                                       RateLimit,
+                                       SQLiteBucketStore,
+                                       parse_limits,
+                                       rate_limit_class)
+from challenge.middleware.rate_limit import RateLimitMiddleware
+
+
+LIMIT = RateLimit(rate=1, burst=2)
+
+
+class BucketStoreTests(unittest.TestCase):
+    """Test for the token buckets of each store"""
+
+    def check_bucket(self, store):
+        """A bucket allows its burst, then refills at its rate"""
+        assert store.take("a", LIMIT, now=100).allowed
+        assert store.take("a", LIMIT, now=100).remaining == 0
+        refused = store.take("a", LIMIT, now=100.5)
+        assert not refused.allowed and refused.retry_after == 0.5
+        # Other clients have their own bucket
+        assert store.take("b", LIMIT, now=100.5).allowed
+        assert store.take("a", LIMIT, now=101).allowed
+
+    def test_memory_store(self):
+        self.check_bucket(MemoryBucketStore())
+
+    def test_sqlite_store_is_shared(self):
+        """The workers that open the same file share the buckets"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / "buckets.db")
+            self.check_bucket(SQLiteBucketStore(path))
+            other_worker = SQLiteBucketStore(path)
+            assert not other_worker.take("a", LIMIT, now=101).allowed
+            # The middleware takes the tokens in a thread, off the event loop
+            assert asyncio.run(other_worker.take_async("c", LIMIT)).remaining == 1
+            other_worker.close()
+
+    def test_memory_is_bounded(self):
+        """The least recently used client is dropped, and starts again full"""
+        store = MemoryBucketStore(max_buckets=2)
+        for key in ("a", "b", "a", "c"):
+            store.take(key, LIMIT, now=0)
+        assert len(store) == 2
+        # "b" was dropped for "c", then "a" for "b"
+        assert store.take("b", LIMIT, now=0).remaining == 1
+        assert store.take("c", LIMIT, now=0).remaining == 0
+        assert store.take("a", LIMIT, now=0).remaining == 1
+
+    def test_parse_limits(self):
+        assert parse_limits("read=50:100, import=0.5:2") == {
+            "read": RateLimit(rate=50, burst=100), "import": RateLimit(rate=0.5, burst=2)}
+        with self.assertRaises(ValueError):
+            parse_limits("read=50")
+        with self.assertRaises(ValueError):
+            parse_limits("read=0:10")
+
+
+class RateLimitMiddlewareTests(unittest.TestCase):
+    """Test for the rate limit middleware"""
+
+    def test_clients_over_the_limit_get_429(self):
+        """Each client and route class has its own bucket, with the RateLimit headers"""
+        async def scenario():
+            app = FastAPI()
+            app.add_middleware(RateLimitMiddleware,
+                               store=MemoryBucketStore(),
+                               limits={"read": RateLimit(rate=0.01, burst=5),
+                                       IMPORT_ROUTES: RateLimit(rate=0.01, burst=1)},
+                               key_header="X-API-Key",
+                               api_keys=["integration", "web"],
+                               exempt_paths=["/health"])
+
+            @app.post("/records")
+            @rate_limit_class(IMPORT_ROUTES)
+            async def load():
+                return {}
+
+            @app.get("/records")
+            async def read():
+                return {}
+
+            @app.post("/other")
+            async def other():
+                return {}
+
+            @app.get("/health")
+            async def health():
+                return {}
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = await client.post("/records", headers={"X-API-Key": "integration"})
+                limited = await client.post("/records", headers={"X-API-Key": "integration"})
+                other_client = await client.post("/records", headers={"X-API-Key": "web"})
+                # Unknown keys share the bucket of the IP address
+                forged = [await client.post("/records", headers={"X-API-Key": f"forged-{n}"})
+                          for n in range(2)]
+                read = await client.get("/records", headers={"X-API-Key": "integration"})
+                # The write class has no limits
+                unlimited = [await client.post("/other") for _ in range(3)]
+                exempt = [await client.get("/health") for _ in range(3)]
+                return first, limited, other_client, forged, read, unlimited, exempt
+
+        first, limited, other_client, forged, read, unlimited, exempt = asyncio.run(scenario())
+        assert first.status_code == status.HTTP_200_OK
+        assert first.headers["ratelimit-limit"] == "1"
+        assert first.headers["ratelimit-remaining"] == "0"
+        assert limited.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+        assert limited.headers["retry-after"] == "100"
+        assert other_client.status_code == status.HTTP_200_OK
+        assert [response.status_code for response in forged] == \
+            [status.HTTP_200_OK, status.HTTP_429_TOO_MANY_REQUESTS]
+        assert read.status_code == status.HTTP_200_OK
+        assert read.headers["ratelimit-remaining"] == "4"
+        assert all(response.status_code == status.HTTP_200_OK for response in unlimited + exempt)
+        assert "ratelimit-limit" not in exempt[0].headers
+
+
+if __name__ == '__main__':
+    unittest.main()
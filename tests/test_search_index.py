@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Lead search index test"""
+
+import unittest
+
+from challenge.core.search_index import LeadSearchIndex, similarity, trigrams
+from challenge.models.sql_models import Student
+
+
+def student(student_id: int, dni: str, name: str, email: str) -> Student:
+    return Student(student_id=student_id, dni=dni, name=name, email=email,
+                   phone="555", address="street")
+
+
+class LeadSearchIndexTests(unittest.TestCase):
+    """Test for the in-memory lead search index"""
+
+    students = [
+        student(1, "12345678", "Alice Smith", "alice.smith@example.com"),
+        student(2, "23456789", "Bob Johnson", "bob.johnson@example.com"),
+        student(3, "34567890", "Alicia Smithers", "asmithers@example.com"),
+        student(4, "11111111", "Carol Williams", "carol@example.com"),
+    ]
+
+    def test_trigrams_like_pg_trgm(self):
+        """Words are padded and lowercased"""
+        assert trigrams("Cat") == {"  c", " ca", "cat", "at "}
+        assert similarity(trigrams("smith"), trigrams("smith")) == 1.0
+
+    def test_exact_dni_first(self):
+        """Exact DNI match is ranked first"""
+        index = LeadSearchIndex(self.students)
+        results = index.search("23456789", limit=5)
+        assert results[0].student_id == 2
+
+    def test_prefix_search(self):
+        """Name and email prefixes match, case insensitive"""
+        index = LeadSearchIndex(self.students)
+        assert [s.student_id for s in index.search("ali", limit=5)][:2] == [1, 3]
+        assert [s.student_id for s in index.search("CAROL@", limit=5)] == [4]
+
+    def test_fuzzy_search(self):
+        """Typos still match by trigram similarity"""
+        index = LeadSearchIndex(self.students)
+        assert index.search("jonson", limit=5)[0].student_id == 2
+
+    def test_limit_and_no_match(self):
+        """Results are limited, unrelated queries return nothing"""
+        index = LeadSearchIndex(self.students)
+        assert len(index.search("example", limit=2)) == 2
+        assert index.search("zzzz", limit=5) == []
+
+    def test_add(self):
+        """Students added later are found"""
+        index = LeadSearchIndex(self.students)
+        index.add(student(5, "99999999", "Zoe Zimmer", "zoe@example.com"))
+        assert index.search("zoe", limit=5)[0].student_id == 5
+
+
+if __name__ == '__main__':
+    unittest.main()
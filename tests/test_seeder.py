@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Synthetic data seeder test"""
+
+import datetime
+import unittest
+from collections import Counter
+from unittest.mock import patch
+
+from challenge.cli.seeder import SeedSpec, generate_catalog, generate_student_batch
+from challenge.core.db_handler import DbHandler, database_dsn
+
+
+class SeederTests(unittest.TestCase):
+    """Test for the synthetic data generation"""
+
+    spec = SeedSpec(students=250, careers=5, subjects=20, subjects_per_career=6,
+                    batch_size=100, seed=7)
+
+    def test_catalog_cardinalities(self):
+        """Catalog has the requested amount of rows and unique names"""
+        catalog = generate_catalog(self.spec)
+        assert len(catalog.careers) == 5
+        assert len(catalog.subjects) == 20
+        assert len(catalog.career_subjects) == 5 * 6
+        assert len({name for _, name in catalog.careers}) == 5
+        assert len({name for _, name, _ in catalog.subjects}) == 20
+
+    def test_catalog_skips_taken_names(self):
+        """Existing names and ID offsets are respected"""
+        taken = [name for _, name in generate_catalog(self.spec).careers]
+        catalog = generate_catalog(self.spec, career_offset=10, taken_names=taken)
+        assert not set(taken) & {name for _, name in catalog.careers}
+        assert catalog.careers[0][0] == 11
+
+    def test_batches_are_deterministic(self):
+        """Same seed and batch index produce the same rows"""
+        subjects_by_career = generate_catalog(self.spec).subjects_by_career()
+        first = generate_student_batch(self.spec, subjects_by_career, 0, 1)
+        second = generate_student_batch(self.spec, subjects_by_career, 0, 1)
+        assert first == second
+
+    def test_batches_cover_every_student_once(self):
+        """Batches split the students without overlapping"""
+        subjects_by_career = generate_catalog(self.spec).subjects_by_career()
+        student_ids = list()
+        for batch_index in range(3):
+            students, _, _ = generate_student_batch(self.spec, subjects_by_career, 4, batch_index)
+            student_ids.extend(row[0] for row in students)
+        assert student_ids == list(range(5, 255))
+
+    def test_skew(self):
+        """Most popular subject of a career gets the most enrollments"""
+        subjects_by_career = generate_catalog(self.spec).subjects_by_career()
+        _, _, enrollments = generate_student_batch(self.spec, subjects_by_career, 0, 0)
+        popularity = Counter(row[1] for row in enrollments)
+        career_id = next(iter(subjects_by_career))
+        first, *rest = subjects_by_career[career_id]
+        assert all(popularity[first] >= popularity[other] for other in rest)
+
+    def test_enrollments_are_unique_and_past(self):
+        """No two enrollments share their key, and none is dated after the last year"""
+        spec = SeedSpec(batch_size=2000)
+        subjects_by_career = generate_catalog(spec).subjects_by_career()
+        _, student_careers, enrollments = generate_student_batch(spec, subjects_by_career, 0, 0)
+        keys = Counter(row[:3] for row in enrollments)
+        assert keys.most_common(1)[0][1] == 1
+        latest = datetime.datetime(spec.last_year + 1, 1, 1)
+        assert all(row[3] < latest for row in student_careers + enrollments)
+
+    def test_database_dsn_is_the_one_of_the_api(self):
+        """The seeder loads the database of the DbHandler, and refuses shards"""
+        with patch.object(DbHandler(), "_database_urls",
+                          ["postgresql+asyncpg://user:secret@db:6543/leads"]):
+            assert database_dsn() == "postgresql://user:secret@db:6543/leads"
+        for urls in (["postgresql+asyncpg://db1/leads", "postgresql+asyncpg://db2/leads"],
+                     ["sqlite+aiosqlite://"]):
+            with patch.object(DbHandler(), "_database_urls", urls), self.assertRaises(ValueError):
+                database_dsn()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""Sharding test, on several local SQLite databases"""
+
+import asyncio
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+from sqlalchemy import insert
+
+from challenge import settings
+from challenge.core import sharding
+from challenge.constants import BULK_REPORT, BULK_UPDATE, STAT_CAREER, STAT_YEAR
+from challenge.exceptions import StudentDoesNotExist
+from challenge.models.sql_models import (Base,
+                                         Student,
+                                         Career,
+                                         Subject,
+                                         StudentCareer,
+                                         CareerSubject,
+                                         SubjectEnrollment,
+                                         EnrollmentStat)
+from tests.conftest import new_db_handler
+
+
+SHARDS = 3
+
+
+class ShardRouterTests(unittest.TestCase):
+    """Test for the routing of DNIs and IDs"""
+
+    router = sharding.ShardRouter(SHARDS)
+
+    def test_shard_for_dni_is_stable(self):
+        """The shard of a DNI doesn't depend on the process"""
+        assert self.router.shard_for_dni("12345678") == 0
+        assert {self.router.shard_for_dni(f"{dni}") for dni in range(100)} == {0, 1, 2}
+
+    def test_shard_for_id(self):
+        """Interleaved IDs belong to the shard of their sequence"""
+        assert [self.router.shard_for_id(row_id) for row_id in range(1, 7)] == [0, 1, 2, 0, 1, 2]
+        assert self.router.group_ids([5, 1, 4, 3]) == {1: [5], 0: [1, 4], 2: [3]}
+
+    def test_aligned_start(self):
+        """Sequences restart at the next ID of their shard"""
+        assert sharding.aligned_start(0, 0, SHARDS) == 1
+        assert sharding.aligned_start(0, 2, SHARDS) == 3
+        assert sharding.aligned_start(7, 0, SHARDS) == 10
+        assert sharding.aligned_start(7, 1, SHARDS) == 8
+
+
+class ShardedDbHandlerTests(unittest.TestCase):
+    """Test for the DbHandler with students sharded across several databases"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        urls = [f"sqlite+aiosqlite:///{Path(self.directory.name) / f'shard{shard}.db'}"
+                for shard in range(SHARDS)]
+        self.db_handler = new_db_handler(shard_urls=urls)
+        self.router = self.db_handler._router
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_with_shards(self, test):
+        async def run():
+            try:
+                await self.create_shards()
+                await test()
+            finally:
+                await self.db_handler.close()
+        asyncio.run(run())
+
+    async def create_shards(self):
+        """Reference tables on every shard, and 12 students with one record each on theirs."""
+        for engine in self.db_handler._engines:
+            async with engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+                await connection.execute(insert(Career), [{"id": 1, "name": "civil_engineering"}])
+                await connection.execute(insert(Subject), [{"id": 1, "name": "physics",
+                                                            "class_duration": 4}])
+                await connection.execute(insert(CareerSubject), [{"id": 1, "career_id": 1,
+                                                                  "subject_id": 1}])
+        next_ids = list(range(1, SHARDS + 1))
+        for index in range(12):
+            dni = f"{index:08d}"
+            shard = self.router.shard_for_dni(dni)
+            row_id = next_ids[shard]
+            next_ids[shard] += SHARDS
+            async with self.db_handler._engines[shard].begin() as connection:
+                await connection.execute(insert(Student).values(
+                    student_id=row_id, dni=dni, name=f"Student {index}", email=f"s{index}@mail.com",
+                    phone="555", address="Street", date=datetime(2024, 1, 1)))
+                await connection.execute(insert(StudentCareer).values(
+                    id=row_id, student_id=row_id, career_id=1, year_enroll=2020 + index % 2,
+                    date=datetime(2024, 1, 1)))
+                await connection.execute(insert(SubjectEnrollment).values(
+                    id=row_id, student_id=row_id, career_subject_id=1, enroll_times=1,
+                    date=datetime(2024, 1, 1)))
+        await self.db_handler._recompute_stats()
+
+    def test_records_pages_are_merged_in_id_order(self):
+        """Every page of records is the same as with a single database"""
+        async def test():
+            records = await self.db_handler._get_records(0, 100)
+            ids = [record.id for record in records]
+            assert ids == sorted(ids) and len(ids) == 12
+            for start, limit in ((0, 5), (5, 5), (10, 5), (3, 4)):
+                page = await self.db_handler._get_records(start, limit)
+                assert [record.id for record in page] == ids[start:start + limit]
+            sparse = await self.db_handler._get_records(2, 3, fields=["name"])
+            assert [record["id"] for record in sparse] == ids[2:5]
+            filtered = await self.db_handler._get_records(1, 2, year_enroll=2021)
+            expected = [record.id for record in records if record.year_enroll == 2021][1:3]
+            assert [record.id for record in filtered] == expected
+        self.run_with_shards(test)
+
+    def test_changed_records_are_merged_in_watermark_order(self):
+        """The changes of every shard are synced once, in (changed at, ID) order"""
+        async def test():
+            watermark = (datetime(2000, 1, 1), 0)
+            synced = list()
+            while True:
+                page = await self.db_handler._get_changed_records(*watermark, limit=5)
+                synced.extend(page)
+                if page:
+                    watermark = (page[-1].changed_at, page[-1].id)
+                if len(page) < 5:
+                    break
+            # Every record changed at the same time, so they are in ID order
+            ids = [record.id for record in await self.db_handler._get_records(0, 100)]
+            assert [record.id for record in synced] == ids
+            assert await self.db_handler._get_changed_records(*watermark, 5) == []
+            # Updating a student changes its records
+            leads = [{"dni": "00000005", "name": "Renamed", "email": None,
+                      "phone": None, "address": None}]
+            await self.db_handler._bulk_create_students(leads, on_conflict=BULK_UPDATE)
+            with patch.object(settings, "SYNC_SETTLE_SECONDS", -60):
+                changed = await self.db_handler._get_changed_records(*watermark, 5, fields=["name"])
+            assert [record["name"] for record in changed] == ["Renamed"]
+        self.run_with_shards(test)
+
+    def test_records_after_a_cursor_of_every_shard(self):
+        """A record created on a shard that lags behind is after the cursor"""
+        async def test():
+            last_ids = await self.db_handler._get_last_record_ids()
+            assert len(last_ids) == SHARDS
+            assert await self.db_handler._get_records_after(last_ids, 10) == []
+            # The next ID of the shard with the fewest records is below the greatest ID
+            shard = last_ids.index(min(last_ids))
+            new_id = last_ids[shard] + SHARDS
+            assert new_id < max(last_ids)
+            async with self.db_handler._engines[shard].begin() as connection:
+                await connection.execute(insert(SubjectEnrollment).values(
+                    id=new_id, student_id=last_ids[shard], career_subject_id=1, enroll_times=2,
+                    date=datetime(2024, 1, 2)))
+            [record] = await self.db_handler._get_records_after(last_ids, 10)
+            assert record.id == new_id and self.db_handler._record_shard(new_id) == shard
+            page = await self.db_handler._get_records_after([0] * SHARDS, 5)
+            assert [record.id for record in page] == [1, 2, 3, 4, 5]
+            page = await self.db_handler._get_records_after([0] * SHARDS, 5, fields=["dni"])
+            assert [record["id"] for record in page] == [1, 2, 3, 4, 5]
+        self.run_with_shards(test)
+
+    def test_routed_lookups(self):
+        """Lookups by DNI and by ID reach the shard of the student"""
+        async def test():
+            records = await self.db_handler._get_records(0, 100)
+            for record in records:
+                student_id = await self.db_handler._get_student_id_by_dni(record.dni)
+                assert self.router.shard_for_dni(record.dni) == self.router.shard_for_id(student_id)
+                assert (await self.db_handler._get_student_by_id(student_id)).dni == record.dni
+                assert await self.db_handler._build_record_by_id(record.id) == record
+            with self.assertRaises(StudentDoesNotExist):
+                await self.db_handler._get_student_id_by_dni("missing")
+            batch = await self.db_handler._get_records_by_ids([record.id for record in records])
+            assert sorted(batch, key=lambda record: record.id) == records
+            students = await self.db_handler._get_students_by_ids([1, 2, 3, 1000])
+            assert sorted(student.student_id for student in students) == [1, 2, 3]
+        self.run_with_shards(test)
+
+    def test_writes_are_routed_by_dni(self):
+        """New students and bulk leads are written on the shard of their DNI"""
+        async def test():
+            await self.db_handler._create_student(dni="new-student", name="New")
+            leads = [{"dni": f"bulk{index}", "name": "Bulk", "email": None,
+                      "phone": None, "address": None} for index in range(6)]
+            leads.append({"dni": "00000000", "name": "Repeated", "email": None,
+                          "phone": None, "address": None})
+            result = await self.db_handler._bulk_create_students(leads, on_conflict=BULK_REPORT)
+            assert result["created"] == 6
+            assert result["conflicts"] == ["00000000"]
+            for dni in ["new-student"] + [lead["dni"] for lead in leads]:
+                shard = self.router.shard_for_dni(dni)
+                students = await sharding.run_on_shard(shard, self.db_handler._select_all_students)
+                assert dni in {student.dni for student in students}
+            assert len(await self.db_handler._get_all_students()) == 19
+            for dni, student_id in result["student_ids"].items():
+                assert self.router.shard_for_id(student_id) == self.router.shard_for_dni(dni)
+        self.run_with_shards(test)
+
+    def test_new_rows_are_read_back_by_id(self):
+        """The IDs given by the shards without sequences are interleaved"""
+        async def test():
+            for index in range(SHARDS * 2):
+                dni = f"new{index}"
+                student_id = await self.db_handler._create_student(
+                    dni=dni, name="New", email="new@mail.com", phone="555", address="Street")
+                assert self.router.shard_for_id(student_id) == self.router.shard_for_dni(dni)
+                assert (await self.db_handler._get_student_by_id(student_id)).dni == dni
+                career_enrollment_id = await self.db_handler._enroll_student_in_a_career(
+                    student_id, 1, 2024)
+                assert self.router.shard_for_id(career_enrollment_id) == \
+                    self.router.shard_for_dni(dni)
+                record_id = await self.db_handler._enroll_student_in_a_subject(student_id, 1, 1)
+                enrollment = await self.db_handler._get_subject_enrollment_by_id(record_id)
+                assert enrollment.student_id == student_id
+                assert (await self.db_handler._build_record_by_id(record_id)).dni == dni
+        self.run_with_shards(test)
+
+    def test_stats_and_search_span_every_shard(self):
+        """Counters are added up and the search covers every shard"""
+        async def test():
+            assert await self.db_handler._get_stats(STAT_CAREER) == [("civil_engineering", 12)]
+            assert await self.db_handler._get_stats(STAT_YEAR) == [(2020, 6), (2021, 6)]
+            assert await self.db_handler._check_stats() == []
+            found = await self.db_handler._search_students("Student", 20)
+            assert len(found) == 12
+            for engine in self.db_handler._engines:
+                async with engine.begin() as connection:
+                    await connection.execute(insert(EnrollmentStat).values(
+                        metric=STAT_YEAR, key=1999, total=1))
+            assert len(await self.db_handler._check_stats()) == SHARDS
+        self.run_with_shards(test)
+
+    def test_reference_tables_sync(self):
+        """The reference tables of the first shard are copied to the others"""
+        async def test():
+            source, target = self.db_handler._engines[:2]
+            async with source.begin() as connection:
+                await connection.execute(insert(Career).values(id=2, name="law"))
+            assert (await sharding.reference_counts(target))["careers"] == 1
+            assert await sharding.copy_reference_tables(source, target) == 4
+            assert (await sharding.reference_counts(target)) == (
+                await sharding.reference_counts(source))
+        self.run_with_shards(test)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Columnar snapshot export test"""
+
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+from challenge.cli import export as export_cli
+from challenge.core.db_handler import DbHandler
+from challenge.core.snapshot import Snapshot, SnapshotWriter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def make_record(record_id: int, career: str = "civil_engineering", email=None) -> dict:
+    return {"id": record_id, "dni": str(10_000_000 + record_id), "name": f"Student {record_id}",
+            "email": email, "phone": "555-1111", "address": "Calle ñandú 123",
+            "subject": "physics", "class_duration": 5, "enroll_times": record_id % 3 + 1,
+            "career": career, "year_enroll": 2020 + record_id % 5}
+
+
+class SnapshotTests(unittest.TestCase):
+    """Test for the columnar files and the incremental export"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "records"
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_columns_are_read_back(self):
+        """Every column is read back from the mapped files"""
+        writer = SnapshotWriter(self.path)
+        writer.append([make_record(1), make_record(2, "law", "a@example.com")])
+        writer.append([make_record(5)])
+        snapshot = Snapshot(self.path)
+        assert snapshot.rows == 3 and snapshot.last_ids == [5]
+        assert list(snapshot.column("id")) == [1, 2, 5]
+        assert list(snapshot.column("year_enroll")) == [2021, 2022, 2020]
+        careers = snapshot.categories("career")
+        assert [careers[code] for code in snapshot.column("career")] == \
+            ["civil_engineering", "law", "civil_engineering"]
+        assert snapshot.strings("address") == ["Calle ñandú 123"] * 3
+        # Missing values are stored empty
+        assert snapshot.strings("email") == ["", "a@example.com", ""]
+
+    def test_appends_continue_after_the_last_id(self):
+        """Records must come after the last exported ID, and uncommitted bytes are dropped"""
+        writer = SnapshotWriter(self.path)
+        writer.append([make_record(1), make_record(2)])
+        with self.assertRaises(ValueError):
+            writer.append([make_record(2)])
+        # An interrupted chunk, written without its manifest
+        with open(self.path / "id.bin", "ab") as file:
+            file.write(b"\x07" * 8)
+        with open(self.path / "name.bin", "ab") as file:
+            file.write(b"lost")
+        writer = SnapshotWriter(self.path)
+        writer.append([make_record(3)])
+        snapshot = Snapshot(self.path)
+        assert list(snapshot.column("id")) == [1, 2, 3]
+        assert snapshot.strings("name") == ["Student 1", "Student 2", "Student 3"]
+        assert Snapshot(SnapshotWriter(self.path, truncate=True).path).rows == 0
+
+    def test_appends_continue_after_the_last_id_of_every_shard(self):
+        """A shard that lags behind can append records with lower IDs than the others"""
+        writer = SnapshotWriter(self.path, shards=3)
+        writer.append([make_record(1), make_record(2), make_record(6)])
+        writer.append([make_record(4), make_record(9)])
+        assert Snapshot(self.path).last_ids == [4, 2, 9]
+        with self.assertRaises(ValueError):
+            writer.append([make_record(3)])
+        # The cursors are bound to the number of shards
+        with self.assertRaises(ValueError):
+            SnapshotWriter(self.path)
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_columns_as_numpy_arrays(self):
+        """Integer columns are memory-mapped NumPy arrays"""
+        SnapshotWriter(self.path).append([make_record(record_id) for record_id in range(1, 11)])
+        enroll_times = Snapshot(self.path).array("enroll_times")
+        assert isinstance(enroll_times, numpy.memmap)
+        assert int((enroll_times == 1).sum()) == 3
+
+    def test_export_streams_chunks_after_the_watermark(self):
+        """The export reads chunks after the last exported ID of every shard, until a chunk is empty"""
+        pages = [[make_record(1), make_record(2)], [make_record(4)], []]
+        with patch.object(DbHandler, "_get_records_after",
+                          new=AsyncMock(side_effect=pages)) as get_records_after, \
+             patch.object(DbHandler, "close", new=AsyncMock()):
+            exported = asyncio.run(export_cli.export(SnapshotWriter(self.path, shards=2),
+                                                     chunk_size=2))
+        assert exported == 3
+        assert [call.args[0] for call in get_records_after.call_args_list] == \
+            [[0, 0], [1, 2], [1, 4]]
+        assert get_records_after.call_args.kwargs["fields"] == export_cli.EXPORT_FIELDS
+        assert Snapshot(self.path).last_ids == [1, 4]
+
+
+if __name__ == '__main__':
+    unittest.main()